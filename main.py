@@ -12,6 +12,9 @@ Descripción:
 Este es el punto de entrada principal para la aplicación. Su función es
 instanciar la Vista (MainWindow) y el Controlador (AppController),
 conectarlos y iniciar el bucle principal de la interfaz gráfica.
+
+Con `--vigilar` se ejecuta en modo servicio, sin interfaz: vigila la carpeta
+de la sección [VIGILANCIA] de settings.ini y procesa cada PDF nuevo.
 """
 
 import sys
@@ -30,7 +33,9 @@ else:
 sys.path.insert(0, base_path)
 # --- FIN: Parche para PyInstaller ---
 
+import argparse
 import logging
+import multiprocessing
 import traceback
 
 # Cambiamos las importaciones para que sean más robustas con PyInstaller
@@ -48,6 +53,31 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def vigilar(config_path: str):
+    """
+    Modo servicio: procesa los PDF que llegan a la carpeta vigilada hasta que
+    se interrumpe con Ctrl+C.
+    """
+    from src.models.extractor_ia import ExtractorIA
+    from src.models.vigilante_carpeta import VigilanteCarpeta
+
+    # En modo servicio el log también se muestra en la consola.
+    consola = logging.StreamHandler()
+    consola.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    logging.getLogger().addHandler(consola)
+
+    try:
+        extractor = ExtractorIA(config_path=config_path)
+        try:
+            VigilanteCarpeta(extractor, config_path).ejecutar()
+        finally:
+            extractor.cerrar()
+    except (ValueError, ConnectionError) as e:
+        logger.error(f"No se pudo iniciar la vigilancia: {e}")
+        print(f"Error fatal: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
 def main():
     """
     Función principal que construye y ejecuta la aplicación.
@@ -100,7 +130,17 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    # Necesario para el pool de procesos del preprocesamiento en el ejecutable.
+    multiprocessing.freeze_support()
+    parser = argparse.ArgumentParser(description="Extractor de Movimientos Bancarios con IA")
+    parser.add_argument("--vigilar", action="store_true",
+                        help="modo servicio: procesar los PDF que lleguen a la carpeta de [VIGILANCIA]")
+    parser.add_argument("--config", default="config/settings.ini", help="ruta de settings.ini")
+    argumentos = parser.parse_args()
+    if argumentos.vigilar:
+        vigilar(argumentos.config)
+    else:
+        main()
 
 
 # --- FIN DEL ARCHIVO ---
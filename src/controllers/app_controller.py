@@ -19,18 +19,105 @@ import sys
 import logging
 import configparser
 import shutil
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
 from tkinter import filedialog
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Type
 
 # Importaciones relativas para que PyInstaller funcione correctamente
 from ..models.extractor_ia import ExtractorIA
-from ..models.csv_writer import escribir_transacciones_a_csv
-from ..models.excel_writer import escribir_transacciones_a_excel
+from ..models.canonizador_comercios import cargar_canonizador
+from ..models.data_models import Transaccion
+from ..models.dialectos_csv import OpcionesCSV, cargar_opciones_csv
+from ..models.exportador import (
+    DestinoCSV,
+    DestinoExcel,
+    DestinoExportacion,
+    DestinoJSONL,
+    DestinoParquet,
+    DestinoSQLite,
+    exportar_transacciones,
+)
+from ..models.importador_odoo import DestinoOdoo, ImportadorOdoo
 from ..views.main_window import MainWindow
 from ..utils.helpers import resource_path
 
 # Configurar logging
 logger = logging.getLogger(__name__)
 
+# Cada cuánto se comprueba si terminó una extracción en segundo plano y se
+# refresca el panel de la cola.
+INTERVALO_SONDEO_MS = 200
+INTERVALO_REFRESCO_COLA_MS = 500
+
+ESTADO_PENDIENTE = "Pendiente"
+ESTADO_EN_COLA = "En cola"
+ESTADO_PROCESANDO = "Procesando"
+ESTADO_COMPLETADO = "Completado"
+ESTADO_ERROR = "Error"
+
+FORMATOS_EXPORTACION: Dict[str, Dict[str, Any]] = {
+    "csv": {
+        "nombre": "CSV",
+        "titulo": "Guardar archivo CSV",
+        "sufijo": "_movimientos.csv",
+        "extension": ".csv",
+        "tipos": (("Archivos CSV", "*.csv"),),
+        "destino": DestinoCSV,
+    },
+    "excel": {
+        "nombre": "Excel",
+        "titulo": "Guardar archivo Excel",
+        "sufijo": "_movimientos.xlsx",
+        "extension": ".xlsx",
+        "tipos": (("Archivos Excel", "*.xlsx"),),
+        "destino": DestinoExcel,
+    },
+    "jsonl": {
+        "nombre": "JSON Lines",
+        "titulo": "Guardar archivo JSON Lines",
+        "sufijo": "_movimientos.jsonl",
+        "extension": ".jsonl",
+        "tipos": (("Archivos JSON Lines", "*.jsonl"),),
+        "destino": DestinoJSONL,
+    },
+    "parquet": {
+        "nombre": "Parquet",
+        "titulo": "Guardar archivo Parquet",
+        "sufijo": "_movimientos.parquet",
+        "extension": ".parquet",
+        "tipos": (("Archivos Parquet", "*.parquet"),),
+        "destino": DestinoParquet,
+    },
+    "sqlite": {
+        "nombre": "SQLite",
+        "titulo": "Guardar base de datos SQLite",
+        "sufijo": "_movimientos.db",
+        "extension": ".db",
+        "tipos": (("Bases de datos SQLite", "*.db"),),
+        "destino": DestinoSQLite,
+    },
+}
+
+
+@dataclass
+class ElementoCola:
+    """
+    Un PDF de la cola de procesamiento. Los hilos de trabajo actualizan sus
+    campos y la interfaz los lee periódicamente desde su propio hilo.
+    """
+
+    ruta: str
+    estado: str = ESTADO_PENDIENTE
+    paginas_hechas: int = 0
+    paginas_totales: int = 0
+    filas: Optional[int] = None
+    futuro: Optional[Future] = None
+
+    @property
+    def activo(self) -> bool:
+        return self.estado in (ESTADO_EN_COLA, ESTADO_PROCESANDO)
+
 
 class AppController:
     """
@@ -47,6 +134,36 @@ class AppController:
 
         self._initialize_config()
 
+        # Cola de PDF por (ruta, fecha de modificación). Las extracciones se
+        # lanzan al seleccionar los archivos y los botones de exportación se
+        # enganchan al resultado, en curso o ya terminado. Se procesan varios
+        # archivos a la vez; el límite de páginas en vuelo contra la API es
+        # global y lo aplica el extractor (MAX_WORKERS_API).
+        self.config.read(self.config_path)
+        self.extraccion_anticipada = self.config.getboolean(
+            'APP', 'EXTRACCION_ANTICIPADA', fallback=True)
+        max_archivos = self.config.getint(
+            'PROCESAMIENTO', 'MAX_ARCHIVOS_SIMULTANEOS', fallback=2)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_archivos))
+        self.view.protocol("WM_DELETE_WINDOW", self.cerrar)
+        self.cola: Dict[Tuple[str, float], ElementoCola] = {}
+        self._refresco_cola_activo = False
+
+        # Dialecto del CSV de salida (sección [CSV])
+        self.opciones_csv: Optional[OpcionesCSV] = None
+        try:
+            self.opciones_csv = cargar_opciones_csv(self.config_path)
+        except ValueError as e:
+            logger.error(f"Configuración de CSV no válida, se usa el formato por defecto: {e}")
+
+        # Comercio canónico de cada movimiento (secciones [CANONIZACION] y [COMERCIOS])
+        try:
+            self.canonizador = cargar_canonizador(self.config_path)
+        except ValueError as e:
+            logger.error(f"Reglas de comercios no válidas, no se canonizan las descripciones: {e}")
+            self.canonizador = None
+
+        self.extractor: Optional[ExtractorIA] = None
         try:
             # Inicializamos el Modelo (el extractor de IA) con la ruta correcta
             self.extractor = ExtractorIA(config_path=self.config_path)
@@ -57,6 +174,18 @@ class AppController:
             self.view.actualizar_barra_estado(str(e), es_error=True)
             self.extractor = None
 
+    def cerrar(self) -> None:
+        """
+        Cierra la aplicación: cancela las extracciones que aún no empezaron,
+        sin esperar a las que están en curso, cierra el extractor y destruye
+        la ventana.
+        """
+        logger.info("Cerrando la aplicación")
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self.extractor:
+            self.extractor.cerrar()
+        self.view.destroy()
+
     def _initialize_config(self):
         """
         Determina la ruta del archivo de configuración y lo crea a partir de
@@ -93,7 +222,16 @@ class AppController:
             return "Error de lectura"
 
     def save_api_key(self, api_key: str):
-        """Guarda la nueva clave de API en el archivo de configuración."""
+        """
+        Guarda la nueva clave de API en el archivo de configuración y
+        reinicia el extractor. No se permite mientras la cola tiene archivos
+        en proceso, porque sus extracciones usan el extractor actual.
+        """
+        if any(elemento.activo for elemento in self.cola.values()):
+            self.view.actualizar_barra_estado(
+                "Espera a que terminen los archivos en proceso para cambiar la API Key.", es_error=True)
+            return
+
         try:
             self.config.read(self.config_path)
             if not self.config.has_section('API'):
@@ -105,8 +243,14 @@ class AppController:
             logger.info("API Key guardada correctamente.")
             self.view.actualizar_barra_estado("API Key guardada correctamente.", es_error=False)
             
-            # Re-inicializar el extractor con la nueva clave
+            # Re-inicializar el extractor con la nueva clave, cerrando antes el
+            # anterior (hilos, conexiones SQLite y contadores de perfiles).
+            if self.extractor:
+                self.extractor.cerrar()
+                self.extractor = None
             self.extractor = ExtractorIA(config_path=self.config_path)
+            self.cola.clear()
+            self.view.actualizar_cola([])
             logger.info("Extractor de IA reinicializado con la nueva clave.")
 
         except Exception as e:
@@ -115,21 +259,31 @@ class AppController:
 
     def seleccionar_archivo_pdf(self):
         """
-        Abre un diálogo para que el usuario seleccione un archivo PDF.
-        Actualiza la vista con la ruta del archivo seleccionado.
+        Abre un diálogo para que el usuario seleccione uno o varios archivos
+        PDF. Los archivos se añaden a la cola y el primero queda como archivo
+        actual para los botones de exportación individuales.
         """
-        filepath = filedialog.askopenfilename(
-            title="Seleccionar extracto bancario",
+        filepaths = filedialog.askopenfilenames(
+            title="Seleccionar extractos bancarios",
             filetypes=(("Archivos PDF", "*.pdf"),
                        ("Todos los archivos", "*.*"))
         )
 
-        if filepath:
-            self.selected_pdf_path = filepath
-            self.view.actualizar_ruta_archivo(self.selected_pdf_path)
-            self.view.actualizar_barra_estado(
-                "Archivo cargado. Listo para generar CSV.")
-            logger.info(f"Archivo PDF seleccionado: {filepath}")
+        if filepaths:
+            self.selected_pdf_path = filepaths[0]
+            self.view.actualizar_ruta_archivo(self.selected_pdf_path, len(filepaths) - 1)
+            logger.info(f"Archivos PDF seleccionados: {', '.join(filepaths)}")
+            for filepath in filepaths:
+                self._agregar_a_cola(filepath)
+            if self.extraccion_anticipada and self.extractor:
+                for filepath in filepaths:
+                    self._iniciar_extraccion(filepath)
+                self.view.actualizar_barra_estado(
+                    "Archivos cargados. Extrayendo movimientos en segundo plano...")
+            else:
+                self.view.actualizar_barra_estado(
+                    "Archivo cargado. Listo para generar CSV.")
+            self._refrescar_cola()
         else:
             self.selected_pdf_path = None
             self.view.actualizar_ruta_archivo(None)
@@ -139,6 +293,20 @@ class AppController:
         """
         Orquesta el proceso completo de extracción y generación de CSV.
         """
+        self._exportar("csv")
+
+    def generar_excel(self):
+        """
+        Orquesta el proceso completo de extracción y generación de Excel.
+        """
+        self._exportar("excel")
+
+    def importar_en_odoo(self) -> None:
+        """
+        Importa en Odoo (sección [ODOO]) los movimientos del archivo actual
+        cuando termina su extracción. La importación se hace en un hilo de
+        trabajo para no bloquear la interfaz.
+        """
         if not self.selected_pdf_path:
             self.view.actualizar_barra_estado(
                 "Error: Por favor, selecciona un archivo PDF primero.", es_error=True)
@@ -149,54 +317,124 @@ class AppController:
                 "Error: El extractor de IA no está configurado. Revisa la API Key.", es_error=True)
             return
 
-        self.view.actualizar_barra_estado(
-            "Procesando... Contactando a la IA. Esto puede tardar un momento.")
-        self.view.update_idletasks()
+        try:
+            importador = ImportadorOdoo(self.config_path)
+        except ValueError as e:
+            self.view.actualizar_barra_estado(f"Error: {e}", es_error=True)
+            logger.error(f"Configuración de Odoo no válida: {e}")
+            return
+
+        futuro = self._iniciar_extraccion(self.selected_pdf_path)
+        self.view.actualizar_barra_estado("Procesando... Los movimientos se importarán en Odoo al terminar.")
+        self._esperar_e_importar(futuro, self.selected_pdf_path, importador)
 
-        transacciones = self.extractor.extraer_transacciones_de_pdf(
-            self.selected_pdf_path)
+    def _esperar_e_importar(self, futuro: Future, pdf_path: str, importador: ImportadorOdoo) -> None:
+        """Espera a la extracción y lanza la importación en Odoo en un hilo de trabajo."""
+        if not futuro.done():
+            self.view.after(INTERVALO_SONDEO_MS, self._esperar_e_importar, futuro, pdf_path, importador)
+            return
 
+        transacciones = self._resultado(futuro)
         if not transacciones:
             self.view.actualizar_barra_estado(
-                "Error: No se pudieron extraer transacciones del PDF.", es_error=True)
-            logger.error("No se pudieron extraer transacciones del PDF")
+                "Error: No hay transacciones que importar en Odoo.", es_error=transacciones is None)
             return
 
-        input_filename = os.path.basename(self.selected_pdf_path)
-        output_suggestion = os.path.splitext(
-            input_filename)[0] + "_movimientos.csv"
-
-        output_path = filedialog.asksaveasfilename(
-            title="Guardar archivo CSV",
-            initialfile=output_suggestion,
-            defaultextension=".csv",
-            filetypes=(("Archivos CSV", "*.csv"),)
-        )
+        destino = DestinoOdoo(importador)
+        importacion = self._executor.submit(exportar_transacciones, transacciones, [destino], self.canonizador)
+        self._esperar_importacion(importacion, destino, pdf_path)
 
-        if not output_path:
-            self.view.actualizar_barra_estado(
-                "Proceso cancelado por el usuario.")
-            logger.info("Guardado de archivo CSV cancelado por el usuario")
+    def _esperar_importacion(self, importacion: Future, destino: DestinoOdoo, pdf_path: str) -> None:
+        """Comprueba, desde el hilo de la interfaz, si terminó la importación en Odoo."""
+        if not importacion.done():
+            self.view.after(INTERVALO_SONDEO_MS, self._esperar_importacion, importacion, destino, pdf_path)
             return
 
-        exito = escribir_transacciones_a_csv(transacciones, output_path)
-
-        if exito:
-            self.view.actualizar_barra_estado(
-                f"¡Éxito! Archivo CSV guardado en: {os.path.basename(output_path)}")
-            logger.info(f"Archivo CSV generado exitosamente en: {output_path}")
+        resultados = self._resultado(importacion)
+        if resultados and resultados[destino.ruta] and destino.resultado is not None:
+            if self.extractor:
+                self.extractor.confirmar_huellas(pdf_path)
+            self.view.actualizar_barra_estado(f"¡Éxito! {destino.resultado.resumen()}")
         else:
             self.view.actualizar_barra_estado(
-                "Error: No se pudo escribir el archivo CSV.", es_error=True)
-            logger.error(f"Error al escribir el archivo CSV en: {output_path}")
+                "Error: No se pudo completar la importación en Odoo. Revisa el log.", es_error=True)
 
-    def generar_excel(self):
+    def _clave_extraccion(self, pdf_path: str) -> Tuple[str, float]:
+        """Identifica un PDF por su ruta y fecha de modificación."""
+        try:
+            return pdf_path, os.path.getmtime(pdf_path)
+        except OSError:
+            return pdf_path, 0.0
+
+    def _agregar_a_cola(self, pdf_path: str) -> ElementoCola:
+        """Devuelve el elemento de la cola de un PDF, creándolo si no existe."""
+        clave = self._clave_extraccion(pdf_path)
+        if clave not in self.cola:
+            self.cola[clave] = ElementoCola(ruta=pdf_path)
+        return self.cola[clave]
+
+    def _iniciar_extraccion(self, pdf_path: str) -> Optional[Future]:
         """
-        Orquesta el proceso completo de extracción y generación de Excel.
+        Lanza la extracción de un PDF en segundo plano, o devuelve la que ya
+        está en curso o terminada para ese mismo archivo. Las extracciones
+        fallidas se vuelven a lanzar.
         """
-        if not self.selected_pdf_path:
+        if not self.extractor:
+            return None
+
+        elemento = self._agregar_a_cola(pdf_path)
+        futuro = elemento.futuro
+        if futuro is None or (futuro.done() and self._resultado(futuro) is None):
+            logger.info(f"Iniciando extracción en segundo plano: {pdf_path}")
+            elemento.estado = ESTADO_EN_COLA
+            elemento.futuro = self._executor.submit(self._extraer, elemento, self.extractor)
+            self._refrescar_cola()
+        return elemento.futuro
+
+    @staticmethod
+    def _extraer(elemento: ElementoCola, extractor: ExtractorIA) -> Optional[List[Transaccion]]:
+        """Extrae un elemento de la cola (se ejecuta en un hilo de trabajo)."""
+        elemento.estado = ESTADO_PROCESANDO
+
+        def progreso(_pdf_path: str, hechas: int, totales: int) -> None:
+            elemento.paginas_hechas, elemento.paginas_totales = hechas, totales
+
+        transacciones = extractor.extraer_transacciones_de_pdf(elemento.ruta, progreso)
+        elemento.filas = len(transacciones) if transacciones is not None else 0
+        elemento.estado = ESTADO_COMPLETADO if transacciones is not None else ESTADO_ERROR
+        return transacciones
+
+    def _refrescar_cola(self) -> None:
+        """
+        Envía el estado de la cola a la vista y se reprograma mientras haya
+        archivos en proceso.
+        """
+        filas = []
+        for elemento in self.cola.values():
+            progreso = (f"{elemento.paginas_hechas}/{elemento.paginas_totales} págs."
+                        if elemento.paginas_totales else "")
+            movimientos = f"{elemento.filas} filas" if elemento.filas is not None else ""
+            filas.append((os.path.basename(elemento.ruta), elemento.estado, progreso, movimientos))
+        self.view.actualizar_cola(filas)
+
+        if any(elemento.activo for elemento in self.cola.values()):
+            if not self._refresco_cola_activo:
+                self._refresco_cola_activo = True
+                self.view.after(INTERVALO_REFRESCO_COLA_MS, self._tick_refresco_cola)
+
+    def _tick_refresco_cola(self) -> None:
+        self._refresco_cola_activo = False
+        self._refrescar_cola()
+
+    def guardar_todo_en_carpeta(self, formatos: Sequence[str] = ("csv",)) -> None:
+        """
+        Exporta todos los archivos de la cola a una carpeta, en los formatos
+        indicados, cuando terminan sus extracciones. Cada documento se
+        recorre una sola vez para todos los formatos.
+        """
+        if not self.cola:
             self.view.actualizar_barra_estado(
-                "Error: Por favor, selecciona un archivo PDF primero.", es_error=True)
+                "Error: Por favor, selecciona al menos un archivo PDF.", es_error=True)
             return
 
         if not self.extractor:
@@ -204,43 +442,183 @@ class AppController:
                 "Error: El extractor de IA no está configurado. Revisa la API Key.", es_error=True)
             return
 
+        carpeta = filedialog.askdirectory(title="Seleccionar carpeta de destino")
+        if not carpeta:
+            self.view.actualizar_barra_estado("Proceso cancelado por el usuario.")
+            return
+
+        extracciones = []
+        for elemento in list(self.cola.values()):
+            futuro = self._iniciar_extraccion(elemento.ruta)
+            if futuro is not None:
+                extracciones.append((elemento, futuro))
+
         self.view.actualizar_barra_estado(
-            "Procesando... Contactando a la IA. Esto puede tardar un momento.")
-        self.view.update_idletasks()
+            f"Procesando {len(extracciones)} archivos... Se guardarán en: {carpeta}")
+        self._esperar_y_guardar_todo(extracciones, carpeta, formatos)
+
+    def _esperar_y_guardar_todo(
+        self, extracciones: List[Tuple[ElementoCola, Future]], carpeta: str, formatos: Sequence[str]
+    ) -> None:
+        """Espera, desde el hilo de la interfaz, a que termine toda la cola y la escribe."""
+        if not all(futuro.done() for _, futuro in extracciones):
+            self.view.after(INTERVALO_SONDEO_MS, self._esperar_y_guardar_todo, extracciones, carpeta, formatos)
+            return
 
-        transacciones = self.extractor.extraer_transacciones_de_pdf(
-            self.selected_pdf_path)
+        exportaciones = [FORMATOS_EXPORTACION[formato] for formato in formatos]
+        documentos = [(elemento.ruta, self._resultado(futuro)) for elemento, futuro in extracciones]
+        guardado = self._executor.submit(self._guardar_todo, documentos, carpeta, exportaciones)
+        self._esperar_guardado(guardado, carpeta, exportaciones)
+
+    def _guardar_todo(
+        self,
+        documentos: List[Tuple[str, Optional[List[Transaccion]]]],
+        carpeta: str,
+        exportaciones: List[Dict[str, Any]],
+    ) -> Tuple[List[str], int]:
+        """
+        Escribe los documentos en la carpeta (se ejecuta en un hilo de
+        trabajo). Devuelve las rutas de los PDF guardados y cuántos fallaron.
+        """
+        guardados: List[str] = []
+        fallidos = 0
+        usados = set()
+        for pdf_path, transacciones in documentos:
+            if transacciones == []:
+                logger.info(f"{pdf_path} no contiene transacciones; no se exporta.")
+                continue
+            destinos = []
+            for exportacion in exportaciones:
+                nombre = os.path.splitext(os.path.basename(pdf_path))[0] + exportacion["sufijo"]
+                base, extension = os.path.splitext(nombre)
+                contador = 2
+                while nombre in usados:
+                    nombre = f"{base}_{contador}{extension}"
+                    contador += 1
+                usados.add(nombre)
+                destinos.append(self._crear_destino(exportacion, os.path.join(carpeta, nombre)))
+
+            resultados = exportar_transacciones(transacciones, destinos, self.canonizador) if transacciones else {}
+            if resultados and all(resultados.values()):
+                guardados.append(pdf_path)
+            else:
+                fallidos += 1
+                logger.error(f"No se pudo exportar {pdf_path}")
+        return guardados, fallidos
+
+    def _esperar_guardado(self, guardado: Future, carpeta: str, exportaciones: List[Dict[str, Any]]) -> None:
+        """Comprueba, desde el hilo de la interfaz, si terminó la escritura de la cola."""
+        if not guardado.done():
+            self.view.after(INTERVALO_SONDEO_MS, self._esperar_guardado, guardado, carpeta, exportaciones)
+            return
 
-        if not transacciones:
+        resultado = self._resultado(guardado)
+        if resultado is None:
             self.view.actualizar_barra_estado(
-                "Error: No se pudieron extraer transacciones del PDF.", es_error=True)
-            logger.error("No se pudieron extraer transacciones del PDF")
+                "Error: No se pudieron guardar los archivos. Revisa el log.", es_error=True)
+            return
+        guardados, fallidos = resultado
+        if self.extractor:
+            for pdf_path in guardados:
+                self.extractor.confirmar_huellas(pdf_path)
+
+        nombres = " + ".join(exportacion["nombre"] for exportacion in exportaciones)
+        mensaje = f"{len(guardados)} archivos {nombres} guardados en: {carpeta}"
+        if fallidos:
+            mensaje += f" ({fallidos} con error)"
+        self.view.actualizar_barra_estado(mensaje, es_error=bool(fallidos))
+        logger.info(mensaje)
+
+    def _crear_destino(self, exportacion: Dict[str, Any], ruta: str) -> DestinoExportacion:
+        """Crea el destino de exportación de un formato; el CSV usa las opciones de [CSV]."""
+        clase: Type[DestinoExportacion] = exportacion["destino"]
+        if clase is DestinoCSV:
+            return DestinoCSV(ruta, self.opciones_csv)
+        return clase(ruta)
+
+    @staticmethod
+    def _resultado(futuro: Future) -> Any:
+        """Resultado de una tarea en segundo plano terminada; None si falló."""
+        try:
+            return futuro.result()
+        except Exception as e:
+            logger.error(f"Error en la tarea en segundo plano: {e}", exc_info=True)
+            return None
+
+    def _exportar(self, formato: str) -> None:
+        """
+        Pide la ruta de salida mientras la extracción avanza en segundo plano
+        y escribe el archivo en cuanto el resultado está disponible.
+        """
+        exportacion = FORMATOS_EXPORTACION[formato]
+
+        if not self.selected_pdf_path:
+            self.view.actualizar_barra_estado(
+                "Error: Por favor, selecciona un archivo PDF primero.", es_error=True)
+            return
+
+        if not self.extractor:
+            self.view.actualizar_barra_estado(
+                "Error: El extractor de IA no está configurado. Revisa la API Key.", es_error=True)
             return
 
+        futuro = self._iniciar_extraccion(self.selected_pdf_path)
+
         input_filename = os.path.basename(self.selected_pdf_path)
         output_suggestion = os.path.splitext(
-            input_filename)[0] + "_movimientos.xlsx"
+            input_filename)[0] + exportacion["sufijo"]
 
         output_path = filedialog.asksaveasfilename(
-            title="Guardar archivo Excel",
+            title=exportacion["titulo"],
             initialfile=output_suggestion,
-            defaultextension=".xlsx",
-            filetypes=(("Archivos Excel", "*.xlsx"),)
+            defaultextension=exportacion["extension"],
+            filetypes=exportacion["tipos"]
         )
 
         if not output_path:
             self.view.actualizar_barra_estado(
                 "Proceso cancelado por el usuario.")
-            logger.info("Guardado de archivo Excel cancelado por el usuario")
+            logger.info(f"Guardado de archivo {exportacion['nombre']} cancelado por el usuario")
+            return
+
+        if not futuro.done():
+            self.view.actualizar_barra_estado(
+                "Procesando... Contactando a la IA. Esto puede tardar un momento.")
+        self._esperar_y_escribir(futuro, self.selected_pdf_path, output_path, formato)
+
+    def _esperar_y_escribir(self, futuro: Future, pdf_path: str, output_path: str, formato: str) -> None:
+        """
+        Comprueba periódicamente, desde el hilo de la interfaz, si la
+        extracción terminó y entonces escribe el archivo.
+        """
+        if not futuro.done():
+            self.view.after(INTERVALO_SONDEO_MS, self._esperar_y_escribir, futuro, pdf_path, output_path, formato)
+            return
+
+        exportacion = FORMATOS_EXPORTACION[formato]
+        transacciones = self._resultado(futuro)
+
+        if transacciones is None:
+            self.view.actualizar_barra_estado(
+                "Error: No se pudieron extraer transacciones del PDF.", es_error=True)
+            logger.error("No se pudieron extraer transacciones del PDF")
+            return
+        if not transacciones:
+            self.view.actualizar_barra_estado(
+                "El PDF no contiene transacciones; no se generó ningún archivo.")
+            logger.info("El PDF no contiene transacciones")
             return
 
-        exito = escribir_transacciones_a_excel(transacciones, output_path)
+        destino = self._crear_destino(exportacion, output_path)
+        exito = exportar_transacciones(transacciones, [destino], self.canonizador)[destino.ruta]
 
         if exito:
+            if self.extractor:
+                self.extractor.confirmar_huellas(pdf_path)
             self.view.actualizar_barra_estado(
-                f"¡Éxito! Archivo Excel guardado en: {os.path.basename(output_path)}")
-            logger.info(f"Archivo Excel generado exitosamente en: {output_path}")
+                f"¡Éxito! Archivo {exportacion['nombre']} guardado en: {os.path.basename(output_path)}")
+            logger.info(f"Archivo {exportacion['nombre']} generado exitosamente en: {output_path}")
         else:
             self.view.actualizar_barra_estado(
-                "Error: No se pudo escribir el archivo Excel.", es_error=True)
-            logger.error(f"Error al escribir el archivo Excel en: {output_path}")
\ No newline at end of file
+                f"Error: No se pudo escribir el archivo {exportacion['nombre']}.", es_error=True)
+            logger.error(f"Error al escribir el archivo {exportacion['nombre']} en: {output_path}")
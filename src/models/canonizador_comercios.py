@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Fichero: canonizador_comercios.py
+Proyecto: Extractor de Movimientos Bancarios con IA
+
+Desarrollado por: IA Punto Soluciones Tecnológicas
+Para: Industrias Pico
+Responsable: MEng Sergio Rondón
+Fecha de Creación: 19/10/2026
+
+Descripción:
+Normalización de las descripciones de los movimientos a un comercio
+canónico: "COMPRA POS 1234 SUPERMERCADO XYZ 03/09" -> "SUPERMERCADO XYZ".
+Se quitan los prefijos de operación, los números de tarjeta, las
+referencias y las fechas, y las variantes se asignan a un nombre canónico
+con las reglas de la sección [COMERCIOS] de settings.ini.
+
+Las mismas descripciones se repiten miles de veces entre extractos, así que
+el resultado se guarda en una caché LRU por descripción original.
+"""
+
+import configparser
+import logging
+import re
+import unicodedata
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Prefijos de operación que no identifican al comercio.
+PREFIJOS_POR_DEFECTO = (
+    "COMPRA POS", "COMPRA INTERNACIONAL", "COMPRA", "PAGO PSE", "PAGO", "TRANSFERENCIA A",
+    "TRANSFERENCIA DE", "RETIRO CAJERO", "DEBITO AUTOMATICO", "CARGO",
+)
+
+# Ruido dentro de la descripción: tarjetas enmascaradas, referencias, fechas,
+# horas, códigos alfanuméricos con al menos dos dígitos y números sueltos. Los
+# nombres con un solo dígito (7ELEVEN, 3M) se conservan.
+_RUIDO = [
+    re.compile(r"\b(?:TARJ(?:ETA)?|TJ)\.?\s*[*X\d]{4,}", re.IGNORECASE),
+    re.compile(r"[*X]{2,}\d{2,4}\b", re.IGNORECASE),
+    re.compile(r"\b(?:REF|REFERENCIA|NRO|NUM|NO|AUT|COMPROBANTE)\b\.?\s*:?\s*[\w-]*\d[\w-]*", re.IGNORECASE),
+    re.compile(r"\b\d{1,4}[/.-]\d{1,2}(?:[/.-]\d{2,4})?\b"),
+    re.compile(r"\b\d{1,2}:\d{2}(?::\d{2})?\b"),
+    re.compile(r"\b(?=(?:[A-Z]*\d){2})[A-Z\d]{4,}\b"),
+    re.compile(r"\b\d+\b"),
+]
+
+
+def _normalizar(texto: str) -> str:
+    sin_tildes = unicodedata.normalize("NFKD", texto or "").encode("ascii", "ignore").decode()
+    return " ".join(re.sub(r"[^\w*/.:-]+", " ", sin_tildes.upper()).split())
+
+
+class CanonizadorComercios:
+    """
+    Convierte descripciones en comercios canónicos. Es seguro usarlo desde
+    varios hilos (la caché de functools lo es).
+    """
+
+    def __init__(
+        self,
+        reglas: Sequence[Tuple[str, Sequence[str]]] = (),
+        prefijos: Sequence[str] = PREFIJOS_POR_DEFECTO,
+        tamano_cache: int = 8192,
+    ):
+        """
+        Args:
+            reglas: Pares (comercio canónico, expresiones regulares). La primera
+                    regla cuya expresión encaja en la descripción limpia gana.
+            prefijos: Prefijos de operación que se quitan del principio.
+            tamano_cache: Descripciones distintas que se recuerdan.
+
+        Raises:
+            ValueError: Si una expresión regular no es válida.
+        """
+        self.reglas: List[Tuple[str, re.Pattern]] = []
+        for comercio, patrones in reglas:
+            for patron in patrones:
+                try:
+                    self.reglas.append((comercio, re.compile(patron, re.IGNORECASE)))
+                except re.error as e:
+                    raise ValueError(f"Regla de comercio no válida para {comercio}: {patron!r} ({e})")
+        # Los prefijos más largos primero, para quitar "COMPRA POS" antes que "COMPRA".
+        self._prefijos = sorted((_normalizar(p) for p in prefijos if p.strip()), key=len, reverse=True)
+        self.canonizar = lru_cache(maxsize=tamano_cache)(self._canonizar)
+
+    def limpiar(self, descripcion: str) -> str:
+        """Quita prefijos de operación, tarjetas, referencias, fechas y números."""
+        texto = _normalizar(descripcion)
+        for patron in _RUIDO:
+            texto = patron.sub(" ", texto)
+        texto = " ".join(re.sub(r"[*/.:-]+", " ", texto).split())
+        for prefijo in self._prefijos:
+            if texto == prefijo or texto.startswith(prefijo + " "):
+                texto = texto[len(prefijo):].strip()
+                break
+        return texto
+
+    def _canonizar(self, descripcion: str) -> str:
+        limpia = self.limpiar(descripcion)
+        for comercio, patron in self.reglas:
+            if patron.search(limpia):
+                return comercio
+        return limpia or _normalizar(descripcion)
+
+    def estadisticas(self) -> str:
+        info = self.canonizar.cache_info()
+        return (
+            f"Comercios: {info.currsize} descripciones en caché, "
+            f"{info.hits} aciertos y {info.misses} fallos."
+        )
+
+
+class _ConfigConMayusculas(configparser.ConfigParser):
+    """ConfigParser que no pasa las claves a minúsculas."""
+
+    def optionxform(self, optionstr: str) -> str:
+        return optionstr
+
+
+def cargar_canonizador(config_path: str = "config/settings.ini") -> Optional[CanonizadorComercios]:
+    """
+    Crea el canonizador a partir de [CANONIZACION] y [COMERCIOS] de
+    settings.ini, o devuelve None si está deshabilitado.
+
+    En [COMERCIOS] cada clave es el nombre canónico (se respetan mayúsculas y
+    espacios) y el valor, una o varias expresiones regulares separadas por
+    '|' sobre la descripción ya limpia.
+
+    Raises:
+        ValueError: Si una regla no es válida.
+    """
+    config = configparser.ConfigParser()
+    config.read(config_path, encoding="utf-8")
+    if not config.getboolean("CANONIZACION", "habilitado", fallback=False):
+        return None
+    prefijos: Sequence[str] = PREFIJOS_POR_DEFECTO
+    if config.has_option("CANONIZACION", "prefijos"):
+        prefijos = [p.strip() for p in config.get("CANONIZACION", "prefijos").split(",")]
+
+    # Segunda lectura que conserva las mayúsculas de los nombres canónicos.
+    # Sin interpolación, para que un '%' en una expresión no se interprete.
+    comercios = _ConfigConMayusculas(interpolation=None)
+    comercios.read(config_path, encoding="utf-8")
+    reglas = [
+        (comercio.strip(), [p.strip() for p in valor.split("|") if p.strip()])
+        for comercio, valor in (comercios.items("COMERCIOS") if comercios.has_section("COMERCIOS") else [])
+    ]
+    canonizador = CanonizadorComercios(
+        reglas, prefijos, config.getint("CANONIZACION", "tamano_cache", fallback=8192)
+    )
+    logger.info(f"Canonización de comercios habilitada con {len(canonizador.reglas)} reglas.")
+    return canonizador
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Fichero: clasificador_paginas.py
+Proyecto: Extractor de Movimientos Bancarios con IA
+
+Desarrollado por: IA Punto Soluciones Tecnológicas
+Para: Industrias Pico
+Responsable: MEng Sergio Rondón
+Fecha de Creación: 19/10/2026
+
+Descripción:
+Clasificador local y barato de páginas a partir de su capa de texto. Permite
+omitir portadas, condiciones legales y páginas publicitarias sin gastar una
+llamada a la IA. Ante la duda la página se marca como desconocida y se envía.
+"""
+
+import re
+from enum import Enum
+from typing import Tuple
+
+# Fechas como 15/12/2025, 15-12, 2025-12-15 o "15 DIC".
+PATRON_FECHA = re.compile(
+    r"\b(?:\d{1,2}[/\-.]\d{1,2}(?:[/\-.]\d{2,4})?"
+    r"|\d{4}[/\-.]\d{1,2}[/\-.]\d{1,2}"
+    r"|\d{1,2}\s+(?:ENE|FEB|MAR|ABR|MAY|JUN|JUL|AGO|SEP|SET|OCT|NOV|DIC)[A-Z]*)\b",
+    re.IGNORECASE,
+)
+
+# Importes con decimales: 1.234,56 / 1,234.56 / 741.00 / -25,50 / $ 1.234
+PATRON_IMPORTE = re.compile(r"[-$]?\s?\d{1,3}(?:[.,\s]\d{3})*[.,]\d{2}\b")
+
+PALABRAS_TABLA = (
+    "saldo", "débito", "debito", "crédito", "credito", "movimientos",
+    "descripción", "descripcion", "concepto", "referencia", "valor", "cargo", "abono",
+)
+
+# Longitud mínima de texto para poder afirmar que una página no tiene movimientos.
+MIN_CARACTERES_TEXTO = 200
+
+
+class TipoPagina(str, Enum):
+    """Resultado de la clasificación de una página."""
+
+    TRANSACCIONES = "transacciones"
+    SIN_TRANSACCIONES = "sin_transacciones"
+    DESCONOCIDA = "desconocida"
+
+
+def contar_filas_con_movimiento(texto: str) -> int:
+    """Cuenta las líneas del texto que contienen a la vez una fecha y un importe."""
+    return sum(
+        1
+        for linea in texto.splitlines()
+        if PATRON_FECHA.search(linea) and PATRON_IMPORTE.search(linea)
+    )
+
+
+def clasificar_pagina(texto: str, min_filas: int = 2) -> Tuple[TipoPagina, str]:
+    """
+    Clasifica una página según la densidad de fechas, importes y palabras
+    clave de tabla en su capa de texto.
+
+    Args:
+        texto: El texto extraído de la página.
+        min_filas: Número de líneas con fecha e importe a partir del cual la
+                   página se considera de movimientos.
+
+    Returns:
+        Una tupla (tipo, motivo) con la clasificación y una explicación breve.
+    """
+    texto = texto or ""
+    if len(texto.strip()) < MIN_CARACTERES_TEXTO:
+        # Páginas escaneadas o casi vacías: no hay información suficiente.
+        return TipoPagina.DESCONOCIDA, "capa de texto insuficiente"
+
+    filas = contar_filas_con_movimiento(texto)
+    if filas >= min_filas:
+        return TipoPagina.TRANSACCIONES, f"{filas} líneas con fecha e importe"
+
+    if filas > 0:
+        return TipoPagina.DESCONOCIDA, f"solo {filas} línea(s) con fecha e importe"
+
+    texto_min = texto.lower()
+    palabras = sum(1 for palabra in PALABRAS_TABLA if palabra in texto_min)
+    importes = len(PATRON_IMPORTE.findall(texto))
+    if importes > 0 and palabras >= 2:
+        return TipoPagina.DESCONOCIDA, f"{importes} importes y {palabras} palabras de tabla"
+
+    return TipoPagina.SIN_TRANSACCIONES, "sin líneas con fecha e importe"
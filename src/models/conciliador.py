@@ -0,0 +1,354 @@
+# -*- coding: utf-8 -*-
+"""
+Fichero: conciliador.py
+Proyecto: Extractor de Movimientos Bancarios con IA
+
+Desarrollado por: IA Punto Soluciones Tecnológicas
+Para: Industrias Pico
+Responsable: MEng Sergio Rondón
+Fecha de Creación: 19/10/2026
+
+Descripción:
+Conciliación de los movimientos extraídos con los apuntes contables exportados
+desde Odoo (u otro ERP) en CSV. Cada movimiento se empareja con un apunte del
+mismo importe dentro de una ventana de días, usando la similitud de las
+descripciones para desempatar.
+
+Los apuntes se agrupan por importe en céntimos y cada grupo se ordena por
+fecha, de modo que los candidatos de un movimiento se obtienen con un acceso
+al diccionario y una búsqueda binaria, sin recorrer todo el libro contable.
+
+El resultado separa los emparejados, los que no tienen pareja en cada lado y
+los ambiguos (varios candidatos igual de buenos), que se dejan para revisión
+manual en lugar de adivinar.
+"""
+
+import configparser
+import csv
+import logging
+import unicodedata
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from datetime import date
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .data_models import Transaccion, clean_number_string
+from .normalizador_fechas import texto_a_fecha
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Nombres de columna aceptados (ya normalizados) para cada campo del CSV.
+_COLUMNAS = {
+    "fecha": ("fecha", "date", "dia"),
+    "descripcion": ("etiqueta", "label", "descripcion", "name", "concepto"),
+    "referencia": ("referencia", "reference", "ref", "move", "asiento", "journal entry"),
+    "debito": ("debito", "debit", "debe"),
+    "credito": ("credito", "credit", "haber"),
+    "importe": ("importe", "amount", "balance", "saldo", "monto"),
+}
+
+# Peso de la similitud de descripciones frente a la cercanía de fechas.
+PESO_DESCRIPCION = 0.6
+
+
+@dataclass
+class ApunteContable:
+    """Un apunte del libro contable. `importe` positivo = entrada en el banco."""
+
+    fila: int
+    fecha: date
+    importe: float
+    descripcion: str = ""
+    referencia: str = ""
+
+
+@dataclass
+class Emparejamiento:
+    """Un movimiento del extracto conciliado con un apunte contable."""
+
+    transaccion: Transaccion
+    apunte: ApunteContable
+    puntuacion: float
+    dias: int
+
+
+@dataclass
+class Ambiguedad:
+    """Un movimiento con varios apuntes candidatos casi igual de buenos."""
+
+    transaccion: Transaccion
+    candidatos: List[ApunteContable]
+
+
+@dataclass
+class ResultadoConciliacion:
+    """Resultado de conciliar un extracto con un libro contable."""
+
+    emparejados: List[Emparejamiento] = field(default_factory=list)
+    ambiguos: List[Ambiguedad] = field(default_factory=list)
+    sin_emparejar_extracto: List[Transaccion] = field(default_factory=list)
+    sin_emparejar_libro: List[ApunteContable] = field(default_factory=list)
+
+    def resumen(self) -> str:
+        return (
+            f"Conciliación: {len(self.emparejados)} emparejados, "
+            f"{len(self.ambiguos)} ambiguos, "
+            f"{len(self.sin_emparejar_extracto)} del extracto y "
+            f"{len(self.sin_emparejar_libro)} del libro sin emparejar."
+        )
+
+
+def _normalizar_texto(texto: str) -> str:
+    """Mayúsculas sin tildes ni espacios repetidos, para comparar descripciones."""
+    sin_tildes = unicodedata.normalize("NFKD", texto or "").encode("ascii", "ignore").decode()
+    return " ".join(sin_tildes.upper().split())
+
+
+def _a_centimos(importe: float) -> int:
+    return int(round(importe * 100))
+
+
+def importe_transaccion(transaccion: Transaccion) -> float:
+    """Importe con signo de un movimiento: crédito positivo, débito negativo."""
+    return (transaccion.credito or 0.0) - (transaccion.debito or 0.0)
+
+
+def _a_float(valor: str) -> float:
+    valor = (valor or "").replace("$", "").replace(" ", "").strip()
+    return float(clean_number_string(valor)) if valor else 0.0
+
+
+def leer_libro_csv(ruta: str, encoding: str = "utf-8-sig") -> List[ApunteContable]:
+    """
+    Lee los apuntes contables de un CSV exportado desde Odoo.
+
+    Se reconocen las columnas por nombre, en español o en inglés (Fecha/Date,
+    Etiqueta/Label, Referencia/Reference, Débito/Debit, Crédito/Credit o un
+    único Importe/Amount/Balance). El separador se detecta automáticamente.
+    Las filas sin fecha o importe válidos se omiten.
+
+    Raises:
+        ValueError: Si el CSV no tiene columna de fecha o de importe.
+    """
+    with open(ruta, newline="", encoding=encoding) as f:
+        muestra = f.read(8192)
+        f.seek(0)
+        try:
+            dialecto = csv.Sniffer().sniff(muestra, delimiters=",;\t|")
+        except csv.Error:
+            dialecto = csv.excel
+        lector = csv.reader(f, dialecto)
+        cabecera = [_normalizar_texto(c).lower() for c in next(lector, [])]
+        indices = _indices_columnas(cabecera)
+        if "fecha" not in indices or not ({"importe"} <= indices.keys() or {"debito", "credito"} <= indices.keys()):
+            raise ValueError(f"El CSV '{ruta}' no tiene columnas de fecha e importe reconocibles: {cabecera}")
+
+        apuntes = []
+        for numero, fila in enumerate(lector, start=2):
+            apunte = _leer_apunte(numero, fila, indices)
+            if apunte is None:
+                logger.debug(f"Fila {numero} del libro omitida: {fila}")
+                continue
+            apuntes.append(apunte)
+
+    logger.info(f"Leídos {len(apuntes)} apuntes contables de {ruta}")
+    return apuntes
+
+
+def _indices_columnas(cabecera: List[str]) -> Dict[str, int]:
+    """Posición de cada campo conocido en la cabecera del libro."""
+    indices: Dict[str, int] = {}
+    for campo, alias in _COLUMNAS.items():
+        for i, nombre in enumerate(cabecera):
+            if nombre in alias:
+                indices[campo] = i
+                break
+    return indices
+
+
+def _leer_apunte(numero: int, fila: List[str], indices: Dict[str, int]) -> Optional[ApunteContable]:
+    """Un apunte a partir de una fila del libro, o None si no tiene fecha o importe válidos."""
+
+    def columna(campo: str) -> str:
+        i = indices.get(campo)
+        return fila[i] if i is not None and i < len(fila) else ""
+
+    fecha = texto_a_fecha(columna("fecha"))
+    if fecha is None:
+        return None
+    try:
+        if "debito" in indices and "credito" in indices:
+            importe = _a_float(columna("debito")) - _a_float(columna("credito"))
+        else:
+            importe = _a_float(columna("importe"))
+    except ValueError:
+        return None
+    return ApunteContable(
+        fila=numero,
+        fecha=fecha,
+        importe=importe,
+        descripcion=columna("descripcion"),
+        referencia=columna("referencia"),
+    )
+
+
+class Conciliador:
+    """
+    Empareja los movimientos de un extracto con los apuntes de un libro
+    contable. Las tolerancias se leen de la sección [CONCILIACION] de la
+    configuración.
+    """
+
+    def __init__(self, config_path: str = "config/settings.ini"):
+        config = configparser.ConfigParser()
+        config.read(config_path)
+        self.tolerancia_dias = config.getint("CONCILIACION", "tolerancia_dias", fallback=3)
+        self.tolerancia_importe = config.getfloat("CONCILIACION", "tolerancia_importe", fallback=0.0)
+        self.margen_ambiguedad = config.getfloat("CONCILIACION", "margen_ambiguedad", fallback=0.05)
+
+    def _indexar(self, apuntes: Sequence[ApunteContable]) -> Dict[int, Tuple[List[date], List[int]]]:
+        """
+        Agrupa los apuntes por importe en céntimos. Cada grupo guarda las
+        fechas ordenadas y, en paralelo, la posición del apunte en `apuntes`.
+        """
+        grupos: Dict[int, List[Tuple[date, int]]] = {}
+        for i, apunte in enumerate(apuntes):
+            grupos.setdefault(_a_centimos(apunte.importe), []).append((apunte.fecha, i))
+        indice = {}
+        for centimos, entradas in grupos.items():
+            entradas.sort()
+            indice[centimos] = ([f for f, _ in entradas], [i for _, i in entradas])
+        return indice
+
+    def _candidatos(
+        self, indice: Dict[int, Tuple[List[date], List[int]]], fecha: date, importe: float
+    ) -> List[int]:
+        """Posiciones de los apuntes con ese importe dentro de la ventana de días."""
+        centimos = _a_centimos(importe)
+        holgura = _a_centimos(self.tolerancia_importe)
+        desde = date.fromordinal(fecha.toordinal() - self.tolerancia_dias)
+        hasta = date.fromordinal(fecha.toordinal() + self.tolerancia_dias)
+        posiciones = []
+        for clave in range(centimos - holgura, centimos + holgura + 1):
+            grupo = indice.get(clave)
+            if grupo is None:
+                continue
+            fechas, indices = grupo
+            posiciones.extend(indices[bisect_left(fechas, desde):bisect_right(fechas, hasta)])
+        return posiciones
+
+    def _puntuar(self, descripcion: str, apunte: ApunteContable, dias: int) -> float:
+        """Puntuación entre 0 y 1 combinando descripción y cercanía de fechas."""
+        texto_apunte = _normalizar_texto(f"{apunte.descripcion} {apunte.referencia}")
+        similitud = SequenceMatcher(None, descripcion, texto_apunte).ratio() if descripcion and texto_apunte else 0.0
+        cercania = 1.0 - dias / (self.tolerancia_dias + 1)
+        return PESO_DESCRIPCION * similitud + (1 - PESO_DESCRIPCION) * cercania
+
+    def conciliar(
+        self, transacciones: Sequence[Transaccion], apuntes: Sequence[ApunteContable]
+    ) -> ResultadoConciliacion:
+        """
+        Concilia los movimientos del extracto con los apuntes contables.
+
+        Cada apunte se usa como mucho una vez. Los pares se asignan de mejor a
+        peor puntuación; si el mejor candidato de un movimiento no supera al
+        segundo por `margen_ambiguedad`, el movimiento se marca como ambiguo.
+
+        Args:
+            transacciones: Los movimientos extraídos del extracto.
+            apuntes: Los apuntes del libro contable.
+
+        Returns:
+            Un ResultadoConciliacion.
+        """
+        indice = self._indexar(apuntes)
+        resultado = ResultadoConciliacion()
+        pares: List[Tuple[float, int, int, int]] = []
+        opciones: Dict[int, List[Tuple[float, int]]] = {}
+
+        for t_i, transaccion in enumerate(transacciones):
+            fecha = texto_a_fecha(transaccion.fecha)
+            if fecha is None:
+                continue
+            descripcion = _normalizar_texto(transaccion.descripcion)
+            for a_i in self._candidatos(indice, fecha, importe_transaccion(transaccion)):
+                dias = abs((apuntes[a_i].fecha - fecha).days)
+                puntuacion = self._puntuar(descripcion, apuntes[a_i], dias)
+                pares.append((puntuacion, t_i, a_i, dias))
+                opciones.setdefault(t_i, []).append((puntuacion, a_i))
+
+        # Movimientos cuyo mejor candidato no destaca sobre el segundo.
+        ambiguos, en_revision = set(), set()
+        for t_i, candidatos in opciones.items():
+            candidatos.sort(reverse=True)
+            if len(candidatos) > 1 and candidatos[0][0] - candidatos[1][0] < self.margen_ambiguedad:
+                empatados = [a_i for p, a_i in candidatos if candidatos[0][0] - p < self.margen_ambiguedad]
+                ambiguos.add(t_i)
+                en_revision.update(empatados)
+                resultado.ambiguos.append(Ambiguedad(transacciones[t_i], [apuntes[a_i] for a_i in empatados]))
+
+        emparejadas, usados = set(), set()
+        for puntuacion, t_i, a_i, dias in sorted(pares, key=lambda p: p[0], reverse=True):
+            if t_i in ambiguos or t_i in emparejadas or a_i in usados:
+                continue
+            emparejadas.add(t_i)
+            usados.add(a_i)
+            resultado.emparejados.append(Emparejamiento(transacciones[t_i], apuntes[a_i], puntuacion, dias))
+
+        resultado.sin_emparejar_extracto = [
+            t for i, t in enumerate(transacciones) if i not in emparejadas and i not in ambiguos
+        ]
+        resultado.sin_emparejar_libro = [
+            a for i, a in enumerate(apuntes) if i not in usados and i not in en_revision
+        ]
+        logger.info(resultado.resumen())
+        return resultado
+
+    def conciliar_con_csv(
+        self, transacciones: Sequence[Transaccion], ruta_csv: str
+    ) -> ResultadoConciliacion:
+        """Concilia los movimientos con un libro contable exportado a CSV."""
+        return self.conciliar(transacciones, leer_libro_csv(ruta_csv))
+
+
+def escribir_conciliacion_a_csv(resultado: ResultadoConciliacion, output_path: str) -> bool:
+    """
+    Escribe el resultado de una conciliación en un CSV con una fila por
+    movimiento o apunte y una columna 'Estado'.
+
+    Returns:
+        True si el archivo se escribió correctamente, False si ocurrió un error.
+    """
+    headers = ["Estado", "Dia", "Etiqueta", "Importe", "Fila libro", "Fecha libro",
+               "Etiqueta libro", "Referencia libro", "Puntuacion"]
+
+    def fila(estado: str, t: Optional[Transaccion] = None, a: Optional[ApunteContable] = None,
+             puntuacion: Optional[float] = None) -> List:
+        return [
+            estado,
+            t.fecha if t else "",
+            t.descripcion if t else "",
+            f"{importe_transaccion(t) if t else a.importe if a else 0.0:.2f}",
+            a.fila if a else "",
+            a.fecha.strftime("%d-%m-%Y") if a else "",
+            a.descripcion if a else "",
+            a.referencia if a else "",
+            f"{puntuacion:.2f}" if puntuacion is not None else "",
+        ]
+
+    try:
+        with open(output_path, mode="w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(headers)
+            writer.writerows(fila("Emparejado", e.transaccion, e.apunte, e.puntuacion) for e in resultado.emparejados)
+            for ambiguo in resultado.ambiguos:
+                writer.writerows(fila("Ambiguo", ambiguo.transaccion, a) for a in ambiguo.candidatos)
+            writer.writerows(fila("Sin emparejar (extracto)", t) for t in resultado.sin_emparejar_extracto)
+            writer.writerows(fila("Sin emparejar (libro)", a=a) for a in resultado.sin_emparejar_libro)
+        logger.info(f"Informe de conciliación guardado en: {output_path}")
+        return True
+    except Exception as e:
+        logger.error(f"Ocurrió un error al escribir el informe de conciliación: {e}")
+        return False
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+Fichero: costes.py
+Proyecto: Extractor de Movimientos Bancarios con IA
+
+Desarrollado por: IA Punto Soluciones Tecnológicas
+Para: Industrias Pico
+Responsable: MEng Sergio Rondón
+Fecha de Creación: 19/10/2026
+
+Descripción:
+Contabilidad de tokens y coste de la extracción. Cada página anota los
+tokens de entrada y de salida de todas sus llamadas y los bytes subidos; el
+coste se estima con la tabla de precios de la sección [PRECIOS] de
+settings.ini (USD por millón de tokens).
+
+Los consumos se añaden a un archivo JSON Lines junto al log (una línea por
+página y una por ejecución), de donde se calcula también el gasto del día.
+Con presupuestos por ejecución y por día: al superar el blando ya no se
+escala al modelo de respaldo; al superar el duro no se envían más páginas.
+"""
+
+import configparser
+import json
+import logging
+import os
+import threading
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime
+from typing import Any, Dict, List, Set, Tuple
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+ESTADO_NORMAL = "normal"
+ESTADO_BLANDO = "blando"
+ESTADO_DURO = "duro"
+
+
+class PresupuestoExcedido(RuntimeError):
+    """Se superó un presupuesto duro: no se envían más páginas a la API."""
+
+
+@dataclass
+class ConsumoPagina:
+    """Tokens, bytes y coste estimado de una página."""
+
+    pdf_path: str
+    pagina: int
+    llamadas: int = 0
+    tokens_entrada: int = 0
+    tokens_salida: int = 0
+    bytes_subidos: int = 0
+    coste: float = 0.0
+    modelos: List[str] = field(default_factory=list)
+
+
+def tokens_de_respuesta(response: Any) -> Tuple[int, int]:
+    """(tokens de entrada, tokens de salida) de una respuesta, o ceros si la API no los informa."""
+    uso = getattr(response, "usage_metadata", None)
+    entrada = getattr(uso, "prompt_token_count", 0)
+    salida = getattr(uso, "candidates_token_count", 0)
+    return (entrada if isinstance(entrada, int) else 0, salida if isinstance(salida, int) else 0)
+
+
+def _leer_precios(config: configparser.ConfigParser) -> Dict[str, Tuple[float, float]]:
+    """Lee [PRECIOS]: `modelo = precio_entrada, precio_salida` en USD por millón de tokens."""
+    precios: Dict[str, Tuple[float, float]] = {}
+    if not config.has_section("PRECIOS"):
+        return precios
+    for modelo, valor in config.items("PRECIOS"):
+        try:
+            entrada, salida = (float(v) for v in valor.split(","))
+        except ValueError:
+            logger.warning(f"Precio mal formado para {modelo} en [PRECIOS]: {valor!r}; se ignora.")
+            continue
+        precios[modelo.strip().lower()] = (entrada, salida)
+    return precios
+
+
+class ControlCostes:
+    """
+    Lleva el consumo de la ejecución en curso y del día y lo compara con los
+    presupuestos. Es compartido por todos los hilos del extractor.
+    """
+
+    def __init__(self, config_path: str = "config/settings.ini"):
+        config = configparser.ConfigParser()
+        config.read(config_path)
+        self.precios = _leer_precios(config)
+        self.archivo = config.get("COSTES", "archivo", fallback="").strip()
+        self.blando_ejecucion = config.getfloat("COSTES", "presupuesto_ejecucion_blando", fallback=0.0)
+        self.duro_ejecucion = config.getfloat("COSTES", "presupuesto_ejecucion_duro", fallback=0.0)
+        self.blando_diario = config.getfloat("COSTES", "presupuesto_diario_blando", fallback=0.0)
+        self.duro_diario = config.getfloat("COSTES", "presupuesto_diario_duro", fallback=0.0)
+        self._lock = threading.Lock()
+        self._dia = date.today()
+        self.gasto_diario = self._leer_gasto_del_dia(self._dia)
+        self.gasto_ejecucion = 0.0
+        self._avisado: Set[Tuple[str, str]] = set()
+
+    def _leer_gasto_del_dia(self, dia: date) -> float:
+        """Suma el coste de las páginas registradas hoy en el archivo de consumos."""
+        if not self.archivo or not os.path.exists(self.archivo):
+            return 0.0
+        total = 0.0
+        prefijo = dia.isoformat()
+        try:
+            with open(self.archivo, encoding="utf-8") as f:
+                for linea in f:
+                    if '"pagina"' not in linea:
+                        continue
+                    registro = json.loads(linea)
+                    if registro.get("tipo") == "pagina" and registro.get("fecha", "").startswith(prefijo):
+                        total += registro.get("coste", 0.0)
+        except (OSError, ValueError) as e:
+            logger.warning(f"No se pudo leer el archivo de consumos {self.archivo}: {e}")
+        return total
+
+    def coste(self, modelo: str, tokens_entrada: int, tokens_salida: int) -> float:
+        """Coste estimado en USD de una llamada; 0 si el modelo no tiene precio."""
+        entrada, salida = self.precios.get(modelo.lower(), (0.0, 0.0))
+        return (tokens_entrada * entrada + tokens_salida * salida) / 1_000_000
+
+    def iniciar_ejecucion(self) -> None:
+        with self._lock:
+            self.gasto_ejecucion = 0.0
+            self._avisado.clear()
+
+    def estado(self) -> str:
+        """ESTADO_NORMAL, ESTADO_BLANDO o ESTADO_DURO según el presupuesto más restrictivo superado."""
+        with self._lock:
+            if date.today() != self._dia:
+                self._dia = date.today()
+                self.gasto_diario = 0.0
+            superados = [
+                (nivel, nombre) for nivel, nombre, limite, gasto in (
+                    (ESTADO_DURO, "de la ejecución", self.duro_ejecucion, self.gasto_ejecucion),
+                    (ESTADO_DURO, "diario", self.duro_diario, self.gasto_diario),
+                    (ESTADO_BLANDO, "de la ejecución", self.blando_ejecucion, self.gasto_ejecucion),
+                    (ESTADO_BLANDO, "diario", self.blando_diario, self.gasto_diario),
+                ) if limite > 0 and gasto >= limite
+            ]
+            if not superados:
+                return ESTADO_NORMAL
+            if superados[0] not in self._avisado:
+                self._avisado.add(superados[0])
+                logger.warning(f"Presupuesto {superados[0][0]} {superados[0][1]} superado "
+                               f"(ejecución: {self.gasto_ejecucion:.4f} USD, día: {self.gasto_diario:.4f} USD).")
+            return superados[0][0]
+
+    def registrar_pagina(self, consumo: ConsumoPagina, id_ejecucion: str) -> None:
+        """Suma el consumo de una página y lo añade al archivo de consumos."""
+        with self._lock:
+            self.gasto_ejecucion += consumo.coste
+            self.gasto_diario += consumo.coste
+            self._anexar({"tipo": "pagina", "id_ejecucion": id_ejecucion, **asdict(consumo)})
+
+    def registrar_ejecucion(self, id_ejecucion: str, totales: Dict[str, float]) -> None:
+        with self._lock:
+            self._anexar({"tipo": "ejecucion", "id_ejecucion": id_ejecucion, **totales})
+
+    def _anexar(self, registro: Dict) -> None:
+        if not self.archivo:
+            return
+        registro = {"fecha": datetime.now().isoformat(timespec="seconds"), **registro}
+        try:
+            with open(self.archivo, "a", encoding="utf-8") as f:
+                f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.warning(f"No se pudo escribir en el archivo de consumos {self.archivo}: {e}")
@@ -106,4 +106,34 @@ class ExtractoBancario(BaseModel):
     """
     transacciones: List[Transaccion] = Field(
         description="Una lista que contiene todas las líneas de transacción individuales extraídas del documento."
-    )
\ No newline at end of file
+    )
+
+
+class TransaccionCompacta(BaseModel):
+    """
+    Variante de Transaccion con claves cortas para reducir los tokens de
+    salida de la IA. Se convierte a Transaccion con `a_transaccion`.
+    """
+    f: str = Field(description="Fecha en formato 'dd-mm-aaaa'.")
+
+    d: str = Field(description="Descripción tal como aparece en el extracto.")
+
+    db: Annotated[Optional[float], BeforeValidator(clean_number_string)] = Field(
+        default=None, description="Importe del débito, o nulo."
+    )
+
+    cr: Annotated[Optional[float], BeforeValidator(clean_number_string)] = Field(
+        default=None, description="Importe del crédito, o nulo."
+    )
+
+    def a_transaccion(self) -> Transaccion:
+        return Transaccion(fecha=self.f, descripcion=self.d, debito=self.db, credito=self.cr)
+
+
+class ExtractoCompacto(BaseModel):
+    """
+    Variante de ExtractoBancario con claves cortas.
+    """
+    t: List[TransaccionCompacta] = Field(
+        description="Las transacciones de la página."
+    )
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+Fichero: dialectos_csv.py
+Proyecto: Extractor de Movimientos Bancarios con IA
+
+Desarrollado por: IA Punto Soluciones Tecnológicas
+Para: Industrias Pico
+Responsable: MEng Sergio Rondón
+Fecha de Creación: 19/10/2026
+
+Descripción:
+Opciones del CSV de salida leídas de la sección [CSV] de settings.ini:
+codificación, separadores, formato de fecha, compresión gzip y modo de
+anexar. Incluye perfiles con nombre para los destinos habituales, de modo que
+basta con `PERFIL = excel-es` para obtener un CSV que Excel en español abre
+directamente.
+"""
+
+import configparser
+import logging
+from dataclasses import dataclass, replace
+from typing import Any, Dict
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class OpcionesCSV:
+    """Cómo se escribe un CSV de movimientos."""
+
+    encoding: str = "utf-8"
+    delimitador: str = ","
+    separador_decimal: str = "."
+    formato_fecha: str = "dd-mm-aaaa"
+    comprimir: bool = False
+    anexar: bool = False
+    filas_por_lote: int = 5000
+    tamano_buffer: int = 1024 * 1024
+
+
+PERFILES_CSV: Dict[str, OpcionesCSV] = {
+    # Importación de extractos de Odoo (el formato original de la aplicación).
+    "odoo": OpcionesCSV(),
+    # Excel con configuración regional española: ';' y coma decimal, con BOM.
+    "excel-es": OpcionesCSV(encoding="utf-8-sig", delimitador=";", separador_decimal=","),
+    # Fechas ISO para herramientas de datos.
+    "iso": OpcionesCSV(formato_fecha="aaaa-mm-dd"),
+}
+
+PERFIL_POR_DEFECTO = "odoo"
+
+# Orden importante: "aaaa" antes que "aa".
+_TOKENS_FECHA = (("aaaa", "%Y"), ("yyyy", "%Y"), ("aa", "%y"), ("yy", "%y"), ("dd", "%d"), ("mm", "%m"))
+
+
+def formato_fecha_a_strftime(formato: str) -> str:
+    """Convierte un formato como 'dd-mm-aaaa' en el equivalente de strftime."""
+    resultado = formato.lower()
+    for token, directiva in _TOKENS_FECHA:
+        resultado = resultado.replace(token, directiva)
+    return resultado
+
+
+def cargar_opciones_csv(config_path: str = "config/settings.ini") -> OpcionesCSV:
+    """
+    Lee las opciones del CSV de la sección [CSV]. Se parte del perfil
+    indicado en PERFIL y cada clave presente en la sección lo sustituye.
+
+    Raises:
+        ValueError: Si el perfil no existe.
+    """
+    config = configparser.ConfigParser()
+    config.read(config_path)
+    nombre = config.get("CSV", "perfil", fallback=PERFIL_POR_DEFECTO).strip().lower()
+    if nombre not in PERFILES_CSV:
+        raise ValueError(f"Perfil de CSV desconocido: '{nombre}'. Disponibles: {', '.join(PERFILES_CSV)}")
+    opciones = PERFILES_CSV[nombre]
+
+    cambios: Dict[str, Any] = {}
+    if config.has_option("CSV", "csv_encoding"):
+        cambios["encoding"] = config.get("CSV", "csv_encoding").strip()
+    if config.has_option("CSV", "csv_delimiter"):
+        # Un separador vacío en el .ini se interpreta como tabulador.
+        cambios["delimitador"] = config.get("CSV", "csv_delimiter").strip() or "\t"
+    if config.has_option("CSV", "separador_decimal"):
+        cambios["separador_decimal"] = config.get("CSV", "separador_decimal").strip()
+    if config.has_option("CSV", "date_format"):
+        cambios["formato_fecha"] = config.get("CSV", "date_format").strip()
+    if config.has_option("CSV", "comprimir_gzip"):
+        cambios["comprimir"] = config.getboolean("CSV", "comprimir_gzip")
+    if config.has_option("CSV", "modo_anexar"):
+        cambios["anexar"] = config.getboolean("CSV", "modo_anexar")
+    return replace(opciones, **cambios)
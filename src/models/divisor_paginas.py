@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+Fichero: divisor_paginas.py
+Proyecto: Extractor de Movimientos Bancarios con IA
+
+Desarrollado por: IA Punto Soluciones Tecnológicas
+Para: Industrias Pico
+Responsable: MEng Sergio Rondón
+Fecha de Creación: 19/10/2026
+
+Descripción:
+División de las páginas densas (muchas filas de movimientos) en franjas
+horizontales que se solapan ligeramente, para extraerlas en paralelo con
+respuestas más cortas, y unión posterior de los resultados eliminando las
+filas repetidas en las zonas de solape.
+
+Cada franja se rasteriza a JPEG recortando la página, así que hace falta
+PyMuPDF. Recortar solo la caja visible de un PDF no basta: el contenido de
+fuera de la franja sigue en el archivo y el modelo lo lee igualmente.
+"""
+
+import logging
+import os
+import unicodedata
+from typing import List, Sequence, Tuple
+
+from .data_models import Transaccion
+from .optimizador_paginas import MIME_JPEG, PYMUPDF_DISPONIBLE
+
+if PYMUPDF_DISPONIBLE:
+    import fitz  # PyMuPDF
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+_NOTA_FRANJA = (
+    "\nEste archivo es solo la franja {franja} de {total} de la página, de arriba "
+    "abajo; las franjas se solapan un poco. Extrae únicamente las filas completas "
+    "que se ven en esta franja."
+)
+
+
+def nota_franja(franja: int, total: int) -> str:
+    """Instrucción adicional para extraer una franja de la página."""
+    return _NOTA_FRANJA.format(franja=franja, total=total)
+
+
+def _limites_franjas(alto: float, franjas: int, solape: float) -> List[Tuple[float, float]]:
+    """Límites (desde arriba) de cada franja, ampliados con el solape."""
+    paso = alto / franjas
+    margen = alto * solape / 2
+    return [
+        (max(0.0, k * paso - margen), min(alto, (k + 1) * paso + margen))
+        for k in range(franjas)
+    ]
+
+
+def dividir_en_franjas(
+    ruta_pagina: str,
+    franjas: int,
+    solape: float = 0.1,
+    dpi: int = 150,
+    calidad_jpeg: int = 75,
+) -> List[Tuple[str, str]]:
+    """
+    Divide un PDF de una página en franjas horizontales rasterizadas.
+
+    Args:
+        ruta_pagina: El PDF de una sola página.
+        franjas: Número de franjas.
+        solape: Fracción del alto de la página que comparten dos franjas
+                consecutivas.
+        dpi: Resolución de las franjas.
+        calidad_jpeg: Calidad JPEG de las franjas.
+
+    Returns:
+        Una lista de tuplas (ruta, mime_type), de arriba abajo. Los archivos
+        se crean junto a `ruta_pagina`.
+
+    Raises:
+        RuntimeError: Si PyMuPDF no está instalado.
+    """
+    if not PYMUPDF_DISPONIBLE:
+        raise RuntimeError("La división en franjas requiere PyMuPDF.")
+
+    base = os.path.splitext(ruta_pagina)[0]
+    resultado = []
+    with fitz.open(ruta_pagina) as doc:
+        pagina = doc[0]
+        rect = pagina.rect
+        for k, (y0, y1) in enumerate(_limites_franjas(rect.height, franjas, solape), start=1):
+            pixmap = pagina.get_pixmap(dpi=dpi, clip=fitz.Rect(rect.x0, rect.y0 + y0, rect.x1, rect.y0 + y1))
+            ruta = f"{base}_franja{k}.jpg"
+            with open(ruta, "wb") as f:
+                f.write(pixmap.tobytes("jpeg", jpg_quality=calidad_jpeg))
+            resultado.append((ruta, MIME_JPEG))
+    return resultado
+
+
+def _clave(transaccion: Transaccion) -> Tuple:
+    return (transaccion.fecha, transaccion.debito, transaccion.credito)
+
+
+def _normalizar(texto: str) -> str:
+    sin_tildes = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode()
+    return " ".join(sin_tildes.upper().split())
+
+
+def _misma_fila(a: Transaccion, b: Transaccion) -> bool:
+    """
+    Dos filas son la misma si coinciden fecha e importes y una descripción
+    empieza como la otra: en el borde de una franja la descripción puede
+    aparecer cortada.
+    """
+    if _clave(a) != _clave(b):
+        return False
+    da, db = _normalizar(a.descripcion), _normalizar(b.descripcion)
+    return da.startswith(db) or db.startswith(da)
+
+
+def unir_franjas(resultados: Sequence[List[Transaccion]]) -> List[Transaccion]:
+    """
+    Une las transacciones de las franjas de una página en orden. En cada
+    costura se busca el mayor bloque de filas con el que termina la franja
+    anterior y empieza la siguiente, y se conserva una sola copia (la de
+    descripción más larga).
+    """
+    unidas: List[Transaccion] = []
+    for transacciones in resultados:
+        solape = 0
+        for k in range(min(len(unidas), len(transacciones)), 0, -1):
+            if all(_misma_fila(a, b) for a, b in zip(unidas[-k:], transacciones[:k])):
+                solape = k
+                break
+        for desplazamiento in range(solape):
+            anterior, nueva = unidas[len(unidas) - solape + desplazamiento], transacciones[desplazamiento]
+            if len(nueva.descripcion) > len(anterior.descripcion):
+                unidas[len(unidas) - solape + desplazamiento] = nueva
+        if solape:
+            logger.debug(f"Costura entre franjas: {solape} filas repetidas descartadas.")
+        unidas.extend(transacciones[solape:])
+    return unidas
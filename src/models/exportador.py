@@ -0,0 +1,363 @@
+# -*- coding: utf-8 -*-
+"""
+Fichero: exportador.py
+Proyecto: Extractor de Movimientos Bancarios con IA
+
+Desarrollado por: IA Punto Soluciones Tecnológicas
+Para: Industrias Pico
+Responsable: MEng Sergio Rondón
+Fecha de Creación: 19/10/2026
+
+Descripción:
+Exportación de las transacciones a uno o varios formatos en una sola pasada.
+La lista se valida una vez y cada transacción se convierte una vez a una fila
+normalizada (`FilaExportacion`) que se reparte a todos los destinos a la vez:
+CSV, Excel, Parquet, JSON Lines y SQLite. Con un canonizador de comercios,
+las filas llevan además el comercio canónico, que se escribe en los formatos
+de análisis (Parquet, JSON Lines y SQLite); el CSV y el Excel mantienen las
+columnas de la importación de Odoo.
+
+Un destino que falla se descarta sin afectar a los demás.
+"""
+
+import csv
+import gzip
+import json
+import logging
+import os
+import sqlite3
+from datetime import date
+from typing import IO, Dict, List, NamedTuple, Optional, Sequence, cast
+
+import openpyxl
+from openpyxl.styles import Alignment, Font, PatternFill
+
+from .canonizador_comercios import CanonizadorComercios
+from .data_models import Transaccion
+from .dialectos_csv import OpcionesCSV, formato_fecha_a_strftime
+from .normalizador_fechas import texto_a_fecha
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    PYARROW_DISPONIBLE = True
+except ImportError:
+    PYARROW_DISPONIBLE = False
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+
+class FilaExportacion(NamedTuple):
+    """Representación común de una transacción para todos los destinos."""
+
+    fecha: str
+    fecha_valor: Optional[date]
+    descripcion: str
+    debito: Optional[float]
+    credito: Optional[float]
+    comercio: Optional[str] = None
+
+
+def normalizar_filas(
+    transacciones: Sequence[Transaccion], canonizador: Optional[CanonizadorComercios] = None
+) -> Optional[List[FilaExportacion]]:
+    """
+    Valida la lista y la convierte a filas normalizadas, con el comercio
+    canónico de cada descripción si se pasa un canonizador.
+
+    Returns:
+        La lista de filas, o None si la lista está vacía o contiene elementos
+        que no son Transaccion.
+    """
+    if not transacciones:
+        logger.warning("No se encontraron transacciones para exportar.")
+        return None
+    if not all(isinstance(t, Transaccion) for t in transacciones):
+        logger.error("La lista contiene elementos que no son instancias de Transaccion")
+        return None
+    return [
+        FilaExportacion(
+            t.fecha,
+            texto_a_fecha(t.fecha),
+            t.descripcion,
+            float(t.debito) if t.debito is not None else None,
+            float(t.credito) if t.credito is not None else None,
+            canonizador.canonizar(t.descripcion) if canonizador else None,
+        )
+        for t in transacciones
+    ]
+
+
+def _importe_texto(importe: Optional[float]) -> str:
+    return f"{importe:.2f}" if importe is not None else ""
+
+
+class DestinoExportacion:
+    """
+    Un formato de salida. `abrir` se llama antes de la primera fila,
+    `escribir` una vez por fila y `cerrar` al final; `descartar` libera los
+    recursos si el destino falla a mitad.
+    """
+
+    nombre = ""
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+
+    def abrir(self) -> None:
+        pass
+
+    def escribir(self, fila: FilaExportacion) -> None:
+        raise NotImplementedError
+
+    def cerrar(self) -> None:
+        pass
+
+    def descartar(self) -> None:
+        pass
+
+
+class DestinoCSV(DestinoExportacion):
+    """
+    CSV con las columnas que espera la importación de Odoo. El dialecto, el
+    formato de fecha, la compresión y el modo de anexar vienen de
+    OpcionesCSV. Las filas se acumulan y se escriben por lotes con
+    `writerows` sobre un buffer grande.
+    """
+
+    nombre = "CSV"
+    cabeceras = ["Dia", "Etiqueta", "Debit", "Credit"]
+
+    def __init__(self, ruta: str, opciones: Optional[OpcionesCSV] = None):
+        self.opciones = opciones or OpcionesCSV()
+        if self.opciones.comprimir and not ruta.endswith(".gz"):
+            ruta += ".gz"
+        super().__init__(ruta)
+        self._formato_fecha = formato_fecha_a_strftime(self.opciones.formato_fecha)
+        self._pendientes: List[tuple] = []
+
+    def abrir(self) -> None:
+        modo = "at" if self.opciones.anexar else "wt"
+        nuevo = not (self.opciones.anexar and os.path.exists(self.ruta) and os.path.getsize(self.ruta) > 0)
+        self._archivo: IO[str]
+        if self.opciones.comprimir:
+            # El modo es de texto ("at"/"wt"), aunque el tipo de gzip.open no lo refleje.
+            self._archivo = cast(IO[str], gzip.open(self.ruta, modo, encoding=self.opciones.encoding, newline=""))
+        else:
+            self._archivo = open(self.ruta, mode=modo, newline="", encoding=self.opciones.encoding,
+                                 buffering=self.opciones.tamano_buffer)
+        self._writer = csv.writer(self._archivo, delimiter=self.opciones.delimitador)
+        if nuevo:
+            self._writer.writerow(self.cabeceras)
+
+    def _importe(self, importe: Optional[float]) -> str:
+        texto = _importe_texto(importe)
+        return texto.replace(".", self.opciones.separador_decimal) if self.opciones.separador_decimal != "." else texto
+
+    def escribir(self, fila: FilaExportacion) -> None:
+        self._pendientes.append((
+            fila.fecha_valor.strftime(self._formato_fecha) if fila.fecha_valor else fila.fecha,
+            fila.descripcion,
+            self._importe(fila.debito),
+            self._importe(fila.credito),
+        ))
+        if len(self._pendientes) >= self.opciones.filas_por_lote:
+            self._volcar()
+
+    def _volcar(self) -> None:
+        self._writer.writerows(self._pendientes)
+        self._pendientes.clear()
+
+    def cerrar(self) -> None:
+        self._volcar()
+        self._archivo.close()
+
+    def descartar(self) -> None:
+        if getattr(self, "_archivo", None):
+            self._archivo.close()
+
+
+class DestinoExcel(DestinoExportacion):
+    """Hoja de Excel con cabeceras con estilo, fechas reales e importes con formato."""
+
+    nombre = "Excel"
+    cabeceras = ["Día", "Etiqueta", "Debit", "Credit"]
+
+    def abrir(self) -> None:
+        self._libro = openpyxl.Workbook()
+        self._hoja = self._libro.active
+        self._hoja.title = "Movimientos"
+        self._hoja.append(self.cabeceras)
+        for celda in self._hoja[1]:
+            celda.font = Font(bold=True, color="FFFFFF")
+            celda.fill = PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")
+            celda.alignment = Alignment(horizontal="center", vertical="center")
+        self._anchos = [len(c) for c in self.cabeceras]
+
+    def escribir(self, fila: FilaExportacion) -> None:
+        # Fecha como valor de fecha real para que Excel pueda ordenar y filtrar
+        valores = (fila.fecha_valor or fila.fecha, fila.descripcion, fila.debito, fila.credito)
+        self._hoja.append(valores)
+        celdas = self._hoja[self._hoja.max_row]
+        if fila.fecha_valor is not None:
+            celdas[0].number_format = "DD-MM-YYYY"
+        for celda in celdas[2:]:
+            if celda.value is not None:
+                celda.number_format = "#,##0.00"
+        for i, valor in enumerate((fila.fecha, fila.descripcion, _importe_texto(fila.debito),
+                                   _importe_texto(fila.credito))):
+            self._anchos[i] = max(self._anchos[i], len(valor))
+
+    def cerrar(self) -> None:
+        for celdas, ancho in zip(self._hoja.columns, self._anchos):
+            self._hoja.column_dimensions[celdas[0].column_letter].width = ancho + 2
+        self._libro.save(self.ruta)
+
+
+class DestinoJSONL(DestinoExportacion):
+    """Un objeto JSON por línea, con la fecha en formato ISO."""
+
+    nombre = "JSON Lines"
+
+    def abrir(self) -> None:
+        self._archivo = open(self.ruta, mode="w", encoding="utf-8")
+
+    def escribir(self, fila: FilaExportacion) -> None:
+        objeto = {
+            "fecha": fila.fecha_valor.isoformat() if fila.fecha_valor else fila.fecha,
+            "descripcion": fila.descripcion,
+            "debito": fila.debito,
+            "credito": fila.credito,
+        }
+        if fila.comercio is not None:
+            objeto["comercio"] = fila.comercio
+        self._archivo.write(json.dumps(objeto, ensure_ascii=False))
+        self._archivo.write("\n")
+
+    def cerrar(self) -> None:
+        self._archivo.close()
+
+    def descartar(self) -> None:
+        if getattr(self, "_archivo", None):
+            self._archivo.close()
+
+
+class DestinoParquet(DestinoExportacion):
+    """Archivo Parquet con columnas tipadas (requiere pyarrow)."""
+
+    nombre = "Parquet"
+
+    def abrir(self) -> None:
+        if not PYARROW_DISPONIBLE:
+            raise RuntimeError("La exportación a Parquet requiere instalar pyarrow.")
+        self._columnas: Dict[str, list] = {
+            "fecha": [], "descripcion": [], "debito": [], "credito": [], "comercio": []
+        }
+
+    def escribir(self, fila: FilaExportacion) -> None:
+        self._columnas["fecha"].append(fila.fecha_valor)
+        self._columnas["descripcion"].append(fila.descripcion)
+        self._columnas["debito"].append(fila.debito)
+        self._columnas["credito"].append(fila.credito)
+        self._columnas["comercio"].append(fila.comercio)
+
+    def cerrar(self) -> None:
+        esquema = pa.schema([
+            ("fecha", pa.date32()),
+            ("descripcion", pa.string()),
+            ("debito", pa.float64()),
+            ("credito", pa.float64()),
+            ("comercio", pa.string()),
+        ])
+        pq.write_table(pa.table(self._columnas, schema=esquema), self.ruta)
+
+
+class DestinoSQLite(DestinoExportacion):
+    """Tabla `movimientos` en una base de datos SQLite; se reemplaza si existe."""
+
+    nombre = "SQLite"
+
+    def abrir(self) -> None:
+        self._conexion = sqlite3.connect(self.ruta)
+        self._conexion.execute("DROP TABLE IF EXISTS movimientos")
+        self._conexion.execute(
+            "CREATE TABLE movimientos (fecha TEXT, descripcion TEXT, debito REAL, credito REAL, comercio TEXT)"
+        )
+        self._filas: List[tuple] = []
+
+    def escribir(self, fila: FilaExportacion) -> None:
+        self._filas.append(
+            (fila.fecha_valor.isoformat() if fila.fecha_valor else fila.fecha,
+             fila.descripcion, fila.debito, fila.credito, fila.comercio)
+        )
+
+    def cerrar(self) -> None:
+        with self._conexion:
+            self._conexion.executemany("INSERT INTO movimientos VALUES (?, ?, ?, ?, ?)", self._filas)
+        self._conexion.close()
+
+    def descartar(self) -> None:
+        if getattr(self, "_conexion", None):
+            self._conexion.close()
+
+
+def _abrir_destinos(destinos: Sequence[DestinoExportacion], total: int) -> List[DestinoExportacion]:
+    """Abre los destinos y devuelve los que se pudieron abrir."""
+    activos = []
+    for destino in destinos:
+        try:
+            destino.abrir()
+            activos.append(destino)
+            logger.info(f"Escribiendo {total} transacciones en {destino.nombre}: {destino.ruta}")
+        except Exception as e:
+            logger.error(f"No se pudo abrir el destino {destino.nombre} ({destino.ruta}): {e}")
+    return activos
+
+
+def _escribir_filas(filas: Sequence[FilaExportacion], activos: List[DestinoExportacion]) -> None:
+    """Escribe cada fila en los destinos activos; el que falla se descarta y sale de la lista."""
+    for fila in filas:
+        for destino in list(activos):
+            try:
+                destino.escribir(fila)
+            except Exception as e:
+                logger.error(f"Error al escribir en {destino.nombre} ({destino.ruta}): {e}")
+                destino.descartar()
+                activos.remove(destino)
+
+
+def exportar_transacciones(
+    transacciones: Sequence[Transaccion],
+    destinos: Sequence[DestinoExportacion],
+    canonizador: Optional[CanonizadorComercios] = None,
+) -> Dict[str, bool]:
+    """
+    Escribe las transacciones en todos los destinos recorriendo la lista una
+    sola vez.
+
+    Args:
+        transacciones: Una lista que contiene los objetos Transaccion extraídos.
+        destinos: Los destinos de exportación.
+        canonizador: Canonizador de comercios opcional.
+
+    Returns:
+        Un diccionario ruta -> True si ese destino se escribió correctamente.
+    """
+    resultados = {destino.ruta: False for destino in destinos}
+    filas = normalizar_filas(transacciones, canonizador)
+    if filas is None:
+        return resultados
+
+    activos = _abrir_destinos(destinos, len(filas))
+    _escribir_filas(filas, activos)
+    for destino in activos:
+        try:
+            destino.cerrar()
+            resultados[destino.ruta] = True
+            logger.info(f"Archivo {destino.nombre} generado exitosamente.")
+        except Exception as e:
+            logger.error(f"Error al guardar {destino.nombre} ({destino.ruta}): {e}")
+            destino.descartar()
+    return resultados
@@ -0,0 +1,354 @@
+# -*- coding: utf-8 -*-
+"""
+Fichero: extractor_async.py
+Proyecto: Extractor de Movimientos Bancarios con IA
+
+Desarrollado por: IA Punto Soluciones Tecnológicas
+Para: Industrias Pico
+Responsable: MEng Sergio Rondón
+Fecha de Creación: 19/10/2026
+
+Descripción:
+Motor de extracción asíncrono para integrar el extractor en servicios con
+bucle de eventos (asyncio). Las llamadas a Gemini usan los métodos
+asíncronos de la librería (`generate_content_async`), de modo que un solo
+bucle mantiene cientos de páginas en vuelo de varios extractos sin un hilo
+por llamada. El número de llamadas en vuelo (páginas o franjas) se limita
+con un semáforo.
+
+La librería no ofrece subida de archivos asíncrona: la subida, la división
+de los PDF y de las páginas densas en franjas, el parseo de la capa de texto
+y la lectura con los perfiles de banco se ejecutan en hilos auxiliares
+(`asyncio.to_thread`). La configuración, el pool de claves, las plantillas,
+la cascada de modelos, las continuaciones, los perfiles de banco, las
+franjas, la contabilidad de costes y el posprocesado de los documentos son
+los del extractor síncrono: aquí solo se esperan las llamadas y las
+decisiones se toman con los mismos métodos.
+"""
+
+import asyncio
+import configparser
+import logging
+import os
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from google.generativeai.types import file_types
+
+from src.models.costes import ESTADO_DURO, ConsumoPagina, PresupuestoExcedido
+from src.models.data_models import Transaccion
+from src.models.extractor_ia import PAGINAS_CABECERA, ExtractorIA
+from src.models.informe_ejecucion import InformeEjecucion
+from src.models.normalizador_fechas import detectar_periodo
+from src.models.parser_respuesta import ResultadoParseo
+from src.models.pool_claves import ERRORES_CUOTA, ClaveAPI
+from src.models.preprocesador_pdf import DescriptorPagina, preprocesar_pdf
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ResultadoPagina:
+    """Resultado de una página: sus transacciones o el error que la hizo fallar."""
+
+    pdf_path: str
+    numero_pagina: int
+    total_paginas: int
+    transacciones: Optional[List[Transaccion]] = None
+    error: Optional[BaseException] = None
+
+
+class AsyncExtractorIA(ExtractorIA):
+    """
+    Extractor con API asíncrona. Los métodos síncronos heredados siguen
+    disponibles; los asíncronos no usan el pool de hilos de la API.
+    """
+
+    def __init__(self, config_path: str = "config/settings.ini"):
+        super().__init__(config_path)
+        config = configparser.ConfigParser()
+        config.read(config_path)
+        self.max_paginas_async = max(1, config.getint("PROCESAMIENTO", "max_paginas_async", fallback=64))
+
+    async def iterar_paginas(
+        self, pdf_paths: Sequence[str], informe: Optional[InformeEjecucion] = None
+    ) -> AsyncIterator[ResultadoPagina]:
+        """
+        Procesa varios PDF a la vez y entrega el resultado de cada página en
+        cuanto termina, en orden de llegada. Las páginas sin movimientos se
+        omiten y quedan en el informe; un documento que no se puede dividir
+        se entrega como un resultado con `numero_pagina` 0 y su error.
+
+        Args:
+            pdf_paths: Rutas de los PDF.
+            informe: Informe de la ejecución; por defecto, uno nuevo que queda
+                     en `ultimo_informe`.
+        """
+        if informe is None:
+            self.ultimo_informe = informe = InformeEjecucion()
+            self.costes.iniciar_ejecucion()
+        async for resultado in self._iterar(pdf_paths, informe, {}):
+            yield resultado
+
+    async def extraer_async(self, pdf_paths: Sequence[str]) -> Dict[str, Optional[List[Transaccion]]]:
+        """
+        Versión asíncrona de `ExtractorIA.extraer_transacciones_de_pdfs`: las
+        transacciones de cada documento en orden de página, o None si alguna
+        página falló.
+        """
+        logger.info(f"Iniciando procesamiento asíncrono de {len(pdf_paths)} archivo(s).")
+        self.ultimo_informe = informe = InformeEjecucion()
+        self.costes.iniciar_ejecucion()
+        documentos: Dict[str, Tuple[List[DescriptorPagina], Optional[Tuple]]] = {}
+        tareas: Dict[str, List[asyncio.Task]] = {}
+        paginas: Dict[str, Dict[int, List[Transaccion]]] = {pdf_path: {} for pdf_path in pdf_paths}
+        fallidos = set()
+
+        async for resultado in self._iterar(pdf_paths, informe, documentos, tareas):
+            pdf_path = resultado.pdf_path
+            if resultado.error is not None:
+                logger.error(f"Error crítico durante la extracción de {pdf_path}: {resultado.error}")
+                fallidos.add(pdf_path)
+                # El documento ya no se puede completar: sus demás páginas no se envían.
+                for tarea in tareas.get(pdf_path, []):
+                    tarea.cancel()
+            elif pdf_path not in fallidos and resultado.transacciones is not None:
+                paginas[pdf_path][resultado.numero_pagina] = resultado.transacciones
+                informe.registrar_procesada()
+
+        resultados: Dict[str, Optional[List[Transaccion]]] = {}
+        for pdf_path in pdf_paths:
+            if pdf_path in fallidos or pdf_path not in documentos:
+                resultados[pdf_path] = None
+                continue
+            a_procesar, periodo = documentos[pdf_path]
+            por_pagina = [paginas[pdf_path][d.numero_pagina] for d in a_procesar]
+            resultados[pdf_path] = self._finalizar_documento(pdf_path, por_pagina, informe, a_procesar, periodo)
+
+        informe.registrar_en_log()
+        if self.perfiles is not None:
+            self.perfiles.guardar()
+        self.costes.registrar_ejecucion(informe.id_ejecucion, {
+            "paginas": informe.paginas_procesadas,
+            "tokens_entrada": informe.tokens_entrada,
+            "tokens_salida": informe.tokens_salida,
+            "bytes_subidos": informe.bytes_subidos,
+            "coste": round(informe.coste, 6),
+        })
+        return resultados
+
+    async def _iterar(
+        self,
+        pdf_paths: Sequence[str],
+        informe: InformeEjecucion,
+        documentos: Dict[str, Tuple[List[DescriptorPagina], Optional[Tuple]]],
+        tareas: Optional[Dict[str, List[asyncio.Task]]] = None,
+    ) -> AsyncIterator[ResultadoPagina]:
+        """
+        Divide los documentos en hilos auxiliares y lanza una tarea por
+        página; el semáforo limita sus llamadas a la API. Anota en `documentos` las páginas
+        enviadas y el periodo de cada documento dividido, y en `tareas` las
+        tareas de sus páginas, para poder cancelarlas.
+        """
+        semaforo = asyncio.Semaphore(self.max_paginas_async)
+        cola: asyncio.Queue = asyncio.Queue()
+        temp_dir = tempfile.mkdtemp()
+        tareas = {} if tareas is None else tareas
+
+        async def producir() -> None:
+            try:
+                await asyncio.gather(*(
+                    self._documento_async(pdf_path, os.path.join(temp_dir, f"doc_{i + 1}"), informe,
+                                          semaforo, cola, documentos, tareas)
+                    for i, pdf_path in enumerate(pdf_paths)
+                ))
+            finally:
+                await cola.put(None)
+
+        productor = asyncio.create_task(producir())
+        try:
+            while (resultado := await cola.get()) is not None:
+                yield resultado
+        finally:
+            productor.cancel()
+            await asyncio.gather(productor, return_exceptions=True)
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    async def _documento_async(
+        self,
+        pdf_path: str,
+        output_dir: str,
+        informe: InformeEjecucion,
+        semaforo: asyncio.Semaphore,
+        cola: asyncio.Queue,
+        documentos: Dict[str, Tuple[List[DescriptorPagina], Optional[Tuple]]],
+        tareas: Dict[str, List[asyncio.Task]],
+    ) -> None:
+        """Divide un documento y espera a sus páginas; las canceladas no interrumpen el lote."""
+        try:
+            descriptores = await asyncio.to_thread(preprocesar_pdf, pdf_path, output_dir, self.opciones_preprocesado)
+        except Exception as e:
+            logger.error(f"Error al dividir el PDF {pdf_path}: {e}", exc_info=True)
+            await cola.put(ResultadoPagina(pdf_path, 0, 0, error=e))
+            return
+        informe.registrar_paginas(len(descriptores))
+        a_procesar = [d for d in descriptores if not self._omitir_pagina(d, informe)]
+        documentos[pdf_path] = (
+            a_procesar, detectar_periodo("\n".join(d.texto for d in descriptores[:PAGINAS_CABECERA]))
+        )
+        tareas[pdf_path] = [
+            asyncio.create_task(self._pagina_async(d, informe, semaforo, cola)) for d in a_procesar
+        ]
+        await asyncio.gather(*tareas[pdf_path], return_exceptions=True)
+
+    async def _pagina_async(
+        self, descriptor: DescriptorPagina, informe: InformeEjecucion, semaforo: asyncio.Semaphore, cola: asyncio.Queue
+    ) -> None:
+        """Extrae una página y deja su resultado en la cola."""
+        resultado = ResultadoPagina(descriptor.pdf_path, descriptor.numero_pagina, descriptor.total_paginas)
+        try:
+            resultado.transacciones = await self._extraer_pagina_async(descriptor, informe, semaforo)
+        except Exception as e:
+            resultado.error = e
+        await cola.put(resultado)
+
+    async def _extraer_pagina_async(
+        self, descriptor: DescriptorPagina, informe: InformeEjecucion, semaforo: asyncio.Semaphore
+    ) -> List[Transaccion]:
+        """
+        Versión asíncrona de `_procesar_pagina_con_limite`: lee la página con
+        el perfil de su banco si lo hay, si no la extrae con la IA (por
+        franjas si es densa o sigue truncada) y aprende el perfil.
+        """
+        lectura, locales = None, None
+        if self.perfiles is not None:
+            lectura, locales = await asyncio.to_thread(self._leer_localmente, descriptor, informe)
+            if locales is not None:
+                return locales
+
+        if self._dividir_por_densidad(descriptor, informe):
+            transacciones = await self._procesar_por_franjas_async(descriptor, informe, semaforo)
+        else:
+            async with semaforo:
+                transacciones = await self.procesar_pagina_async(descriptor, informe)
+            if self._dividir_por_truncado(descriptor, informe):
+                transacciones = await self._procesar_por_franjas_async(descriptor, informe, semaforo)
+
+        if lectura is not None:
+            await asyncio.to_thread(self._aprender_perfil, descriptor, lectura, transacciones, informe)
+        return transacciones
+
+    async def _procesar_por_franjas_async(
+        self, descriptor: DescriptorPagina, informe: InformeEjecucion, semaforo: asyncio.Semaphore
+    ) -> List[Transaccion]:
+        """Extrae las franjas de la página a la vez, cada una dentro del semáforo (ver `_procesar_por_franjas`)."""
+        subdescriptores = await asyncio.to_thread(self._descriptores_franjas, descriptor)
+
+        async def procesar_franja(subdescriptor: DescriptorPagina) -> List[Transaccion]:
+            async with semaforo:
+                return await self.procesar_pagina_async(subdescriptor, informe)
+
+        resultados = await asyncio.gather(*(procesar_franja(d) for d in subdescriptores))
+        return self._unir_resultados_franjas(descriptor, list(resultados))
+
+    async def procesar_pagina_async(
+        self, descriptor: DescriptorPagina, informe: InformeEjecucion
+    ) -> List[Transaccion]:
+        """
+        Procesa una página con la clave de API menos cargada; con la cuota
+        agotada se repite con otra clave del pool, como en `_procesar_pagina`.
+
+        Raises:
+            PresupuestoExcedido: Si se superó un presupuesto duro de coste.
+        """
+        if self.costes.estado() == ESTADO_DURO:
+            raise PresupuestoExcedido(
+                f"Presupuesto de coste agotado; no se envía la página {descriptor.numero_pagina}."
+            )
+        for intento in range(1, len(self.pool_claves) + 1):
+            async with self.pool_claves.adquirir_async() as clave:
+                try:
+                    transacciones = await self._procesar_pagina_con_clave_async(descriptor, informe, clave)
+                except ERRORES_CUOTA:
+                    self.pool_claves.registrar_error_cuota(clave)
+                    informe.incrementar("errores_cuota")
+                    if intento == len(self.pool_claves):
+                        raise
+                    logger.warning(f"Página {descriptor.numero_pagina}: cuota agotada en la {clave.nombre}; "
+                                   f"se repite con otra clave.")
+                    continue
+                self.pool_claves.registrar_exito(clave)
+                return transacciones
+        # El último intento propaga su error de cuota, así que aquí no se llega.
+        raise RuntimeError(f"Página {descriptor.numero_pagina}: no quedan claves de API que probar.")
+
+    async def _procesar_pagina_con_clave_async(
+        self, descriptor: DescriptorPagina, informe: InformeEjecucion, clave: ClaveAPI
+    ) -> List[Transaccion]:
+        """Sube la página y la extrae con la cascada de modelos (ver `_procesar_pagina_con_clave`)."""
+        i = descriptor.numero_pagina
+        clave.preparar_async()
+        pdf_file = await asyncio.to_thread(clave.subir, descriptor.ruta_subida, descriptor.mime_type)
+        logger.info(f"Página {i} subida con la {clave.nombre}. ID: {pdf_file.name}")
+
+        nota, niveles, consumo = self._preparar_cascada(descriptor)
+        transacciones: List[Transaccion] = []
+        try:
+            for nivel in range(niveles):
+                informe.registrar_pagina(self._nombre_modelo(nivel))
+                candidatas, resultado = await self._extraer_con_modelo_async(
+                    pdf_file, i, nivel, informe, nota, clave, consumo
+                )
+                transacciones, aceptada = self._evaluar_nivel(
+                    descriptor, nivel, niveles, candidatas, transacciones, resultado, informe
+                )
+                if aceptada:
+                    break
+        finally:
+            self._cerrar_consumo(consumo, informe)
+        return self._fin_de_pagina(i, transacciones)
+
+    async def _extraer_con_modelo_async(
+        self,
+        pdf_file: file_types.File,
+        i: int,
+        nivel: int,
+        informe: InformeEjecucion,
+        nota: str,
+        clave: ClaveAPI,
+        consumo: ConsumoPagina,
+    ) -> Tuple[List[Transaccion], ResultadoParseo]:
+        """Extrae una página ya subida, pidiendo continuaciones si llega truncada (ver `_extraer_con_modelo`)."""
+        prompt: Optional[str] = self._construir_prompt(i) + nota
+        transacciones: List[Transaccion] = []
+        continuaciones = 0
+        while prompt is not None:
+            response = await self._generar_async([prompt, pdf_file], i, nivel, informe, clave, consumo)
+            resultado = self._parsear_pagina(response, i, informe)
+            transacciones = self._unir_continuacion(transacciones, resultado.transacciones)
+            prompt = self._siguiente_continuacion(i, resultado, transacciones, continuaciones, nota, informe)
+            continuaciones += 1
+        self._depurar_respuesta_vacia(i, transacciones, response)
+        return transacciones, resultado
+
+    async def _generar_async(
+        self,
+        contenido: list,
+        numero_pagina: int,
+        nivel: int,
+        informe: InformeEjecucion,
+        clave: ClaveAPI,
+        consumo: ConsumoPagina,
+    ) -> Any:
+        """Llama a generate_content_async con el modelo del nivel indicado de la clave."""
+        logger.info(f"Enviando solicitud a Gemini ({self._nombre_modelo(nivel)}) para página {numero_pagina}...")
+        inicio = time.perf_counter()
+        response = await clave.modelos[nivel].generate_content_async(
+            contenido, generation_config=self.generation_config
+        )
+        self._anotar_respuesta(response, numero_pagina, nivel, time.perf_counter() - inicio, informe, consumo)
+        return response
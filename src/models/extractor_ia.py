@@ -17,18 +17,72 @@ estructurados de vuelta, utilizando los modelos Pydantic definidos en data_model
 import configparser
 import logging
 import os
+import shutil
 import tempfile
-from typing import List, Optional
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import replace
+from datetime import date
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, cast
 
-import google.generativeai as genai
-from PyPDF2 import PdfReader, PdfWriter
+from google.generativeai.types import GenerationConfigDict, file_types
 
 # CORRECCIÓN 2: Usar una ruta de importación absoluta para evitar problemas al ejecutar desde main.py.
-from src.models.data_models import ExtractoBancario, Transaccion
+from src.models.clasificador_paginas import TipoPagina, contar_filas_con_movimiento
+from src.models.costes import (
+    ESTADO_BLANDO,
+    ESTADO_DURO,
+    ConsumoPagina,
+    ControlCostes,
+    PresupuestoExcedido,
+    tokens_de_respuesta,
+)
+from src.models.data_models import Transaccion
+from src.models.divisor_paginas import dividir_en_franjas, nota_franja, unir_franjas
+from src.models.hedging import PoliticaHedging
+from src.models.indice_huellas import IndiceHuellas, hash_archivo
+from src.models.informe_ejecucion import InformeEjecucion
+from src.models.libro_movimientos import (
+    LibroMovimientos,
+    detectar_banco,
+    detectar_cuenta,
+)
+from src.models.normalizador_fechas import aplicar_normalizacion, detectar_periodo
+from src.models.optimizador_paginas import (
+    MODO_RASTERIZAR,
+    MODOS_OPTIMIZACION,
+    PYMUPDF_DISPONIBLE,
+)
+from src.models.parser_respuesta import ResultadoParseo, parsear_respuesta_tolerante
+from src.models.perfiles_banco import AlmacenPerfiles, LecturaPagina, leer_pagina
+from src.models.plantillas_prompt import (
+    PLANTILLA_POR_DEFECTO,
+    construir_prompt_continuacion,
+    obtener_plantilla,
+)
+from src.models.pool_claves import ERRORES_CUOTA, ClaveAPI, PoolClavesAPI
+from src.models.preprocesador_pdf import (
+    DescriptorPagina,
+    OpcionesPreprocesado,
+    preprocesar_pdf,
+    preprocesar_pdfs,
+)
+from src.models.ventana_paginas import VentanaPaginas
+from src.models.verificador_pagina import evaluar_extraccion
 
 # Configurar logging
 logger = logging.getLogger(__name__)
 
+# Páginas del principio del documento en las que se busca el periodo del extracto.
+PAGINAS_CABECERA = 2
+
+# Qué hacer con los movimientos que ya aparecieron en un extracto anterior.
+ACCIONES_REPETIDOS = ("descartar", "marcar")
+
+# Firma de las funciones de progreso: (pdf_path, paginas_hechas, paginas_totales).
+CallbackProgreso = Callable[[str, int, int], None]
+
 
 class ExtractorIA:
     """
@@ -52,10 +106,17 @@ class ExtractorIA:
                     "La clave de API de Gemini no ha sido configurada en config/settings.ini"
                 )
 
-            genai.configure(api_key=api_key)
+            self._configurar_procesamiento(config)
+            self._configurar_almacenes(config)
 
-            logger.info(f"Usando el modelo de Gemini: {model_name}")
-            self.model = genai.GenerativeModel(model_name=model_name)
+            # Contabilidad de tokens y coste, con presupuestos por ejecución y por día.
+            self.costes = ControlCostes(config_path)
+
+            # Informe de la última ejecución (páginas procesadas y omitidas).
+            self.ultimo_informe = InformeEjecucion()
+
+            self._configurar_generacion(config)
+            self._configurar_modelos(config, api_key, model_name)
 
         except (KeyError, FileNotFoundError) as e:
             logger.error(f"Error de configuración: {e}")
@@ -70,29 +131,474 @@ class ExtractorIA:
                 f"Ocurrió un error al configurar la API de Gemini: {e}"
             )
 
+    def _configurar_procesamiento(self, config: configparser.ConfigParser) -> None:
+        """Paralelismo, contrapresión y preparación de las páginas ([PROCESAMIENTO])."""
+        # Paralelismo: procesos para dividir los PDF, hilos para la API.
+        max_workers_cpu = config.getint("PROCESAMIENTO", "max_workers_cpu", fallback=0)
+        self.max_workers_cpu = max_workers_cpu if max_workers_cpu > 0 else None
+        self.max_workers_api = max(1, config.getint("PROCESAMIENTO", "max_workers_api", fallback=1))
+        self._limite_api = threading.BoundedSemaphore(self.max_workers_api)
+
+        # Contrapresión: páginas y bytes que pueden esperar o estar en la API a la vez.
+        max_paginas_en_cola = config.getint("PROCESAMIENTO", "max_paginas_en_cola", fallback=0)
+        self.ventana = VentanaPaginas(
+            max_paginas_en_cola if max_paginas_en_cola > 0 else 4 * self.max_workers_api,
+            int(config.getfloat("PROCESAMIENTO", "memoria_en_vuelo_mb", fallback=256) * 1024 * 1024),
+        )
+
+        # Omitir portadas, condiciones legales, etc. sin llamar a la IA.
+        self.omitir_paginas_sin_movimientos = config.getboolean(
+            "PROCESAMIENTO", "omitir_paginas_sin_movimientos", fallback=True
+        )
+
+        # Clasificación y optimización de las páginas antes de subirlas.
+        modo_optimizacion = config.get("PROCESAMIENTO", "optimizacion_paginas", fallback="ninguno").strip().lower()
+        if modo_optimizacion not in MODOS_OPTIMIZACION:
+            raise ValueError(
+                f"OPTIMIZACION_PAGINAS debe ser uno de {', '.join(MODOS_OPTIMIZACION)}"
+            )
+        if modo_optimizacion == MODO_RASTERIZAR and not PYMUPDF_DISPONIBLE:
+            logger.warning("PyMuPDF no está instalado; se usará el modo 'comprimir'.")
+        self.opciones_preprocesado = OpcionesPreprocesado(
+            min_filas=config.getint("PROCESAMIENTO", "min_filas_movimiento", fallback=2),
+            modo_optimizacion=modo_optimizacion,
+            dpi=config.getint("PROCESAMIENTO", "dpi_optimizacion", fallback=150),
+            calidad_jpeg=config.getint("PROCESAMIENTO", "calidad_jpeg", fallback=75),
+        )
+
+        # Normalizar las fechas con el año del periodo del extracto.
+        self.normalizar_fechas = config.getboolean(
+            "PROCESAMIENTO", "normalizar_fechas", fallback=True
+        )
+
+        # Páginas densas: se dividen en franjas que se extraen en paralelo.
+        self.filas_pagina_densa = config.getint("PROCESAMIENTO", "filas_pagina_densa", fallback=60)
+        self.franjas_pagina_densa = config.getint("PROCESAMIENTO", "franjas_pagina_densa", fallback=2)
+        self.solape_franjas = config.getfloat("PROCESAMIENTO", "solape_franjas", fallback=0.1)
+        if self.franjas_pagina_densa > 1 and not PYMUPDF_DISPONIBLE:
+            logger.info("PyMuPDF no está instalado; las páginas densas no se dividirán en franjas.")
+            self.franjas_pagina_densa = 1
+
+    def _configurar_almacenes(self, config: configparser.ConfigParser) -> None:
+        """Libro de movimientos, índice de huellas y perfiles de banco, si están habilitados."""
+        # Libro local de movimientos (SQLite), opcional.
+        self.libro: Optional[LibroMovimientos] = None
+        if config.getboolean("LIBRO", "habilitado", fallback=False):
+            self.libro = LibroMovimientos(config.get("LIBRO", "ruta", fallback="movimientos.db"))
+
+        # Índice de huellas: movimientos ya vistos en extractos anteriores.
+        self.indice_huellas: Optional[IndiceHuellas] = None
+        self.accion_repetidos = config.get("DUPLICADOS", "accion", fallback="descartar").strip().lower()
+        if self.accion_repetidos not in ACCIONES_REPETIDOS:
+            raise ValueError(f"ACCION de [DUPLICADOS] debe ser uno de {', '.join(ACCIONES_REPETIDOS)}")
+        if config.getboolean("DUPLICADOS", "habilitado", fallback=False):
+            self.indice_huellas = IndiceHuellas(config.get("DUPLICADOS", "ruta", fallback="huellas.db"))
+        # Huellas de los documentos extraídos que se registran en el índice
+        # cuando su exportación termina bien (ver `confirmar_huellas`).
+        self._huellas_pendientes: Dict[str, Tuple[str, List[Transaccion], str, str]] = {}
+        self._lock_huellas = threading.Lock()
+
+        # Perfiles de diseño por banco: lectura local de los diseños ya vistos.
+        self.perfiles: Optional[AlmacenPerfiles] = None
+        if config.getboolean("PERFILES", "habilitado", fallback=False):
+            self.perfiles = AlmacenPerfiles(config.get("PERFILES", "ruta", fallback="perfiles_banco.json"))
+
+    def _configurar_generacion(self, config: configparser.ConfigParser) -> None:
+        """Plantilla de instrucciones, configuración de generación, continuaciones y hedging."""
+        # Plantilla de instrucciones y formato de respuesta. La configuración
+        # de generación se construye una vez y se reutiliza en cada página.
+        self.plantilla = obtener_plantilla(
+            config.get("API", "plantilla_prompt", fallback=PLANTILLA_POR_DEFECTO).strip()
+        )
+        self.generation_config: GenerationConfigDict = {"response_mime_type": "application/json"}
+        if config.getboolean("API", "usar_response_schema", fallback=False):
+            if self.plantilla.esquema is not None:
+                # La librería también acepta modelos de pydantic como esquema.
+                self.generation_config["response_schema"] = cast(Any, self.plantilla.esquema)
+            else:
+                logger.warning(
+                    f"La plantilla '{self.plantilla.version}' no admite response_schema; se ignora."
+                )
+        logger.info(f"Usando la plantilla de prompt: {self.plantilla.version}")
+
+        # Peticiones de continuación permitidas por página truncada.
+        self.max_continuaciones = max(0, config.getint("API", "max_continuaciones", fallback=2))
+
+        # Hedging: copia de las llamadas que superan el percentil de latencia.
+        self.hedging: Optional[PoliticaHedging] = None
+        if config.getboolean("API", "hedging", fallback=False):
+            self.hedging = PoliticaHedging(
+                percentil=config.getfloat("API", "percentil_hedging", fallback=95.0),
+                presupuesto=config.getfloat("API", "presupuesto_hedging", fallback=0.05),
+                min_muestras=config.getint("API", "min_muestras_hedging", fallback=20),
+                plazo_minimo_s=config.getfloat("API", "plazo_minimo_hedging_s", fallback=2.0),
+                max_workers=2 * self.max_workers_api,
+            )
+
+    def _configurar_modelos(self, config: configparser.ConfigParser, api_key: str, model_name: str) -> None:
+        """Pool de claves de API y modelos (principal y de respaldo) de cada clave."""
+        # Claves adicionales: cada una aporta su propia cuota por minuto.
+        claves_api = [api_key]
+        for clave in config.get("API", "gemini_api_keys", fallback="").split(","):
+            clave = clave.strip()
+            if clave and clave not in claves_api:
+                claves_api.append(clave)
+        enfriamiento_cuota = config.getfloat("API", "enfriamiento_cuota_s", fallback=60.0)
+
+        logger.info(f"Usando el modelo de Gemini: {model_name}")
+        nombres_modelos = [model_name]
+
+        # Cascada: las páginas que no superan las comprobaciones locales
+        # se repiten con un modelo más potente, si está configurado.
+        modelo_respaldo = config.get("API", "gemini_model_respaldo", fallback="").strip()
+        if modelo_respaldo and modelo_respaldo != model_name:
+            logger.info(f"Modelo de respaldo para páginas difíciles: {modelo_respaldo}")
+            nombres_modelos.append(modelo_respaldo)
+
+        # Un juego de modelos por clave de API; los de la primera clave
+        # son los de referencia.
+        self.pool_claves = PoolClavesAPI.desde_claves(claves_api, nombres_modelos, enfriamiento_cuota)
+        if len(self.pool_claves) > 1:
+            logger.info(f"Repartiendo las páginas entre {len(self.pool_claves)} claves de API.")
+        self.modelos = self.pool_claves.claves[0].modelos
+        self.model = self.modelos[0]
+
     def _split_pdf_into_pages(self, pdf_path: str, temp_dir: str) -> List[str]:
         """
         Divide un archivo PDF en páginas individuales y las guarda como archivos temporales.
         """
-        output_paths = []
         try:
-            reader = PdfReader(pdf_path)
-            for i, page in enumerate(reader.pages):
-                writer = PdfWriter()
-                writer.add_page(page)
-                temp_page_path = os.path.join(temp_dir, f"page_{i + 1}.pdf")
-                with open(temp_page_path, "wb") as output_pdf:
-                    writer.write(output_pdf)
-                output_paths.append(temp_page_path)
-            logger.info(f"PDF dividido en {len(output_paths)} páginas temporales.")
+            descriptores = preprocesar_pdf(pdf_path, temp_dir)
         except Exception as e:
             logger.error(f"Error al dividir el PDF: {e}", exc_info=True)
             raise
-        return output_paths
+        return [d.ruta_pagina for d in descriptores]
+
+    def _construir_prompt(self, numero_pagina: int) -> str:
+        """Construye la instrucción que se envía a la IA junto con la página."""
+        return self.plantilla.renderizar(numero_pagina)
+
+    def _procesar_pagina(
+        self, descriptor: DescriptorPagina, informe: InformeEjecucion
+    ) -> List[Transaccion]:
+        """
+        Procesa una página con la clave de API menos cargada. Si la clave
+        agota su cuota, queda en enfriamiento y la página se repite con otra
+        clave del pool (como máximo una vez por clave).
+
+        Raises:
+            PresupuestoExcedido: Si se superó un presupuesto duro de coste.
+        """
+        if self.costes.estado() == ESTADO_DURO:
+            raise PresupuestoExcedido(
+                f"Presupuesto de coste agotado; no se envía la página {descriptor.numero_pagina}."
+            )
+        for intento in range(1, len(self.pool_claves) + 1):
+            with self.pool_claves.adquirir() as clave:
+                try:
+                    transacciones = self._procesar_pagina_con_clave(descriptor, informe, clave)
+                except ERRORES_CUOTA:
+                    self.pool_claves.registrar_error_cuota(clave)
+                    informe.incrementar("errores_cuota")
+                    if intento == len(self.pool_claves):
+                        raise
+                    logger.warning(f"Página {descriptor.numero_pagina}: cuota agotada en la {clave.nombre}; "
+                                   f"se repite con otra clave.")
+                    continue
+                self.pool_claves.registrar_exito(clave)
+                return transacciones
+        # El último intento propaga su error de cuota, así que aquí no se llega.
+        raise RuntimeError(f"Página {descriptor.numero_pagina}: no quedan claves de API que probar.")
+
+    def _procesar_pagina_con_clave(
+        self, descriptor: DescriptorPagina, informe: InformeEjecucion, clave: ClaveAPI
+    ) -> List[Transaccion]:
+        """
+        Sube una página a Gemini, solicita la extracción y parsea la respuesta.
+        La subida y todas las llamadas de la página usan la misma clave, ya
+        que los archivos subidos pertenecen al proyecto de esa clave.
+
+        Los errores de parseo se registran y devuelven las filas recuperables
+        (o una lista vacía); los errores de subida o de la API se propagan al
+        llamador.
+        """
+        i = descriptor.numero_pagina
+        logger.info(f"Procesando página {i}/{descriptor.total_paginas}: {descriptor.ruta_pagina}")
+
+        # 1. Subir la página a la API de Gemini.
+        pdf_file = clave.subir(descriptor.ruta_subida, descriptor.mime_type)
+        logger.info(f"Página {i} subida con la {clave.nombre}. ID: {pdf_file.name}")
+
+        # 2. Extraer con el modelo rápido y, si el resultado no supera las
+        #    comprobaciones locales, repetir con el siguiente nivel.
+        nota, niveles, consumo = self._preparar_cascada(descriptor)
+        transacciones: List[Transaccion] = []
+        try:
+            for nivel in range(niveles):
+                informe.registrar_pagina(self._nombre_modelo(nivel))
+                candidatas, resultado = self._extraer_con_modelo(pdf_file, i, nivel, informe, nota, clave, consumo)
+                transacciones, aceptada = self._evaluar_nivel(
+                    descriptor, nivel, niveles, candidatas, transacciones, resultado, informe
+                )
+                if aceptada:
+                    break
+        finally:
+            self._cerrar_consumo(consumo, informe)
+        return self._fin_de_pagina(i, transacciones)
+
+    def _preparar_cascada(self, descriptor: DescriptorPagina) -> Tuple[str, int, ConsumoPagina]:
+        """
+        Nota de franja para las instrucciones, niveles de la cascada que se
+        pueden usar (con el presupuesto blando superado no se escala al
+        modelo de respaldo) y consumo vacío de la página.
+        """
+        nota = nota_franja(*descriptor.franja) if descriptor.franja else ""
+        niveles = 1 if self.costes.estado() == ESTADO_BLANDO else len(self.modelos)
+        consumo = ConsumoPagina(descriptor.pdf_path, descriptor.numero_pagina, bytes_subidos=descriptor.bytes_subida)
+        return nota, niveles, consumo
+
+    def _evaluar_nivel(
+        self,
+        descriptor: DescriptorPagina,
+        nivel: int,
+        niveles: int,
+        candidatas: List[Transaccion],
+        transacciones: List[Transaccion],
+        resultado: ResultadoParseo,
+        informe: InformeEjecucion,
+    ) -> Tuple[List[Transaccion], bool]:
+        """
+        Decide con el resultado de un nivel de la cascada. Devuelve las
+        transacciones que se conservan (las del nivel, salvo que venga vacío
+        y el anterior no) y si la página se da por buena.
+        """
+        i = descriptor.numero_pagina
+        descriptor.truncada = resultado.truncada
+        if nivel == 0 or candidatas or not transacciones:
+            transacciones = candidatas
+        motivos = evaluar_extraccion(transacciones, resultado, descriptor.texto, descriptor.tipo)
+        if not motivos:
+            return transacciones, True
+        if nivel + 1 < niveles:
+            logger.warning(f"Página {i}: se escala al modelo {self._nombre_modelo(nivel + 1)} "
+                           f"({'; '.join(motivos)}).")
+            informe.registrar_escalada(self._nombre_modelo(nivel))
+        else:
+            logger.warning(f"Página {i}: el resultado no superó las comprobaciones ({'; '.join(motivos)}).")
+        return transacciones, False
+
+    def _cerrar_consumo(self, consumo: ConsumoPagina, informe: InformeEjecucion) -> None:
+        """Registra el consumo de la página; las llamadas se pagan aunque la página falle después."""
+        informe.registrar_consumo(consumo)
+        self.costes.registrar_pagina(consumo, informe.id_ejecucion)
+
+    @staticmethod
+    def _fin_de_pagina(i: int, transacciones: List[Transaccion]) -> List[Transaccion]:
+        if transacciones:
+            logger.info(f"Página {i}: Se extrajeron {len(transacciones)} transacciones.")
+        else:
+            logger.warning(f"Página {i}: La IA no devolvió transacciones o la lista estaba vacía.")
+        return transacciones
+
+    def _extraer_con_modelo(
+        self,
+        pdf_file: file_types.File,
+        i: int,
+        nivel: int,
+        informe: InformeEjecucion,
+        nota: str = "",
+        clave: Optional[ClaveAPI] = None,
+        consumo: Optional[ConsumoPagina] = None,
+    ) -> Tuple[List[Transaccion], ResultadoParseo]:
+        """
+        Extrae una página ya subida con el modelo del nivel indicado. Si la
+        respuesta llega truncada, se conservan las filas completas y se pide
+        a la IA solo la parte que falta. `nota` se añade a las instrucciones
+        (por ejemplo, para indicar que el archivo es una franja de la página).
+        Las llamadas usan los modelos de `clave` (por defecto, la primera) y
+        sus tokens se suman a `consumo`.
+        """
+        prompt: Optional[str] = self._construir_prompt(i) + nota
+        transacciones: List[Transaccion] = []
+        continuaciones = 0
+        while prompt is not None:
+            response = self._generar([prompt, pdf_file], i, nivel, informe, clave, consumo)
+            resultado = self._parsear_pagina(response, i, informe)
+            transacciones = self._unir_continuacion(transacciones, resultado.transacciones)
+            prompt = self._siguiente_continuacion(i, resultado, transacciones, continuaciones, nota, informe)
+            continuaciones += 1
+        self._depurar_respuesta_vacia(i, transacciones, response)
+        return transacciones, resultado
+
+    def _siguiente_continuacion(
+        self,
+        i: int,
+        resultado: ResultadoParseo,
+        transacciones: List[Transaccion],
+        continuaciones: int,
+        nota: str,
+        informe: InformeEjecucion,
+    ) -> Optional[str]:
+        """
+        Instrucción para pedir la parte que falta de una respuesta truncada,
+        o None si la respuesta está completa o se agotaron las continuaciones.
+        """
+        if not (resultado.truncada and transacciones and continuaciones < self.max_continuaciones):
+            return None
+        informe.incrementar("continuaciones")
+        logger.warning(f"Página {i}: respuesta truncada tras {len(transacciones)} transacciones; "
+                       f"solicitando continuación ({continuaciones + 1}/{self.max_continuaciones}).")
+        return construir_prompt_continuacion(self.plantilla, i, len(transacciones), transacciones[-1]) + nota
+
+    @staticmethod
+    def _unir_continuacion(transacciones: List[Transaccion], nuevas: List[Transaccion]) -> List[Transaccion]:
+        """Añade las filas de una continuación; la IA a veces repite la última fila que ya teníamos."""
+        while transacciones and nuevas and nuevas[0] == transacciones[-1]:
+            nuevas = nuevas[1:]
+        return transacciones + nuevas
+
+    def _depurar_respuesta_vacia(self, i: int, transacciones: List[Transaccion], response: Any) -> None:
+        if not transacciones:
+            logger.debug(f"Página {i}: Respuesta de texto de la IA: {self._texto_respuesta(response)}")
+
+    def _nombre_modelo(self, nivel: int) -> str:
+        return str(self.modelos[nivel].model_name).replace("models/", "")
+
+    def _generar(
+        self,
+        contenido: list,
+        numero_pagina: int,
+        nivel: int,
+        informe: InformeEjecucion,
+        clave: Optional[ClaveAPI] = None,
+        consumo: Optional[ConsumoPagina] = None,
+    ) -> Any:
+        """
+        Llama a generate_content con el modelo del nivel indicado de la clave
+        (por defecto, la primera), registra la latencia y suma los tokens y
+        el coste estimado a `consumo`.
+        """
+        modelos = clave.modelos if clave is not None else self.modelos
+        logger.info(f"Enviando solicitud a Gemini ({self._nombre_modelo(nivel)}) para página {numero_pagina}...")
+        inicio = time.perf_counter()
+        response: Any
+        if self.hedging is None:
+            response = modelos[nivel].generate_content(
+                contenido,
+                generation_config=self.generation_config,
+            )
+        else:
+            response, duplicada, gano_copia = self.hedging.ejecutar(
+                self._nombre_modelo(nivel),
+                lambda: modelos[nivel].generate_content(contenido, generation_config=self.generation_config),
+                lambda perdedora: self._anotar_perdedora(perdedora, numero_pagina, nivel, informe, consumo),
+            )
+            if duplicada:
+                informe.incrementar("llamadas_duplicadas")
+            if gano_copia:
+                informe.incrementar("duplicadas_ganadoras")
+        self._anotar_respuesta(response, numero_pagina, nivel, time.perf_counter() - inicio, informe, consumo)
+        return response
+
+    def _anotar_respuesta(
+        self,
+        response: Any,
+        numero_pagina: int,
+        nivel: int,
+        latencia: float,
+        informe: InformeEjecucion,
+        consumo: Optional[ConsumoPagina] = None,
+    ) -> None:
+        """Registra la latencia de una llamada y suma sus tokens y su coste estimado a `consumo`."""
+        informe.registrar_llamada(self._nombre_modelo(nivel), latencia)
+        if consumo is not None:
+            self._sumar_consumo(response, nivel, consumo)
+        logger.info(f"Respuesta de Gemini para página {numero_pagina} recibida en {latencia:.1f} s "
+                    f"({self._tokens_salida(response)} tokens de salida).")
+
+    def _sumar_consumo(self, response: Any, nivel: int, consumo: ConsumoPagina) -> None:
+        """Suma a `consumo` una llamada con los tokens de `response` y su coste estimado."""
+        tokens_entrada, tokens_salida = tokens_de_respuesta(response)
+        consumo.llamadas += 1
+        consumo.tokens_entrada += tokens_entrada
+        consumo.tokens_salida += tokens_salida
+        consumo.coste += self.costes.coste(self._nombre_modelo(nivel), tokens_entrada, tokens_salida)
+        if self._nombre_modelo(nivel) not in consumo.modelos:
+            consumo.modelos.append(self._nombre_modelo(nivel))
+
+    def _anotar_perdedora(
+        self,
+        response: Any,
+        numero_pagina: int,
+        nivel: int,
+        informe: InformeEjecucion,
+        consumo: Optional[ConsumoPagina] = None,
+    ) -> None:
+        """
+        Contabiliza la respuesta de una llamada duplicada que perdió. Suele
+        llegar cuando la página ya se registró, así que se anota como un
+        consumo aparte de la misma página.
+        """
+        extra = ConsumoPagina(consumo.pdf_path if consumo is not None else "", numero_pagina)
+        self._sumar_consumo(response, nivel, extra)
+        informe.registrar_consumo(extra)
+        self.costes.registrar_pagina(extra, informe.id_ejecucion)
+        logger.debug(f"Página {numero_pagina}: la llamada duplicada que perdió costó "
+                     f"{extra.tokens_entrada + extra.tokens_salida} tokens.")
+
+    def _parsear_pagina(self, response: Any, numero_pagina: int, informe: InformeEjecucion) -> ResultadoParseo:
+        """Parsea la respuesta de forma tolerante y anota las filas perdidas."""
+        texto = self._texto_respuesta(response)
+        resultado = parsear_respuesta_tolerante(texto, self.plantilla.formato)
+        if resultado.filas_invalidas or resultado.truncada:
+            logger.warning(f"Página {numero_pagina}: respuesta JSON incompleta o con errores; "
+                           f"{len(resultado.transacciones)} filas recuperadas, "
+                           f"{resultado.filas_invalidas} descartadas.")
+            logger.debug(f"Página {numero_pagina}: Respuesta de texto de la IA: {texto}")
+            informe.incrementar("filas_recuperadas", len(resultado.transacciones))
+            informe.incrementar("filas_descartadas", resultado.filas_invalidas)
+        elif resultado.sin_lista:
+            logger.warning(f"Página {numero_pagina}: la respuesta no contiene una lista de transacciones.")
+            logger.debug(f"Página {numero_pagina}: Respuesta de texto de la IA: {texto}")
+        return resultado
+
+    @staticmethod
+    def _texto_respuesta(response: Any) -> str:
+        """Texto de la respuesta, o '' si la API no devolvió texto (p. ej. bloqueo)."""
+        try:
+            return str(response.text)
+        except Exception as e:
+            logger.debug(f"La respuesta no contiene texto: {e}")
+            return ""
+
+    @staticmethod
+    def _tokens_salida(response: Any) -> Optional[int]:
+        """Tokens de salida de la respuesta, si la API los informa."""
+        try:
+            return cast(Optional[int], response.usage_metadata.candidates_token_count)
+        except AttributeError:
+            return None
+
+    def cerrar(self) -> None:
+        """
+        Libera los recursos del extractor: el pool de llamadas duplicadas,
+        el libro de movimientos y el índice de huellas, y guarda los
+        contadores pendientes de los perfiles de banco. Se llama al terminar
+        de usarlo, cuando ya no hay extracciones en curso.
+        """
+        if self.hedging is not None:
+            self.hedging.cerrar()
+        if self.libro is not None:
+            self.libro.cerrar()
+        if self.indice_huellas is not None:
+            self.indice_huellas.cerrar()
+        if self.perfiles is not None:
+            self.perfiles.guardar()
 
     def extraer_transacciones_de_pdf(
         self,
         pdf_path: str,
+        progreso: Optional[CallbackProgreso] = None,
     ) -> Optional[List[Transaccion]]:
         """
         Procesa un archivo PDF, extrayendo transacciones página por página
@@ -100,92 +606,501 @@ class ExtractorIA:
 
         Args:
             pdf_path: La ruta al archivo PDF que se va a procesar.
+            progreso: Función opcional (pdf_path, paginas_hechas, paginas_totales)
+                      que se llama desde los hilos de trabajo al avanzar.
 
         Returns:
             Una lista de objetos Transaccion si la extracción es exitosa,
             o None si ocurre un error.
         """
-        logger.info(f"Iniciando procesamiento del archivo: {pdf_path}")
-        all_transactions: List[Transaccion] = []
+        return self.extraer_transacciones_de_pdfs([pdf_path], progreso).get(pdf_path)
+
+    def extraer_transacciones_de_pdfs(
+        self,
+        pdf_paths: List[str],
+        progreso: Optional[CallbackProgreso] = None,
+    ) -> Dict[str, Optional[List[Transaccion]]]:
+        """
+        Procesa un lote de archivos PDF.
+
+        La división, el hash y la lectura de texto de cada PDF se hacen en un
+        pool de procesos; en cuanto un documento está listo, sus páginas pasan
+        al pool de hilos que llama a la API, de modo que el trabajo de CPU y el
+        de red se solapan. Con un solo documento, las páginas se dividen bajo
+        demanda y cada una se envía en cuanto está lista.
+
+        El número de páginas enviadas a la API a la vez está limitado por
+        MAX_WORKERS_API para todo el extractor, aunque se procesen varios
+        lotes en paralelo desde distintos hilos. Las páginas que esperan su
+        turno también están acotadas (MAX_PAGINAS_EN_COLA y
+        MEMORIA_EN_VUELO_MB): con la ventana llena, el reparto de páginas se
+        detiene hasta que termina alguna, así que la memoria no crece con el
+        tamaño de los documentos.
+
+        Args:
+            pdf_paths: Las rutas de los archivos PDF que se van a procesar.
+            progreso: Función opcional (pdf_path, paginas_hechas, paginas_totales)
+                      que se llama desde los hilos de trabajo al avanzar.
+
+        Returns:
+            Un diccionario ruta -> lista de Transaccion (en orden de página),
+            o None para los documentos que no se pudieron procesar.
+        """
+        logger.info(f"Iniciando procesamiento de {len(pdf_paths)} archivo(s).")
+        self.ultimo_informe = informe = InformeEjecucion()
+        self.costes.iniciar_ejecucion()
+        resultados: Dict[str, Optional[List[Transaccion]]] = {}
+        futuros_por_pdf: Dict[str, List[Future]] = {}
+        paginas_por_pdf: Dict[str, List[DescriptorPagina]] = {}
+        periodos: Dict[str, Optional[Tuple[date, date]]] = {}
         temp_dir = None
 
         try:
-            # Crear un directorio temporal para las páginas del PDF
+            # Crear un directorio temporal para las páginas de los PDF
             temp_dir = tempfile.mkdtemp()
             logger.info(f"Directorio temporal creado: {temp_dir}")
 
-            # Dividir el PDF en páginas individuales
-            page_paths = self._split_pdf_into_pages(pdf_path, temp_dir)
-
-            if not page_paths:
-                logger.warning("No se pudieron dividir páginas del PDF.")
-                return None
+            with ThreadPoolExecutor(max_workers=self.max_workers_api) as api_pool:
+                for pdf_path, descriptores in preprocesar_pdfs(
+                    pdf_paths,
+                    temp_dir,
+                    max_workers=self.max_workers_cpu,
+                    opciones=self.opciones_preprocesado,
+                    perezoso=True,
+                ):
+                    repartido = None
+                    if descriptores is not None:
+                        repartido = self._repartir_documento(
+                            api_pool, pdf_path, descriptores, informe, progreso
+                        )
+                    if repartido is None:
+                        logger.warning(f"No se pudieron dividir páginas del PDF: {pdf_path}")
+                        resultados[pdf_path] = None
+                        continue
+                    paginas_por_pdf[pdf_path], futuros_por_pdf[pdf_path], periodos[pdf_path] = repartido
 
-            for i, page_path in enumerate(page_paths):
-                logger.info(f"Procesando página {i + 1}/{len(page_paths)}: {page_path}")
-
-                # 1. Subir la página a la API de Gemini.
-                pdf_file = genai.upload_file(path=page_path, mime_type="application/pdf")
-                logger.info(f"Página {i + 1} subida. ID: {pdf_file.name}")
-
-                # 2. Crear el prompt (instrucción) para la IA.
-                prompt = f"""
-                Analiza el siguiente documento PDF, que es la página {i + 1} de un extracto bancario.
-                Tu tarea es extraer única y exclusivamente las líneas de transacción de la tabla de movimientos
-                presentes en ESTA PÁGINA.
-
-                Ignora por completo cualquier otra información como:
-                - Cabeceras de página (nombre del banco, número de página, etc.).
-                - Pies de página.
-                - Saldos resumidos, saldos iniciales o finales.
-                - Publicidad o información de contacto.
-
-                Para cada transacción, extrae la fecha, la descripción y los importes de débito o crédito.
-                Es muy importante que estandarices todas las fechas al formato final 'dd-mm-aaaa'.
-                Si una fecha solo tiene día y mes, infiere el año del contexto del documento.
-
-                Devuelve el resultado como un único objeto JSON que contenga una clave "transacciones",
-                cuyo valor sea una lista de objetos JSON, donde cada objeto represente una transacción.
-                Asegúrate de que el JSON esté bien formado.
-                """
-
-                logger.info(f"Enviando solicitud a Gemini para página {i + 1}...")
-                response = self.model.generate_content(
-                    [prompt, pdf_file],
-                    generation_config={
-                        "response_mime_type": "application/json",
-                    },
-                )
-                logger.info(f"Respuesta de Gemini para página {i + 1} recibida y procesada.")
+                for pdf_path, futuros in futuros_por_pdf.items():
+                    resultados[pdf_path] = self._recoger_resultados(
+                        pdf_path, futuros, informe, paginas_por_pdf[pdf_path], periodos[pdf_path]
+                    )
 
-                # Parsear la respuesta JSON manualmente con Pydantic.
-                try:
-                    extracto_bancario_obj = ExtractoBancario.model_validate_json(response.text)
-                except Exception as parse_error:
-                    logger.error(f"Página {i + 1}: Error al parsear la respuesta JSON: {parse_error}", exc_info=True)
-                    logger.debug(f"Página {i + 1}: Respuesta de texto de la IA que causó el error: {response.text}") # Cambiado a DEBUG
-                    continue # Skip to the next page if parsing fails
-                
-                if extracto_bancario_obj and extracto_bancario_obj.transacciones:
-                    logger.info(f"Página {i + 1}: Se extrajeron {len(extracto_bancario_obj.transacciones)} transacciones.")
-                    all_transactions.extend(extracto_bancario_obj.transacciones)
-                else:
-                    logger.warning(f"Página {i + 1}: La IA no devolvió transacciones o la lista estaba vacía.")
-                    try:
-                        logger.debug(f"Página {i + 1}: Respuesta de texto de la IA: {response.text}") # Cambiado a DEBUG
-                    except Exception:
-                        pass # Ignore if text is not available
-
-            logger.info(f"Extracción completada. Total de transacciones: {len(all_transactions)}")
-            return all_transactions
+            informe.registrar_en_log()
+            if self.perfiles is not None:
+                self.perfiles.guardar()
+            self.costes.registrar_ejecucion(informe.id_ejecucion, {
+                "paginas": informe.paginas_procesadas,
+                "tokens_entrada": informe.tokens_entrada,
+                "tokens_salida": informe.tokens_salida,
+                "bytes_subidos": informe.bytes_subidos,
+                "coste": round(informe.coste, 6),
+            })
+            if self.hedging is not None:
+                logger.info(self.hedging.resumen())
+            logger.info(
+                f"Ventana de páginas: pico de {self.ventana.pico_paginas} páginas y "
+                f"{self.ventana.pico_bytes / 1024:.0f} KB en curso, {self.ventana.esperas} esperas."
+            )
+            return resultados
 
         except Exception as e:
             logger.error(f"Error crítico durante la extracción de datos: {e}", exc_info=True)
-            return None
+            return {pdf_path: resultados.get(pdf_path) for pdf_path in pdf_paths}
         finally:
             # Limpiar archivos temporales
             if temp_dir and os.path.exists(temp_dir):
-                for f in os.listdir(temp_dir):
-                    os.remove(os.path.join(temp_dir, f))
-                os.rmdir(temp_dir)
+                shutil.rmtree(temp_dir, ignore_errors=True)
                 logger.info(f"Directorio temporal {temp_dir} eliminado.")
+
+    def _encolar_pagina(
+        self, api_pool: ThreadPoolExecutor, descriptor: DescriptorPagina, informe: InformeEjecucion
+    ) -> Future:
+        """
+        Envía una página al pool de la API cuando hay sitio en la ventana de
+        páginas en curso; si no lo hay, bloquea al llamante hasta que lo haya.
+        El sitio se libera al terminar (o cancelarse) el futuro.
+        """
+        tamano = descriptor.bytes_subida + len(descriptor.texto.encode("utf-8"))
+        self.ventana.adquirir(tamano)
+        try:
+            futuro = api_pool.submit(self._procesar_pagina_con_limite, descriptor, informe)
+        except BaseException:
+            self.ventana.liberar(tamano)
+            raise
+        futuro.add_done_callback(lambda _futuro: self.ventana.liberar(tamano))
+        return futuro
+
+    def _procesar_pagina_con_limite(
+        self, descriptor: DescriptorPagina, informe: InformeEjecucion
+    ) -> List[Transaccion]:
+        """
+        Procesa una página respetando el límite global de páginas en vuelo.
+        Las páginas con un perfil de diseño conocido se leen localmente; las
+        densas, y las que siguen truncadas tras las continuaciones, se
+        extraen por franjas.
+        """
+        lectura, locales = self._leer_localmente(descriptor, informe)
+        if locales is not None:
+            return locales
+        transacciones = self._procesar_pagina_sin_perfil(descriptor, informe)
+        self._aprender_perfil(descriptor, lectura, transacciones, informe)
+        return transacciones
+
+    def _leer_localmente(
+        self, descriptor: DescriptorPagina, informe: InformeEjecucion
+    ) -> Tuple[Optional[LecturaPagina], Optional[List[Transaccion]]]:
+        """
+        Lee la página con el perfil de diseño de su banco, si lo hay.
+
+        Returns:
+            La capa de texto posicional (para aprender el perfil después) y
+            las transacciones leídas localmente, o None si hay que usar la IA.
+        """
+        perfiles = self.perfiles
+        lectura = self._leer_con_perfil(descriptor) if perfiles is not None else None
+        if perfiles is None or lectura is None:
+            return lectura, None
+        locales = perfiles.extraer(lectura, descriptor.texto)
+        if locales is not None:
+            logger.info(f"Página {descriptor.numero_pagina}: {len(locales)} transacciones leídas "
+                        f"localmente con el perfil {lectura.huella}.")
+            informe.incrementar("paginas_perfil_local")
+        return lectura, locales
+
+    def _aprender_perfil(
+        self,
+        descriptor: DescriptorPagina,
+        lectura: Optional[LecturaPagina],
+        transacciones: List[Transaccion],
+        informe: InformeEjecucion,
+    ) -> None:
+        """Aprende el perfil de la página de una extracción de la IA que pasa las comprobaciones."""
+        perfiles = self.perfiles
+        if perfiles is None or lectura is None or not transacciones or descriptor.truncada:
+            return
+        if not evaluar_extraccion(transacciones, None, descriptor.texto, descriptor.tipo):
+            if perfiles.aprender(lectura, transacciones):
+                informe.incrementar("perfiles_aprendidos")
+
+    def _leer_con_perfil(self, descriptor: DescriptorPagina) -> Optional[LecturaPagina]:
+        """Capa de texto posicional de la página, o None si no tiene texto o no se puede leer."""
+        if not descriptor.texto:
+            return None
+        try:
+            return leer_pagina(descriptor.ruta_pagina)
+        except Exception as e:
+            logger.debug(f"Página {descriptor.numero_pagina}: no se pudo leer la posición del texto: {e}")
+            return None
+
+    def _procesar_pagina_sin_perfil(
+        self, descriptor: DescriptorPagina, informe: InformeEjecucion
+    ) -> List[Transaccion]:
+        """Extrae la página con la IA, por franjas si es densa o queda truncada."""
+        if self._dividir_por_densidad(descriptor, informe):
+            return self._procesar_por_franjas(descriptor, informe)
+
+        with self._limite_api:
+            transacciones = self._procesar_pagina(descriptor, informe)
+
+        if self._dividir_por_truncado(descriptor, informe):
+            return self._procesar_por_franjas(descriptor, informe)
+        return transacciones
+
+    def _dividir_por_densidad(self, descriptor: DescriptorPagina, informe: InformeEjecucion) -> bool:
+        """Indica si la página se extrae por franjas desde el principio por ser densa."""
+        if not self._es_pagina_densa(descriptor):
+            return False
+        logger.info(f"Página {descriptor.numero_pagina}: página densa, se extrae por franjas.")
+        informe.incrementar("paginas_densas")
+        return True
+
+    def _dividir_por_truncado(self, descriptor: DescriptorPagina, informe: InformeEjecucion) -> bool:
+        """Indica si la página, ya extraída, se repite por franjas porque sigue truncada."""
+        if not descriptor.truncada or self.franjas_pagina_densa <= 1:
+            return False
+        logger.warning(f"Página {descriptor.numero_pagina}: respuesta truncada, se repite por franjas.")
+        informe.incrementar("paginas_divididas_por_truncado")
+        return True
+
+    def _es_pagina_densa(self, descriptor: DescriptorPagina) -> bool:
+        """Una página es densa si su capa de texto tiene muchas filas de movimientos."""
+        return (
+            self.filas_pagina_densa > 0
+            and self.franjas_pagina_densa > 1
+            and bool(descriptor.texto)
+            and contar_filas_con_movimiento(descriptor.texto) >= self.filas_pagina_densa
+        )
+
+    def _procesar_por_franjas(
+        self, descriptor: DescriptorPagina, informe: InformeEjecucion
+    ) -> List[Transaccion]:
+        """
+        Divide la página en franjas solapadas, las extrae en paralelo (cada
+        una ocupa un puesto del límite global de la API) y une los
+        resultados eliminando las filas repetidas en las costuras.
+        """
+        subdescriptores = self._descriptores_franjas(descriptor)
+
+        def procesar_franja(subdescriptor: DescriptorPagina) -> List[Transaccion]:
+            with self._limite_api:
+                return self._procesar_pagina(subdescriptor, informe)
+
+        with ThreadPoolExecutor(max_workers=len(subdescriptores)) as pool:
+            resultados = list(pool.map(procesar_franja, subdescriptores))
+        return self._unir_resultados_franjas(descriptor, resultados)
+
+    def _descriptores_franjas(self, descriptor: DescriptorPagina) -> List[DescriptorPagina]:
+        """Divide la imagen de la página en franjas y devuelve un descriptor por franja."""
+        franjas = dividir_en_franjas(
+            descriptor.ruta_pagina,
+            self.franjas_pagina_densa,
+            self.solape_franjas,
+            self.opciones_preprocesado.dpi,
+            self.opciones_preprocesado.calidad_jpeg,
+        )
+        total = len(franjas)
+        return [
+            # Sin capa de texto ni tipo: las comprobaciones de cobertura
+            # contra el texto no tienen sentido para una parte de la página.
+            replace(descriptor, ruta_subida=ruta, mime_type=mime, texto="",
+                    tipo=TipoPagina.DESCONOCIDA, franja=(k, total), truncada=False,
+                    bytes_subida=os.path.getsize(ruta))
+            for k, (ruta, mime) in enumerate(franjas, start=1)
+        ]
+
+    @staticmethod
+    def _unir_resultados_franjas(
+        descriptor: DescriptorPagina, resultados: List[List[Transaccion]]
+    ) -> List[Transaccion]:
+        """Une las transacciones de las franjas eliminando las filas repetidas en las costuras."""
+        transacciones = unir_franjas(resultados)
+        logger.info(f"Página {descriptor.numero_pagina}: {len(transacciones)} transacciones "
+                    f"en {len(resultados)} franjas.")
+        return transacciones
+
+    def _repartir_documento(
+        self,
+        api_pool: ThreadPoolExecutor,
+        pdf_path: str,
+        descriptores: Iterable[DescriptorPagina],
+        informe: InformeEjecucion,
+        progreso: Optional[CallbackProgreso] = None,
+    ) -> Optional[Tuple[List[DescriptorPagina], List[Future], Optional[Tuple[date, date]]]]:
+        """
+        Recorre las páginas de un documento a medida que se dividen y envía
+        cada una a la API en cuanto está lista, sin esperar a que termine la
+        división del resto. Las páginas sin movimientos se omiten.
+
+        Returns:
+            (páginas enviadas, sus futuros, periodo del extracto), o None si
+            el documento no se pudo dividir.
+        """
+        a_procesar: List[DescriptorPagina] = []
+        futuros: List[Future] = []
+        cabecera: List[str] = []
+        avanzar = None
+        try:
+            for d in descriptores:
+                if avanzar is None:
+                    informe.registrar_paginas(d.total_paginas)
+                    avanzar = self._seguir_progreso(pdf_path, d.total_paginas, progreso)
+                if len(cabecera) < PAGINAS_CABECERA:
+                    cabecera.append(d.texto)
+                if self._omitir_pagina(d, informe):
+                    avanzar()
+                    continue
+                a_procesar.append(d)
+                futuros.append(self._encolar_pagina(api_pool, d, informe))
+                futuros[-1].add_done_callback(avanzar)
+        except Exception as e:
+            logger.error(f"Error al dividir el PDF {pdf_path}: {e}", exc_info=True)
+            for futuro in futuros:
+                futuro.cancel()
+            return None
+        if avanzar is None:
+            return None
+        return a_procesar, futuros, detectar_periodo("\n".join(cabecera))
+
+    @staticmethod
+    def _seguir_progreso(
+        pdf_path: str, total: int, progreso: Optional[CallbackProgreso]
+    ) -> Callable[..., None]:
+        """
+        Informa del avance de un documento. Devuelve la función que se llama
+        por cada página hecha, omitida o al terminar su futuro.
+        """
+        lock = threading.Lock()
+        hechas = [0]
+
+        def pagina_terminada(_futuro: Optional[Future] = None) -> None:
+            with lock:
+                hechas[0] += 1
+                actual = hechas[0]
+            if progreso:
+                progreso(pdf_path, actual, total)
+
+        if progreso:
+            progreso(pdf_path, 0, total)
+        return pagina_terminada
+
+    def _omitir_pagina(self, d: DescriptorPagina, informe: InformeEjecucion) -> bool:
+        """
+        Indica si el clasificador local marca la página claramente como sin
+        movimientos y anota en el informe de la ejecución la omisión o los
+        bytes que se van a subir.
+        """
+        if self.omitir_paginas_sin_movimientos and d.tipo == TipoPagina.SIN_TRANSACCIONES:
+            logger.info(f"Página {d.numero_pagina} omitida: {d.motivo_clasificacion}")
+            informe.registrar_omitida(d.pdf_path, d.numero_pagina, d.motivo_clasificacion)
+            return True
+        informe.registrar_subida(d.tamano_bytes, d.bytes_subida)
+        return False
+
+    def _recoger_resultados(
+        self,
+        pdf_path: str,
+        futuros: List[Future],
+        informe: InformeEjecucion,
+        descriptores: List[DescriptorPagina],
+        periodo: Optional[Tuple[date, date]] = None,
+    ) -> Optional[List[Transaccion]]:
+        """
+        Espera las páginas de un documento y concatena sus transacciones en
+        orden. Si alguna página falla, el documento completo se da por fallido.
+        """
+        por_pagina: List[List[Transaccion]] = []
+        for futuro in futuros:
+            try:
+                por_pagina.append(futuro.result())
+                informe.registrar_procesada()
+            except Exception as e:
+                logger.error(f"Error crítico durante la extracción de {pdf_path}: {e}", exc_info=True)
+                for pendiente in futuros:
+                    pendiente.cancel()
+                return None
+        return self._finalizar_documento(pdf_path, por_pagina, informe, descriptores, periodo)
+
+    def _finalizar_documento(
+        self,
+        pdf_path: str,
+        por_pagina: List[List[Transaccion]],
+        informe: InformeEjecucion,
+        descriptores: List[DescriptorPagina],
+        periodo: Optional[Tuple[date, date]] = None,
+    ) -> List[Transaccion]:
+        """
+        Concatena las páginas de un documento completo, normaliza sus fechas
+        con el periodo del extracto, separa los movimientos ya vistos y los
+        guarda en el libro de movimientos, si están habilitados.
+        """
+        all_transactions = [t for transacciones in por_pagina for t in transacciones]
+        if self.normalizar_fechas:
+            corregidas, sin_resolver = aplicar_normalizacion(all_transactions, periodo)
+            if corregidas:
+                informe.incrementar("fechas_corregidas", corregidas)
+            if sin_resolver:
+                informe.incrementar("fechas_sin_resolver", sin_resolver)
+
+        if self.indice_huellas is not None:
+            all_transactions, por_pagina = self._separar_repetidos(
+                self.indice_huellas, pdf_path, descriptores, por_pagina, informe
+            )
+
+        if self.libro is not None:
+            self._guardar_en_libro(self.libro, pdf_path, descriptores, por_pagina, informe)
+
+        logger.info(f"Extracción completada para {os.path.basename(pdf_path)}. Total de transacciones: {len(all_transactions)}")
+        return all_transactions
+
+    @staticmethod
+    def _cuenta_documento(descriptores: List[DescriptorPagina]) -> Optional[str]:
+        """Primer número de cuenta que aparece en la capa de texto del documento."""
+        return next((c for c in (detectar_cuenta(d.texto) for d in descriptores) if c), None)
+
+    @staticmethod
+    def _banco_documento(descriptores: List[DescriptorPagina]) -> Optional[str]:
+        """Primer nombre de banco que aparece en la capa de texto del documento."""
+        return next((b for b in (detectar_banco(d.texto) for d in descriptores) if b), None)
+
+    def _separar_repetidos(
+        self,
+        indice: IndiceHuellas,
+        pdf_path: str,
+        descriptores: List[DescriptorPagina],
+        por_pagina: List[List[Transaccion]],
+        informe: InformeEjecucion,
+    ) -> Tuple[List[Transaccion], List[List[Transaccion]]]:
+        """
+        Consulta en el índice de huellas los movimientos del documento. Los
+        ya vistos en otro extracto de la misma cuenta se descartan o, con
+        ACCION = marcar, se conservan y se anotan en el informe. Las huellas
+        del documento quedan pendientes hasta que se confirme su exportación.
+        Un fallo del índice no invalida la extracción.
+        """
+        todas = [t for transacciones in por_pagina for t in transacciones]
+        cuenta = self._cuenta_documento(descriptores) or ""
+        try:
+            documento = hash_archivo(pdf_path)
+            vistas = indice.consultar(cuenta, todas, documento)
+        except Exception as e:
+            logger.error(f"No se pudo consultar el índice de huellas para {pdf_path}: {e}")
+            return todas, por_pagina
+        with self._lock_huellas:
+            self._huellas_pendientes[pdf_path] = (cuenta, todas, documento, informe.id_ejecucion)
+        repetidas = [i for i, vista in enumerate(vistas) if vista]
+        if not repetidas:
+            return todas, por_pagina
+
+        informe.incrementar("movimientos_repetidos", len(repetidas))
+        logger.info(f"{os.path.basename(pdf_path)}: {len(repetidas)} movimientos ya vistos en otro extracto.")
+        if self.accion_repetidos == "marcar":
+            informe.registrar_repetidos(pdf_path, repetidas)
+            return todas, por_pagina
+
+        filtradas: List[List[Transaccion]] = []
+        posicion = 0
+        for transacciones in por_pagina:
+            filtradas.append([t for i, t in enumerate(transacciones, posicion) if not vistas[i]])
+            posicion += len(transacciones)
+        return [t for transacciones in filtradas for t in transacciones], filtradas
+
+    def confirmar_huellas(self, pdf_path: str) -> None:
+        """
+        Registra en el índice las huellas del último documento extraído de
+        `pdf_path`. Se llama cuando sus movimientos ya se exportaron bien, de
+        modo que un fallo de exportación no los marca como vistos. Un fallo
+        del índice solo se registra en el log.
+        """
+        with self._lock_huellas:
+            pendiente = self._huellas_pendientes.pop(pdf_path, None)
+        if pendiente is None or self.indice_huellas is None:
+            return
+        cuenta, transacciones, documento, id_ejecucion = pendiente
+        try:
+            nuevas = self.indice_huellas.registrar(cuenta, transacciones, documento, pdf_path, id_ejecucion)
+            logger.debug(f"{os.path.basename(pdf_path)}: {nuevas} huellas nuevas en el índice.")
+        except Exception as e:
+            logger.error(f"No se pudieron registrar las huellas de {pdf_path}: {e}")
+
+    def _guardar_en_libro(
+        self,
+        libro: LibroMovimientos,
+        pdf_path: str,
+        descriptores: List[DescriptorPagina],
+        por_pagina: List[List[Transaccion]],
+        informe: InformeEjecucion,
+    ) -> None:
+        """
+        Guarda las transacciones de un documento en el libro, una inserción
+        en bloque por página. Un fallo del libro no invalida la extracción.
+        """
+        cuenta = self._cuenta_documento(descriptores)
+        banco = self._banco_documento(descriptores)
+        try:
+            libro.iniciar_ejecucion(informe.id_ejecucion)
+            for descriptor, transacciones in zip(descriptores, por_pagina):
+                libro.registrar_pagina(
+                    informe.id_ejecucion, pdf_path, descriptor.numero_pagina, transacciones,
+                    banco=banco, cuenta=cuenta,
+                )
+        except Exception as e:
+            logger.error(f"No se pudo guardar {pdf_path} en el libro de movimientos: {e}")
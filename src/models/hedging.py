@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Fichero: hedging.py
+Proyecto: Extractor de Movimientos Bancarios con IA
+
+Desarrollado por: IA Punto Soluciones Tecnológicas
+Para: Industrias Pico
+Responsable: MEng Sergio Rondón
+Fecha de Creación: 19/10/2026
+
+Descripción:
+Peticiones duplicadas ("hedging") contra la latencia de cola. Un documento
+no está listo hasta que termina su página más lenta, y de vez en cuando una
+llamada a Gemini tarda varias veces la mediana. Si una llamada no ha
+respondido al llegar al percentil configurado de las latencias recientes de
+su modelo, se lanza una copia y se usa la primera respuesta válida.
+
+El número de copias está limitado por un presupuesto: una fracción del total
+de llamadas.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Deque, Dict, Optional, Tuple
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Latencias recientes que se guardan por modelo para calcular el plazo.
+VENTANA_LATENCIAS = 200
+
+
+class PoliticaHedging:
+    """
+    Decide cuándo duplicar una llamada y la ejecuta. Es compartida por todos
+    los hilos del extractor.
+    """
+
+    def __init__(
+        self,
+        percentil: float = 95.0,
+        presupuesto: float = 0.05,
+        min_muestras: int = 20,
+        plazo_minimo_s: float = 2.0,
+        max_workers: int = 4,
+    ):
+        """
+        Args:
+            percentil: Percentil de las latencias recientes a partir del cual
+                       se duplica una llamada.
+            presupuesto: Fracción máxima de llamadas que se pueden duplicar.
+            min_muestras: Latencias necesarias de un modelo antes de duplicar.
+            plazo_minimo_s: Plazo mínimo antes de duplicar, para no duplicar
+                            llamadas que ya son rápidas.
+            max_workers: Hilos para las llamadas vigiladas.
+        """
+        self.percentil = min(max(percentil, 0.0), 100.0)
+        self.presupuesto = max(presupuesto, 0.0)
+        self.min_muestras = max(1, min_muestras)
+        self.plazo_minimo_s = plazo_minimo_s
+        self.llamadas = 0
+        self.duplicadas = 0
+        self.ganadas_por_copia = 0
+        self._latencias: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedging")
+
+    def registrar_latencia(self, modelo: str, segundos: float) -> None:
+        with self._lock:
+            self._latencias.setdefault(modelo, deque(maxlen=VENTANA_LATENCIAS)).append(segundos)
+
+    def plazo(self, modelo: str) -> Optional[float]:
+        """Segundos tras los que se duplica una llamada a `modelo`, o None si aún no hay muestras suficientes."""
+        with self._lock:
+            latencias = sorted(self._latencias.get(modelo, ()))
+        if len(latencias) < self.min_muestras:
+            return None
+        indice = min(len(latencias) - 1, int(len(latencias) * self.percentil / 100))
+        return max(latencias[indice], self.plazo_minimo_s)
+
+    def _reservar_copia(self) -> bool:
+        """Reserva una copia si el presupuesto lo permite."""
+        with self._lock:
+            if self.duplicadas + 1 > self.presupuesto * self.llamadas:
+                return False
+            self.duplicadas += 1
+            return True
+
+    def ejecutar(
+        self,
+        modelo: str,
+        llamada: Callable[[], object],
+        al_perder: Optional[Callable[[object], None]] = None,
+    ) -> Tuple[object, bool, bool]:
+        """
+        Ejecuta `llamada` y, si no responde dentro del plazo del modelo y
+        queda presupuesto, lanza una copia. Devuelve la primera respuesta
+        válida: si una de las dos falla, se espera a la otra. La latencia de
+        cada llamada terminada se anota para los plazos siguientes.
+
+        La llamada perdedora no se cancela (ya está en curso) y también se
+        factura: cuando termina bien, su respuesta se pasa a `al_perder`,
+        desde el hilo que la ejecutó, para que se contabilicen sus tokens.
+
+        Returns:
+            (respuesta, duplicada, gano_copia): si se lanzó una copia y si la
+            respuesta devuelta es la de la copia.
+
+        Raises:
+            La excepción de la llamada original si fallan todas.
+        """
+        def cronometrada() -> object:
+            inicio = time.perf_counter()
+            respuesta = llamada()
+            self.registrar_latencia(modelo, time.perf_counter() - inicio)
+            return respuesta
+
+        with self._lock:
+            self.llamadas += 1
+        plazo = self.plazo(modelo)
+        original = self._pool.submit(cronometrada)
+        if plazo is None:
+            return original.result(), False, False
+
+        hechos, _ = wait([original], timeout=plazo)
+        if hechos or not self._reservar_copia():
+            return original.result(), False, False
+
+        logger.info(f"Llamada a {modelo} sin respuesta tras {plazo:.1f} s; se lanza una copia.")
+        copia = self._pool.submit(cronometrada)
+        pendientes = {original, copia}
+        while pendientes:
+            hechos, pendientes = wait(pendientes, return_when=FIRST_COMPLETED)
+            for futuro in (f for f in (original, copia) if f in hechos):
+                if futuro.exception() is None:
+                    if futuro is copia:
+                        with self._lock:
+                            self.ganadas_por_copia += 1
+                    if al_perder is not None:
+                        perdedora = original if futuro is copia else copia
+                        perdedora.add_done_callback(
+                            lambda f: al_perder(f.result()) if f.exception() is None else None
+                        )
+                    return futuro.result(), True, futuro is copia
+        # Ambas fallaron: se propaga el error de la llamada original.
+        return original.result(), True, False
+
+    def resumen(self) -> str:
+        return (
+            f"Hedging: {self.duplicadas} copias de {self.llamadas} llamadas, "
+            f"{self.ganadas_por_copia} ganadas por la copia."
+        )
+
+    def cerrar(self) -> None:
+        self._pool.shutdown(wait=False)
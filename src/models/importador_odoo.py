@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+Fichero: importador_odoo.py
+Proyecto: Extractor de Movimientos Bancarios con IA
+
+Desarrollado por: IA Punto Soluciones Tecnológicas
+Para: Industrias Pico
+Responsable: MEng Sergio Rondón
+Fecha de Creación: 19/10/2026
+
+Descripción:
+Importación directa de los movimientos en Odoo como líneas de extracto
+bancario (`account.bank.statement.line`) mediante la API XML-RPC externa, sin
+pasar por un CSV intermedio.
+
+Las líneas se envían por lotes: por cada lote se hace una consulta de las
+claves ya importadas y una sola llamada `create` con todas las líneas nuevas.
+Cada línea lleva una clave de idempotencia en `unique_import_id`, de modo que
+repetir una importación (por un corte de red o por error) no duplica
+movimientos. Las conexiones HTTP se reutilizan durante toda la importación.
+
+`DestinoOdoo` lo expone como un destino más de `exportar_transacciones`, para
+usarlo desde la interfaz y desde el modo servicio (FORMATOS = odoo).
+"""
+
+import configparser
+import hashlib
+import logging
+import threading
+import xmlrpc.client
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, cast
+
+from .data_models import Transaccion
+from .exportador import DestinoExportacion, FilaExportacion
+from .normalizador_fechas import texto_a_fecha
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+MODELO_LINEA = "account.bank.statement.line"
+PREFIJO_CLAVE = "extractor-ia"
+
+
+@dataclass
+class ResultadoImportacion:
+    """Resultado de importar un lote de movimientos en Odoo."""
+
+    creadas: List[int] = field(default_factory=list)
+    existentes: int = 0
+    invalidas: int = 0
+    llamadas: int = 0
+
+    def resumen(self) -> str:
+        return (
+            f"Odoo: {len(self.creadas)} líneas creadas, {self.existentes} ya importadas, "
+            f"{self.invalidas} sin fecha válida, {self.llamadas} llamadas RPC."
+        )
+
+
+def claves_idempotencia(transacciones: Sequence[Transaccion], diario_id: int) -> List[str]:
+    """
+    Claves estables para `unique_import_id`: dependen del diario, la fecha, el
+    importe y la descripción, más un ordinal para distinguir movimientos
+    idénticos legítimos del mismo extracto.
+    """
+    vistas: Dict[str, int] = {}
+    claves = []
+    for t in transacciones:
+        base = f"{diario_id}|{t.fecha}|{(t.credito or 0.0) - (t.debito or 0.0):.2f}|{t.descripcion.strip()}"
+        ordinal = vistas[base] = vistas.get(base, 0) + 1
+        resumen = hashlib.sha256(f"{base}|{ordinal}".encode("utf-8")).hexdigest()[:32]
+        claves.append(f"{PREFIJO_CLAVE}-{resumen}")
+    return claves
+
+
+class ImportadorOdoo:
+    """
+    Crea líneas de extracto bancario en Odoo (14 o posterior) por XML-RPC.
+    La conexión se configura en la sección [ODOO] de settings.ini. Se puede
+    compartir entre hilos: las importaciones se hacen de una en una, porque
+    los clientes XML-RPC reutilizan una sola conexión.
+    """
+
+    def __init__(self, config_path: str = "config/settings.ini"):
+        """
+        Lee la configuración de la conexión.
+
+        Raises:
+            ValueError: Si falta algún dato obligatorio de la conexión.
+        """
+        config = configparser.ConfigParser()
+        config.read(config_path)
+        self.url = config.get("ODOO", "url", fallback="").strip().rstrip("/")
+        self.base_datos = config.get("ODOO", "base_datos", fallback="").strip()
+        self.usuario = config.get("ODOO", "usuario", fallback="").strip()
+        self.clave = config.get("ODOO", "clave_api", fallback="").strip()
+        self.diario_id = config.getint("ODOO", "diario_id", fallback=0)
+        self.tamano_lote = max(1, config.getint("ODOO", "tamano_lote", fallback=500))
+
+        faltan = [
+            nombre for nombre, valor in (
+                ("URL", self.url), ("BASE_DATOS", self.base_datos),
+                ("USUARIO", self.usuario), ("CLAVE_API", self.clave), ("DIARIO_ID", self.diario_id),
+            ) if not valor
+        ]
+        if faltan:
+            raise ValueError(f"Falta configurar en [ODOO]: {', '.join(faltan)}")
+
+        self._uid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._common = xmlrpc.client.ServerProxy(f"{self.url}/xmlrpc/2/common", allow_none=True)
+        self._object = xmlrpc.client.ServerProxy(f"{self.url}/xmlrpc/2/object", allow_none=True)
+
+    def _conectar(self, resultado: ResultadoImportacion) -> int:
+        """Autentica una sola vez por importador y devuelve el uid."""
+        if self._uid is None:
+            resultado.llamadas += 1
+            uid = self._common.authenticate(self.base_datos, self.usuario, self.clave, {})
+            if not uid:
+                raise ConnectionError("Odoo rechazó el usuario o la clave de API configurados.")
+            self._uid = cast(int, uid)
+        return self._uid
+
+    def _ejecutar(self, resultado: ResultadoImportacion, metodo: str, *args: Any, **kwargs: Any) -> Any:
+        resultado.llamadas += 1
+        return self._object.execute_kw(
+            self.base_datos, self._uid, self.clave, MODELO_LINEA, metodo, list(args), kwargs
+        )
+
+    def importar(self, transacciones: Sequence[Transaccion]) -> ResultadoImportacion:
+        """
+        Importa los movimientos en el diario configurado.
+
+        Args:
+            transacciones: Los movimientos extraídos, con fechas dd-mm-aaaa.
+
+        Returns:
+            Un ResultadoImportacion con los ids creados y el número de
+            movimientos que ya existían o no tenían una fecha válida.
+
+        Raises:
+            ConnectionError: Si Odoo no responde o rechaza la operación.
+        """
+        resultado = ResultadoImportacion()
+        lineas = []
+        for transaccion, clave in zip(transacciones, claves_idempotencia(transacciones, self.diario_id)):
+            fecha = texto_a_fecha(transaccion.fecha)
+            if fecha is None:
+                resultado.invalidas += 1
+                logger.warning(f"Movimiento sin fecha válida, no se importa: {transaccion.fecha!r}")
+                continue
+            lineas.append({
+                "journal_id": self.diario_id,
+                "date": fecha.isoformat(),
+                "payment_ref": transaccion.descripcion,
+                "amount": round((transaccion.credito or 0.0) - (transaccion.debito or 0.0), 2),
+                "unique_import_id": clave,
+            })
+
+        try:
+            with self._lock:
+                self._importar_lotes(lineas, resultado)
+        except (xmlrpc.client.Error, OSError) as e:
+            logger.error(f"Error al importar en Odoo: {e}")
+            raise ConnectionError(f"No se pudo completar la importación en Odoo: {e}")
+
+        logger.info(resultado.resumen())
+        return resultado
+
+    def _importar_lotes(self, lineas: List[Dict], resultado: ResultadoImportacion) -> None:
+        """Crea por lotes las líneas que aún no están en Odoo."""
+        self._conectar(resultado)
+        for inicio in range(0, len(lineas), self.tamano_lote):
+            lote = lineas[inicio:inicio + self.tamano_lote]
+            existentes = {
+                r["unique_import_id"]
+                for r in self._ejecutar(
+                    resultado, "search_read",
+                    [["unique_import_id", "in", [linea["unique_import_id"] for linea in lote]]],
+                    fields=["unique_import_id"],
+                )
+            }
+            nuevas = [linea for linea in lote if linea["unique_import_id"] not in existentes]
+            resultado.existentes += len(lote) - len(nuevas)
+            if nuevas:
+                ids = self._ejecutar(resultado, "create", nuevas)
+                resultado.creadas.extend(ids if isinstance(ids, list) else [ids])
+            logger.info(
+                f"Lote {inicio // self.tamano_lote + 1}: {len(nuevas)} líneas creadas, "
+                f"{len(lote) - len(nuevas)} ya existían."
+            )
+
+
+class DestinoOdoo(DestinoExportacion):
+    """
+    Destino de exportación que importa las filas en Odoo al cerrarse, en los
+    lotes del importador. `ruta` solo identifica el destino en el resultado
+    de `exportar_transacciones`.
+    """
+
+    nombre = "Odoo"
+
+    def __init__(self, importador: ImportadorOdoo, ruta: str = ""):
+        super().__init__(ruta or f"{importador.url} (diario {importador.diario_id})")
+        self.importador = importador
+        self.resultado: Optional[ResultadoImportacion] = None
+        self._transacciones: List[Transaccion] = []
+
+    def escribir(self, fila: FilaExportacion) -> None:
+        self._transacciones.append(
+            Transaccion(fecha=fila.fecha, descripcion=fila.descripcion, debito=fila.debito, credito=fila.credito)
+        )
+
+    def cerrar(self) -> None:
+        self.resultado = self.importador.importar(self._transacciones)
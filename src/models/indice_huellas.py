@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+Fichero: indice_huellas.py
+Proyecto: Extractor de Movimientos Bancarios con IA
+
+Desarrollado por: IA Punto Soluciones Tecnológicas
+Para: Industrias Pico
+Responsable: MEng Sergio Rondón
+Fecha de Creación: 19/10/2026
+
+Descripción:
+Índice persistente (SQLite) de huellas de movimientos por cuenta, para
+detectar los movimientos que ya aparecieron en un extracto anterior: meses
+consecutivos que se solapan o el mismo extracto descargado dos veces con
+distintos rangos de fechas.
+
+La huella es un hash de la fecha, el importe y la descripción normalizados,
+más un ordinal para distinguir movimientos idénticos legítimos del mismo
+extracto (dos cafés iguales el mismo día). Cada fila se comprueba con una
+búsqueda por clave primaria.
+
+La consulta y el registro van por separado: las huellas de un extracto solo
+se registran cuando sus movimientos se exportaron bien, y las registradas
+por el mismo documento (mismo contenido del PDF) no cuentan como repetidas,
+de modo que volver a extraer un extracto devuelve sus movimientos.
+"""
+
+import hashlib
+import logging
+import sqlite3
+import threading
+import unicodedata
+from datetime import datetime
+from typing import Dict, List, Sequence
+
+from .data_models import Transaccion
+from .normalizador_fechas import texto_a_fecha
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS huellas (
+    cuenta TEXT NOT NULL,
+    huella TEXT NOT NULL,
+    documento TEXT NOT NULL,
+    archivo TEXT,
+    id_ejecucion TEXT,
+    registrada TEXT NOT NULL,
+    PRIMARY KEY (cuenta, huella)
+) WITHOUT ROWID;
+"""
+
+
+def _normalizar(texto: str) -> str:
+    sin_tildes = unicodedata.normalize("NFKD", texto or "").encode("ascii", "ignore").decode()
+    return " ".join(sin_tildes.upper().split())
+
+
+def hash_archivo(ruta: str, tamano_bloque: int = 1024 * 1024) -> str:
+    """SHA-256 del contenido de un archivo, leído por bloques."""
+    resumen = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(tamano_bloque), b""):
+            resumen.update(bloque)
+    return resumen.hexdigest()
+
+
+def huellas_transacciones(transacciones: Sequence[Transaccion]) -> List[str]:
+    """
+    Huellas de las transacciones de un extracto, en el mismo orden. Las
+    fechas se comparan ya normalizadas ('aaaa-mm-dd' cuando tienen año).
+    """
+    vistas: Dict[str, int] = {}
+    huellas = []
+    for t in transacciones:
+        fecha = texto_a_fecha(t.fecha)
+        base = (
+            f"{fecha.isoformat() if fecha else t.fecha.strip()}|"
+            f"{(t.credito or 0.0) - (t.debito or 0.0):.2f}|{_normalizar(t.descripcion)}"
+        )
+        ordinal = vistas[base] = vistas.get(base, 0) + 1
+        huellas.append(hashlib.sha256(f"{base}|{ordinal}".encode("utf-8")).hexdigest()[:32])
+    return huellas
+
+
+class IndiceHuellas:
+    """
+    Huellas de los movimientos ya procesados, por cuenta. Es seguro usarlo
+    desde varios hilos: todas las operaciones comparten una conexión
+    protegida por un candado.
+    """
+
+    def __init__(self, ruta_db: str):
+        self.ruta_db = ruta_db
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(ruta_db, check_same_thread=False)
+        with self._lock, self._conexion:
+            self._conexion.execute("PRAGMA journal_mode=WAL")
+            self._conexion.executescript(_ESQUEMA)
+        logger.info(f"Índice de huellas abierto en: {ruta_db}")
+
+    def cerrar(self) -> None:
+        with self._lock:
+            self._conexion.close()
+
+    def consultar(self, cuenta: str, transacciones: Sequence[Transaccion], documento: str) -> List[bool]:
+        """
+        Marca qué transacciones de un extracto ya estaban en el índice por
+        haber aparecido en otro documento. No modifica el índice.
+
+        Args:
+            cuenta: Número de cuenta del extracto ('' si no se detectó).
+            transacciones: Las transacciones del extracto, en orden.
+            documento: Hash del contenido del PDF (ver `hash_archivo`).
+
+        Returns:
+            Una lista paralela a `transacciones`: True si la fila ya se había visto.
+        """
+        vistas = []
+        with self._lock:
+            for huella in huellas_transacciones(transacciones):
+                fila = self._conexion.execute(
+                    "SELECT documento FROM huellas WHERE cuenta = ? AND huella = ?", (cuenta, huella)
+                ).fetchone()
+                vistas.append(fila is not None and fila[0] != documento)
+        return vistas
+
+    def registrar(
+        self,
+        cuenta: str,
+        transacciones: Sequence[Transaccion],
+        documento: str,
+        archivo: str = "",
+        id_ejecucion: str = "",
+    ) -> int:
+        """
+        Añade al índice las huellas de un extracto ya exportado, en una sola
+        transacción de SQLite. Las huellas que ya estaban se conservan con
+        su documento de origen.
+
+        Args:
+            cuenta: Número de cuenta del extracto ('' si no se detectó).
+            transacciones: Todas las transacciones del extracto, en orden.
+            documento: Hash del contenido del PDF.
+            archivo: PDF de origen, para saber de dónde vino cada huella.
+            id_ejecucion: Ejecución del extractor.
+
+        Returns:
+            El número de huellas nuevas.
+        """
+        ahora = datetime.now().isoformat(timespec="seconds")
+        filas = [(cuenta, h, documento, archivo, id_ejecucion, ahora) for h in huellas_transacciones(transacciones)]
+        with self._lock, self._conexion:
+            antes = self._conexion.total_changes
+            self._conexion.executemany(
+                "INSERT OR IGNORE INTO huellas (cuenta, huella, documento, archivo, id_ejecucion, registrada) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                filas,
+            )
+            return self._conexion.total_changes - antes
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+Fichero: informe_ejecucion.py
+Proyecto: Extractor de Movimientos Bancarios con IA
+
+Desarrollado por: IA Punto Soluciones Tecnológicas
+Para: Industrias Pico
+Responsable: MEng Sergio Rondón
+Fecha de Creación: 19/10/2026
+
+Descripción:
+Informe de una ejecución del extractor: qué páginas se procesaron, cuáles se
+omitieron y por qué, cuántos bytes se subieron a la API y cuántos tokens se
+consumieron. Lo rellenan varios
+hilos a la vez, por lo que todas las escrituras pasan por un candado.
+"""
+
+import logging
+import threading
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from .costes import ConsumoPagina
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PaginaOmitida:
+    """Una página que no se envió a la IA."""
+
+    pdf_path: str
+    numero_pagina: int
+    motivo: str
+
+
+@dataclass
+class EstadisticasModelo:
+    """Uso de un modelo de la cascada durante la ejecución."""
+
+    paginas: int = 0
+    llamadas: int = 0
+    segundos: float = 0.0
+    escaladas: int = 0
+
+    @property
+    def segundos_por_pagina(self) -> float:
+        return self.segundos / self.paginas if self.paginas else 0.0
+
+
+@dataclass
+class InformeEjecucion:
+    """Contadores y detalle de una ejecución de extracción."""
+
+    id_ejecucion: str = field(default_factory=lambda: uuid.uuid4().hex)
+    paginas_totales: int = 0
+    paginas_procesadas: int = 0
+    paginas_omitidas: List[PaginaOmitida] = field(default_factory=list)
+    bytes_originales: int = 0
+    bytes_subidos: int = 0
+    contadores: Dict[str, int] = field(default_factory=dict)
+    modelos: Dict[str, EstadisticasModelo] = field(default_factory=dict)
+    consumos: List[ConsumoPagina] = field(default_factory=list)
+    tokens_entrada: int = 0
+    tokens_salida: int = 0
+    coste: float = 0.0
+    # Posiciones, en el resultado de cada documento, de los movimientos que ya
+    # aparecieron en un extracto anterior (modo "marcar" del índice de huellas).
+    movimientos_repetidos: Dict[str, List[int]] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def registrar_paginas(self, cantidad: int) -> None:
+        with self._lock:
+            self.paginas_totales += cantidad
+
+    def registrar_procesada(self) -> None:
+        with self._lock:
+            self.paginas_procesadas += 1
+
+    def registrar_subida(self, bytes_originales: int, bytes_subidos: int) -> None:
+        with self._lock:
+            self.bytes_originales += bytes_originales
+            self.bytes_subidos += bytes_subidos
+
+    @property
+    def bytes_ahorrados(self) -> int:
+        return self.bytes_originales - self.bytes_subidos
+
+    def incrementar(self, contador: str, cantidad: int = 1) -> None:
+        """Suma `cantidad` a un contador con nombre (filas recuperadas, etc.)."""
+        with self._lock:
+            self.contadores[contador] = self.contadores.get(contador, 0) + cantidad
+
+    def registrar_consumo(self, consumo: ConsumoPagina) -> None:
+        """Anota los tokens y el coste estimado de una página."""
+        with self._lock:
+            self.consumos.append(consumo)
+            self.tokens_entrada += consumo.tokens_entrada
+            self.tokens_salida += consumo.tokens_salida
+            self.coste += consumo.coste
+
+    def registrar_pagina(self, modelo: str) -> None:
+        """Anota una página extraída (o intentada) con `modelo`."""
+        with self._lock:
+            self.modelos.setdefault(modelo, EstadisticasModelo()).paginas += 1
+
+    def registrar_llamada(self, modelo: str, segundos: float) -> None:
+        """Anota una llamada a generate_content y su duración."""
+        with self._lock:
+            estadisticas = self.modelos.setdefault(modelo, EstadisticasModelo())
+            estadisticas.llamadas += 1
+            estadisticas.segundos += segundos
+
+    def registrar_escalada(self, modelo: str) -> None:
+        """Anota una página que `modelo` no resolvió y pasó al siguiente nivel."""
+        with self._lock:
+            self.modelos.setdefault(modelo, EstadisticasModelo()).escaladas += 1
+
+    def resumen_cascada(self) -> str:
+        """
+        Resume el uso de cada modelo y estima la latencia del modelo potente
+        que se evitó al resolver páginas con el modelo rápido.
+        """
+        if len(self.modelos) < 2:
+            return ""
+        nombres = list(self.modelos)
+        rapido, potente = self.modelos[nombres[0]], self.modelos[nombres[-1]]
+        partes = [
+            f"{nombre}: {e.paginas} páginas, {e.llamadas} llamadas, "
+            f"{e.segundos:.1f} s, {e.escaladas} escaladas"
+            for nombre, e in self.modelos.items()
+        ]
+        resueltas = rapido.paginas - rapido.escaladas
+        evitado = resueltas * potente.segundos_por_pagina
+        return f"Cascada: {'; '.join(partes)}. Latencia de {nombres[-1]} evitada ≈ {evitado:.0f} s."
+
+    def registrar_repetidos(self, pdf_path: str, posiciones: List[int]) -> None:
+        with self._lock:
+            self.movimientos_repetidos[pdf_path] = posiciones
+
+    def registrar_omitida(self, pdf_path: str, numero_pagina: int, motivo: str) -> None:
+        with self._lock:
+            self.paginas_omitidas.append(PaginaOmitida(pdf_path, numero_pagina, motivo))
+
+    def resumen(self) -> str:
+        """Devuelve un resumen de una línea apto para el log o la barra de estado."""
+        return (
+            f"Páginas: {self.paginas_totales} totales, "
+            f"{self.paginas_procesadas} procesadas, "
+            f"{len(self.paginas_omitidas)} omitidas. "
+            f"Subida: {self.bytes_subidos / 1024:.0f} KB "
+            f"({self.bytes_ahorrados / 1024:.0f} KB ahorrados por la optimización). "
+            f"Tokens: {self.tokens_entrada} de entrada, {self.tokens_salida} de salida "
+            f"(≈ {self.coste:.4f} USD)."
+        )
+
+    def registrar_en_log(self) -> None:
+        """Vuelca el resumen y el detalle de las páginas omitidas en el log."""
+        logger.info(self.resumen())
+        if self.contadores:
+            logger.info(f"Contadores: {self.contadores}")
+        if self.resumen_cascada():
+            logger.info(self.resumen_cascada())
+        for omitida in self.paginas_omitidas:
+            logger.info(
+                f"Página {omitida.numero_pagina} de {omitida.pdf_path} omitida: {omitida.motivo}"
+            )
@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+"""
+Fichero: libro_movimientos.py
+Proyecto: Extractor de Movimientos Bancarios con IA
+
+Desarrollado por: IA Punto Soluciones Tecnológicas
+Para: Industrias Pico
+Responsable: MEng Sergio Rondón
+Fecha de Creación: 19/10/2026
+
+Descripción:
+Libro local de movimientos en SQLite. Guarda cada transacción extraída junto
+con su archivo de origen, página, banco, cuenta y ejecución, de modo que las
+consultas históricas ("¿dónde apareció este pago?") y las reexportaciones no
+requieren volver a procesar los PDF.
+
+La tabla tiene índices por fecha e importe y un índice de texto completo
+(FTS5) sobre la descripción. Las inserciones se hacen en bloque, una
+transacción de SQLite por página.
+"""
+
+import logging
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from .data_models import Transaccion
+from .normalizador_fechas import texto_a_fecha
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS ejecuciones (
+    id TEXT PRIMARY KEY,
+    inicio TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS movimientos (
+    id INTEGER PRIMARY KEY,
+    id_ejecucion TEXT NOT NULL REFERENCES ejecuciones(id),
+    archivo TEXT NOT NULL,
+    pagina INTEGER NOT NULL,
+    banco TEXT,
+    cuenta TEXT,
+    fecha TEXT NOT NULL,
+    fecha_iso TEXT,
+    descripcion TEXT NOT NULL,
+    debito REAL,
+    credito REAL,
+    importe REAL
+);
+
+CREATE INDEX IF NOT EXISTS idx_movimientos_fecha ON movimientos(fecha_iso);
+CREATE INDEX IF NOT EXISTS idx_movimientos_importe ON movimientos(importe);
+CREATE INDEX IF NOT EXISTS idx_movimientos_archivo ON movimientos(archivo, pagina);
+"""
+
+# Índice de texto completo sobre la descripción, sincronizado por triggers.
+_ESQUEMA_FTS = """
+CREATE VIRTUAL TABLE IF NOT EXISTS movimientos_fts USING fts5(
+    descripcion, content='movimientos', content_rowid='id'
+);
+
+CREATE TRIGGER IF NOT EXISTS movimientos_ai AFTER INSERT ON movimientos BEGIN
+    INSERT INTO movimientos_fts(rowid, descripcion) VALUES (new.id, new.descripcion);
+END;
+
+CREATE TRIGGER IF NOT EXISTS movimientos_ad AFTER DELETE ON movimientos BEGIN
+    INSERT INTO movimientos_fts(movimientos_fts, rowid, descripcion)
+    VALUES ('delete', old.id, old.descripcion);
+END;
+"""
+
+# Números de cuenta como "Cuenta de ahorros No. 123-456789-01".
+_PATRON_CUENTA = re.compile(r"cuenta[^\d\n]{0,40}([\d][\d\- ]{5,}\d)", re.IGNORECASE)
+
+# Nombre del banco: "Banco de Bogotá", "Banco Caja Social" o las marcas que no
+# llevan la palabra "banco".
+_PATRON_BANCO = re.compile(
+    r"\b(banco(?:[ \t]+(?:de|del|la|el|caja|av))*[ \t]+[^\W\d_]+"
+    r"|bancolombia|davivienda|bbva|scotiabank(?:[ \t]+colpatria)?|colpatria|ita[uú]|nequi)\b",
+    re.IGNORECASE,
+)
+
+
+def fecha_a_iso(fecha: str) -> Optional[str]:
+    """Convierte una fecha completa a 'aaaa-mm-dd'; None si no se puede."""
+    valor = texto_a_fecha(fecha)
+    return valor.isoformat() if valor else None
+
+
+def detectar_cuenta(texto: str) -> Optional[str]:
+    """Busca un número de cuenta en la capa de texto de una página."""
+    coincidencia = _PATRON_CUENTA.search(texto or "")
+    return coincidencia.group(1).replace(" ", "") if coincidencia else None
+
+
+def detectar_banco(texto: str) -> Optional[str]:
+    """Busca el nombre del banco en la capa de texto de una página, en mayúsculas."""
+    coincidencia = _PATRON_BANCO.search(texto or "")
+    return " ".join(coincidencia.group(1).upper().split()) if coincidencia else None
+
+
+def _a_consulta_fts(texto: str) -> str:
+    """Convierte texto libre en una consulta FTS5 de términos obligatorios."""
+    terminos = re.findall(r"\w+", texto)
+    return " ".join(f'"{t}"' for t in terminos)
+
+
+class LibroMovimientos:
+    """
+    Almacén SQLite de los movimientos extraídos. Es seguro usarlo desde
+    varios hilos: todas las operaciones comparten una conexión protegida por
+    un candado.
+    """
+
+    def __init__(self, ruta_db: str):
+        self.ruta_db = ruta_db
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(ruta_db, check_same_thread=False)
+        self._conexion.row_factory = sqlite3.Row
+        with self._lock, self._conexion:
+            self._conexion.execute("PRAGMA journal_mode=WAL")
+            self._conexion.executescript(_ESQUEMA)
+            try:
+                self._conexion.executescript(_ESQUEMA_FTS)
+                self.fts_disponible = True
+            except sqlite3.OperationalError as e:
+                # SQLite compilado sin FTS5: la búsqueda de texto usa LIKE.
+                logger.warning(f"FTS5 no disponible, la búsqueda por texto será más lenta: {e}")
+                self.fts_disponible = False
+        logger.info(f"Libro de movimientos abierto en: {ruta_db}")
+
+    def cerrar(self) -> None:
+        with self._lock:
+            self._conexion.close()
+
+    def iniciar_ejecucion(self, id_ejecucion: str) -> None:
+        """Registra una ejecución del extractor."""
+        with self._lock, self._conexion:
+            self._conexion.execute(
+                "INSERT OR IGNORE INTO ejecuciones (id, inicio) VALUES (?, ?)",
+                (id_ejecucion, datetime.now().isoformat(timespec="seconds")),
+            )
+
+    def registrar_pagina(
+        self,
+        id_ejecucion: str,
+        archivo: str,
+        pagina: int,
+        transacciones: List[Transaccion],
+        banco: Optional[str] = None,
+        cuenta: Optional[str] = None,
+    ) -> None:
+        """Inserta en bloque las transacciones de una página."""
+        if not transacciones:
+            return
+        filas = [
+            (
+                id_ejecucion, archivo, pagina, banco, cuenta,
+                t.fecha, fecha_a_iso(t.fecha), t.descripcion, t.debito, t.credito,
+                (t.credito or 0.0) - (t.debito or 0.0),
+            )
+            for t in transacciones
+        ]
+        with self._lock, self._conexion:
+            self._conexion.executemany(
+                "INSERT INTO movimientos (id_ejecucion, archivo, pagina, banco, cuenta, fecha, "
+                "fecha_iso, descripcion, debito, credito, importe) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                filas,
+            )
+
+    def buscar(
+        self,
+        texto: Optional[str] = None,
+        desde: Optional[str] = None,
+        hasta: Optional[str] = None,
+        importe: Optional[float] = None,
+        tolerancia: float = 0.005,
+        archivo: Optional[str] = None,
+        cuenta: Optional[str] = None,
+        limite: Optional[int] = 1000,
+    ) -> List[Dict[str, Any]]:
+        """
+        Busca movimientos en el libro.
+
+        Args:
+            texto: Palabras que deben aparecer en la descripción (texto completo).
+            desde: Fecha mínima, 'dd-mm-aaaa' o 'aaaa-mm-dd'.
+            hasta: Fecha máxima, 'dd-mm-aaaa' o 'aaaa-mm-dd'.
+            importe: Importe a buscar, en valor absoluto (débito o crédito).
+            tolerancia: Diferencia admitida al comparar el importe.
+            archivo: Ruta del PDF de origen.
+            cuenta: Número de cuenta.
+            limite: Número máximo de resultados (None = sin límite).
+
+        Returns:
+            Una lista de diccionarios con las columnas de cada movimiento,
+            ordenada por fecha.
+        """
+        condiciones: List[str] = []
+        parametros: List[Any] = []
+        consulta = "SELECT m.* FROM movimientos m"
+        if texto:
+            union, condiciones, parametros = self._filtro_texto(texto)
+            consulta += union
+        if desde:
+            condiciones.append("m.fecha_iso >= ?")
+            parametros.append(fecha_a_iso(desde) or desde)
+        if hasta:
+            condiciones.append("m.fecha_iso <= ?")
+            parametros.append(fecha_a_iso(hasta) or hasta)
+        if importe is not None:
+            # Dos rangos sobre la columna indexada en lugar de ABS(importe).
+            condiciones.append("(m.importe BETWEEN ? AND ? OR m.importe BETWEEN ? AND ?)")
+            valor = abs(importe)
+            parametros += [valor - tolerancia, valor + tolerancia, -valor - tolerancia, -valor + tolerancia]
+        if archivo:
+            condiciones.append("m.archivo = ?")
+            parametros.append(archivo)
+        if cuenta:
+            condiciones.append("m.cuenta = ?")
+            parametros.append(cuenta)
+
+        if condiciones:
+            consulta += " WHERE " + " AND ".join(condiciones)
+        consulta += " ORDER BY m.fecha_iso, m.archivo, m.pagina, m.id"
+        if limite is not None:
+            consulta += " LIMIT ?"
+            parametros.append(limite)
+
+        with self._lock:
+            return [dict(fila) for fila in self._conexion.execute(consulta, parametros)]
+
+    def _filtro_texto(self, texto: str) -> Tuple[str, List[str], List[Any]]:
+        """JOIN, condiciones y parámetros para buscar palabras en la descripción."""
+        if self.fts_disponible:
+            return " JOIN movimientos_fts f ON f.rowid = m.id", ["movimientos_fts MATCH ?"], [_a_consulta_fts(texto)]
+        terminos = re.findall(r"\w+", texto)
+        return "", ["m.descripcion LIKE ?"] * len(terminos), [f"%{termino}%" for termino in terminos]
+
+    def obtener_transacciones(self, **filtros: Any) -> List[Transaccion]:
+        """
+        Igual que `buscar`, pero devuelve objetos Transaccion listos para los
+        escritores de CSV y Excel. Sin límite de resultados por defecto.
+        """
+        filtros.setdefault("limite", None)
+        return [
+            Transaccion(
+                fecha=fila["fecha"],
+                descripcion=fila["descripcion"],
+                debito=fila["debito"],
+                credito=fila["credito"],
+            )
+            for fila in self.buscar(**filtros)
+        ]
+
+    def exportar_csv(self, output_path: str, **filtros: Any) -> bool:
+        """Reexporta a CSV los movimientos que cumplen los filtros."""
+        from .csv_writer import escribir_transacciones_a_csv
+
+        return escribir_transacciones_a_csv(self.obtener_transacciones(**filtros), output_path)
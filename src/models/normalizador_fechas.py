@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""
+Fichero: normalizador_fechas.py
+Proyecto: Extractor de Movimientos Bancarios con IA
+
+Desarrollado por: IA Punto Soluciones Tecnológicas
+Para: Industrias Pico
+Responsable: MEng Sergio Rondón
+Fecha de Creación: 19/10/2026
+
+Descripción:
+Normalización local de las fechas de las transacciones. La IA infiere el año
+página a página y se equivoca a menudo en los extractos que cruzan el cambio
+de año (diciembre/enero). Aquí el año se decide una sola vez por documento a
+partir del periodo del extracto, y cada fecha se convierte en un `date` real
+en una única pasada sobre todas las transacciones del documento.
+
+El análisis de cada texto de fecha se cachea, porque en un extracto las mismas
+fechas se repiten en muchas filas.
+"""
+
+import logging
+import re
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
+
+from .data_models import Transaccion
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+FORMATO_FECHA = "%d-%m-%Y"
+
+_MESES = {
+    "ene": 1, "jan": 1, "feb": 2, "mar": 3, "abr": 4, "apr": 4, "may": 5,
+    "jun": 6, "jul": 7, "ago": 8, "aug": 8, "sep": 9, "set": 9, "oct": 10,
+    "nov": 11, "dic": 12, "dec": 12,
+}
+
+_NOMBRE_MES = r"[a-záéíóú]{3,10}\.?"
+
+# dd-mm-aaaa, dd/mm/aa, dd.mm, dd-MMM-aaaa, dd MMM, "dd de mes de aaaa"...
+_PATRON_DMA = re.compile(
+    r"^(\d{1,2})\s*(?:[/\-.]|\s|\s+de\s+)\s*(\d{1,2}|" + _NOMBRE_MES + r")"
+    r"(?:\s*(?:[/\-.]|\s|\s+de\s+|,)\s*(\d{4}|\d{2}))?$",
+    re.IGNORECASE,
+)
+_PATRON_ISO = re.compile(r"^(\d{4})[/\-.](\d{1,2})[/\-.](\d{1,2})$")
+
+# Fechas completas dentro de un texto libre (cabeceras del extracto).
+_PATRON_FECHA_EN_TEXTO = re.compile(
+    r"\b\d{4}[/\-.]\d{1,2}[/\-.]\d{1,2}\b"
+    r"|\b\d{1,2}\s*(?:[/\-.]|\s|\s+de\s+)\s*(?:\d{1,2}|" + _NOMBRE_MES + r")"
+    r"\s*(?:[/\-.]|\s|\s+de\s+|,)\s*\d{4}\b",
+    re.IGNORECASE,
+)
+_PATRON_LINEA_PERIODO = re.compile(r"periodo|período|desde|hasta|\bdel\b.*\bal\b", re.IGNORECASE)
+_PATRON_LINEA_CORTE = re.compile(r"corte", re.IGNORECASE)
+
+# Duración supuesta de un extracto cuando solo se conoce la fecha de corte.
+DIAS_PERIODO_POR_DEFECTO = 31
+
+# Margen alrededor del periodo para aceptar fechas (valor frente a operación).
+MARGEN_PERIODO = timedelta(days=10)
+
+FechaParcial = Tuple[int, int, Optional[int]]
+
+
+@lru_cache(maxsize=4096)
+def parsear_fecha(texto: str) -> Optional[FechaParcial]:
+    """
+    Analiza una fecha tal como la devuelve la IA o aparece en el extracto.
+
+    Returns:
+        Una tupla (dia, mes, anio) con anio None si el texto no lo incluye, o
+        None si el texto no parece una fecha.
+    """
+    texto = texto.strip().lower()
+    coincidencia = _PATRON_ISO.match(texto)
+    if coincidencia:
+        anio_iso, mes_iso, dia_iso = (int(g) for g in coincidencia.groups())
+        return dia_iso, mes_iso, anio_iso
+
+    coincidencia = _PATRON_DMA.match(texto)
+    if not coincidencia:
+        return None
+    texto_dia, texto_mes, texto_anio = coincidencia.groups()
+    mes: Optional[int] = int(texto_mes) if texto_mes.isdigit() else _MESES.get(texto_mes.rstrip(".")[:3])
+    if mes is None:
+        return None
+    anio: Optional[int] = None
+    if texto_anio is not None:
+        anio = int(texto_anio)
+        if anio < 100:
+            anio += 2000
+    dia = int(texto_dia)
+    if not (1 <= dia <= 31 and 1 <= mes <= 12):
+        return None
+    return dia, mes, anio
+
+
+def _crear_fecha(dia: int, mes: int, anio: int) -> Optional[date]:
+    try:
+        return date(anio, mes, dia)
+    except ValueError:
+        return None
+
+
+def texto_a_fecha(texto: str) -> Optional[date]:
+    """Convierte un texto con día, mes y año a `date`; None si le falta algo."""
+    partes = parsear_fecha(texto) if texto else None
+    if partes is None or partes[2] is None:
+        return None
+    return _crear_fecha(partes[0], partes[1], partes[2])
+
+
+def detectar_periodo(texto: str) -> Optional[Tuple[date, date]]:
+    """
+    Busca el periodo del extracto en la capa de texto de sus primeras páginas:
+    una línea con "periodo", "desde/hasta" o "del ... al" y dos fechas, o en
+    su defecto la fecha de corte.
+
+    Returns:
+        Una tupla (inicio, fin), o None si no se encontró.
+    """
+    corte = None
+    for linea in texto.splitlines():
+        fechas = [f for f in map(texto_a_fecha, _PATRON_FECHA_EN_TEXTO.findall(linea)) if f]
+        if len(fechas) >= 2 and _PATRON_LINEA_PERIODO.search(linea):
+            return min(fechas), max(fechas)
+        if fechas and corte is None and _PATRON_LINEA_CORTE.search(linea):
+            corte = fechas[0]
+    if corte is not None:
+        return corte - timedelta(days=DIAS_PERIODO_POR_DEFECTO), corte
+    return None
+
+
+def _anio_en_periodo(dia: int, mes: int, periodo: Tuple[date, date]) -> Optional[int]:
+    """El año con el que (dia, mes) cae dentro del periodo, o el más cercano."""
+    inicio, fin = periodo
+    mejor, distancia = None, None
+    for anio in range(inicio.year - 1, fin.year + 2):
+        fecha = _crear_fecha(dia, mes, anio)
+        if fecha is None:
+            continue
+        d = max((inicio - fecha).days, (fecha - fin).days, 0)
+        if distancia is None or d < distancia:
+            mejor, distancia = anio, d
+    return mejor
+
+
+def normalizar_fechas(
+    transacciones: Sequence[Transaccion],
+    periodo: Optional[Tuple[date, date]] = None,
+) -> List[Optional[date]]:
+    """
+    Resuelve las fechas de todas las transacciones de un documento.
+
+    Con el periodo del extracto, cada fecha recibe el año con el que cae dentro
+    del periodo; los años que trae la IA se corrigen si la dejan fuera y otro
+    año la deja dentro (el error típico de diciembre/enero). Sin periodo, el
+    año de referencia es el más frecuente entre las fechas completas y el
+    cambio de año se detecta por el salto de mes entre filas consecutivas.
+
+    Args:
+        transacciones: Las transacciones del documento, en orden.
+        periodo: El periodo (inicio, fin) del extracto, si se conoce.
+
+    Returns:
+        Una lista paralela a `transacciones` con la fecha de cada una, o None
+        si no se pudo interpretar.
+    """
+    partes = [parsear_fecha(t.fecha) for t in transacciones]
+    if periodo is not None:
+        return _fechas_en_periodo(partes, periodo)
+    return _fechas_en_secuencia(partes)
+
+
+def _fechas_en_periodo(
+    partes: Sequence[Optional[FechaParcial]], periodo: Tuple[date, date]
+) -> List[Optional[date]]:
+    """Da a cada fecha el año con el que cae dentro del periodo del extracto."""
+    inicio, fin = periodo[0] - MARGEN_PERIODO, periodo[1] + MARGEN_PERIODO
+    fechas: List[Optional[date]] = []
+    for p in partes:
+        if p is None:
+            fechas.append(None)
+            continue
+        dia, mes, anio = p
+        fecha = _crear_fecha(dia, mes, anio) if anio is not None else None
+        if fecha is None or not inicio <= fecha <= fin:
+            anio_periodo = _anio_en_periodo(dia, mes, (inicio, fin))
+            fecha = _crear_fecha(dia, mes, anio_periodo) if anio_periodo else fecha
+        fechas.append(fecha)
+    return fechas
+
+
+def _fechas_en_secuencia(partes: Sequence[Optional[FechaParcial]]) -> List[Optional[date]]:
+    """
+    Sin periodo: parte del año más frecuente y detecta el cambio de año por
+    el salto de mes entre filas consecutivas.
+    """
+    anios = [p[2] for p in partes if p is not None and p[2] is not None]
+    anio_actual = max(set(anios), key=anios.count) if anios else None
+    fechas: List[Optional[date]] = []
+    mes_anterior: Optional[int] = None
+    for p in partes:
+        if p is None:
+            fechas.append(None)
+            continue
+        dia, mes, anio = p
+        if anio is None and anio_actual is not None and mes_anterior is not None:
+            if mes_anterior - mes > 6:
+                anio_actual += 1
+            elif mes - mes_anterior > 6:
+                anio_actual -= 1
+        elif anio is not None:
+            anio_actual = anio
+        mes_anterior = mes
+        fechas.append(_crear_fecha(dia, mes, anio if anio is not None else anio_actual) if anio_actual else None)
+    return fechas
+
+
+def aplicar_normalizacion(
+    transacciones: Sequence[Transaccion],
+    periodo: Optional[Tuple[date, date]] = None,
+) -> Tuple[int, int]:
+    """
+    Reescribe `fecha` de cada transacción en el formato estándar dd-mm-aaaa
+    con el año resuelto por `normalizar_fechas`.
+
+    Returns:
+        Una tupla (corregidas, sin_resolver): cuántas fechas cambiaron de
+        texto y cuántas no se pudieron interpretar (se dejan como estaban).
+    """
+    corregidas = sin_resolver = 0
+    for transaccion, fecha in zip(transacciones, normalizar_fechas(transacciones, periodo)):
+        if fecha is None:
+            sin_resolver += 1
+            logger.debug(f"Fecha no interpretable: {transaccion.fecha!r}")
+            continue
+        estandar = fecha.strftime(FORMATO_FECHA)
+        if estandar != transaccion.fecha:
+            corregidas += 1
+            transaccion.fecha = estandar
+    return corregidas, sin_resolver
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""
+Fichero: optimizador_paginas.py
+Proyecto: Extractor de Movimientos Bancarios con IA
+
+Desarrollado por: IA Punto Soluciones Tecnológicas
+Para: Industrias Pico
+Responsable: MEng Sergio Rondón
+Fecha de Creación: 19/10/2026
+
+Descripción:
+Reduce el tamaño de las páginas antes de subirlas a Gemini. Hay dos modos:
+
+- "comprimir": recomprime a JPEG y reduce a un DPI máximo las imágenes
+  incrustadas en la página, elimina las imágenes que la página no dibuja y
+  comprime los flujos de contenido. Solo necesita PyPDF2 y Pillow.
+- "rasterizar": convierte la página completa en una imagen JPEG al DPI
+  configurado. Requiere PyMuPDF (opcional); si no está instalado se usa
+  "comprimir".
+
+En ambos casos el resultado solo se usa si es más pequeño que la página
+original.
+"""
+
+import io
+import logging
+import os
+import re
+from dataclasses import dataclass
+from typing import Optional, Union, cast
+
+from PIL import Image
+from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2.generic import (
+    DecodedStreamObject,
+    EncodedStreamObject,
+    NameObject,
+    NumberObject,
+)
+
+try:
+    import fitz  # PyMuPDF
+
+    PYMUPDF_DISPONIBLE = True
+except ImportError:
+    PYMUPDF_DISPONIBLE = False
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+MODO_NINGUNO = "ninguno"
+MODO_COMPRIMIR = "comprimir"
+MODO_RASTERIZAR = "rasterizar"
+MODOS_OPTIMIZACION = (MODO_NINGUNO, MODO_COMPRIMIR, MODO_RASTERIZAR)
+
+MIME_PDF = "application/pdf"
+MIME_JPEG = "image/jpeg"
+
+# Operador de contenido que dibuja un XObject: "/Nombre Do".
+_PATRON_DO = re.compile(rb"/([^\s/\[\]()<>{}%]+)\s+Do\b")
+
+
+@dataclass
+class ResultadoOptimizacion:
+    """Fichero que finalmente se sube y tamaños antes y después."""
+
+    ruta: str
+    mime_type: str
+    bytes_originales: int
+    bytes_finales: int
+
+
+def _reducir_imagen(
+    x_object: Union[EncodedStreamObject, DecodedStreamObject], max_lado: int, calidad: int
+) -> Optional[DecodedStreamObject]:
+    """
+    Recomprime una imagen XObject de 8 bits como JPEG, reduciéndola para que
+    su lado mayor no supere `max_lado`. Devuelve la imagen que la sustituye,
+    o None si no se puede recomprimir o no sale más pequeña.
+    """
+    if any(k in x_object for k in ("/SMask", "/Mask", "/ImageMask", "/Decode")):
+        return None
+    if x_object.get("/BitsPerComponent") != 8:
+        return None
+
+    filtro = x_object.get("/Filter")
+    espacio = x_object.get("/ColorSpace")
+    ancho, alto = int(cast(NumberObject, x_object["/Width"])), int(cast(NumberObject, x_object["/Height"]))
+    datos = cast(bytes, x_object.get_data())
+    # /Length es el tamaño del flujo tal como está en el archivo (comprimido).
+    tamano_original = int(cast(NumberObject, x_object["/Length"])) if "/Length" in x_object else len(datos)
+
+    imagen: Image.Image
+    if filtro == "/DCTDecode":
+        imagen = Image.open(io.BytesIO(datos))
+    elif filtro == "/FlateDecode" and espacio in ("/DeviceRGB", "/DeviceGray"):
+        modo = "RGB" if espacio == "/DeviceRGB" else "L"
+        imagen = Image.frombytes(modo, (ancho, alto), datos)
+    else:
+        return None
+
+    if imagen.mode not in ("RGB", "L"):
+        return None
+
+    if max(ancho, alto) > max_lado:
+        escala = max_lado / max(ancho, alto)
+        imagen = imagen.resize(
+            (max(1, int(ancho * escala)), max(1, int(alto * escala))), Image.Resampling.LANCZOS
+        )
+
+    buffer = io.BytesIO()
+    imagen.save(buffer, format="JPEG", quality=calidad, optimize=True)
+    nuevos_datos = buffer.getvalue()
+    if len(nuevos_datos) >= tamano_original:
+        return None
+
+    # PyPDF2 no permite reescribir un flujo codificado: se crea uno nuevo con
+    # los datos JPEG tal cual y el resto de claves de la imagen original.
+    reducida = DecodedStreamObject()
+    reducida.set_data(nuevos_datos)
+    reducida.update({k: v for k, v in x_object.items() if k != "/DecodeParms"})
+    reducida[NameObject("/Filter")] = NameObject("/DCTDecode")
+    reducida[NameObject("/Width")] = NumberObject(imagen.width)
+    reducida[NameObject("/Height")] = NumberObject(imagen.height)
+    reducida[NameObject("/ColorSpace")] = NameObject(
+        "/DeviceRGB" if imagen.mode == "RGB" else "/DeviceGray"
+    )
+    return reducida
+
+
+def _comprimir_pdf(ruta: str, destino: str, dpi: int, calidad: int) -> None:
+    """
+    Aplica el modo "comprimir" a un PDF de una página. Las imágenes se
+    sustituyen en la página leída, antes de copiarla al escritor, para que
+    las originales y las que no se dibujan no lleguen al archivo final.
+    """
+    page = PdfReader(ruta).pages[0]
+
+    # Lado máximo en píxeles que tiene sentido conservar para este DPI.
+    ancho_pt, alto_pt = float(page.mediabox.width), float(page.mediabox.height)
+    max_lado = max(1, int(max(ancho_pt, alto_pt) / 72 * dpi))
+
+    recursos = page.get("/Resources")
+    x_objects = recursos.get_object().get("/XObject") if recursos else None
+    if x_objects:
+        x_objects = x_objects.get_object()
+        contenido = page.get_contents()
+        usados = set(_PATRON_DO.findall(contenido.get_data())) if contenido is not None else set()
+        for nombre in list(x_objects.keys()):
+            if nombre[1:].encode("latin-1") not in usados:
+                # Recurso declarado pero nunca dibujado en la página.
+                del x_objects[nombre]
+                continue
+            x_object = x_objects[nombre].get_object()
+            if x_object.get("/Subtype") == "/Image":
+                reducida = _reducir_imagen(x_object, max_lado, calidad)
+                if reducida is not None:
+                    x_objects[NameObject(nombre)] = reducida
+
+    writer = PdfWriter()
+    writer.add_page(page).compress_content_streams()
+    with open(destino, "wb") as f:
+        writer.write(f)
+
+
+def _rasterizar_pdf(ruta: str, destino: str, dpi: int, calidad: int) -> None:
+    """Aplica el modo "rasterizar" a un PDF de una página (requiere PyMuPDF)."""
+    with fitz.open(ruta) as doc:
+        pixmap = doc[0].get_pixmap(dpi=dpi)
+        with open(destino, "wb") as f:
+            f.write(pixmap.tobytes("jpeg", jpg_quality=calidad))
+
+
+def optimizar_pagina(
+    ruta_pagina: str,
+    modo: str = MODO_NINGUNO,
+    dpi: int = 150,
+    calidad: int = 75,
+) -> ResultadoOptimizacion:
+    """
+    Genera una versión más ligera de una página para subirla a la IA.
+
+    Args:
+        ruta_pagina: Ruta del PDF de una sola página.
+        modo: "ninguno", "comprimir" o "rasterizar".
+        dpi: Resolución máxima de las imágenes resultantes.
+        calidad: Calidad JPEG (1-95).
+
+    Returns:
+        El fichero a subir. Si la optimización falla o no reduce el tamaño,
+        se devuelve la página original.
+    """
+    bytes_originales = os.path.getsize(ruta_pagina)
+    original = ResultadoOptimizacion(ruta_pagina, MIME_PDF, bytes_originales, bytes_originales)
+    if modo == MODO_NINGUNO:
+        return original
+
+    base, _ = os.path.splitext(ruta_pagina)
+    try:
+        if modo == MODO_RASTERIZAR and PYMUPDF_DISPONIBLE:
+            destino, mime_type = base + ".opt.jpg", MIME_JPEG
+            _rasterizar_pdf(ruta_pagina, destino, dpi, calidad)
+        else:
+            destino, mime_type = base + ".opt.pdf", MIME_PDF
+            _comprimir_pdf(ruta_pagina, destino, dpi, calidad)
+    except Exception as e:
+        logger.warning(f"No se pudo optimizar {ruta_pagina}: {e}")
+        return original
+
+    bytes_finales = os.path.getsize(destino)
+    if bytes_finales >= bytes_originales:
+        os.remove(destino)
+        return original
+    return ResultadoOptimizacion(destino, mime_type, bytes_originales, bytes_finales)
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Fichero: parser_respuesta.py
+Proyecto: Extractor de Movimientos Bancarios con IA
+
+Desarrollado por: IA Punto Soluciones Tecnológicas
+Para: Industrias Pico
+Responsable: MEng Sergio Rondón
+Fecha de Creación: 19/10/2026
+
+Descripción:
+Parser tolerante de las respuestas de la IA. Cuando la salida de Gemini llega
+cortada (límite de tokens) o con algún error de formato, en lugar de descartar
+la página completa se recorren los elementos de la lista de transacciones uno
+a uno con el decodificador JSON incremental de la librería estándar, se
+conservan todas las filas completas y se valida cada fila por separado.
+"""
+
+import json
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Tuple
+
+from .data_models import Transaccion
+from .plantillas_prompt import CLAVE_LISTA, fila_a_transaccion, parsear_respuesta
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+_DECODER = json.JSONDecoder()
+_ESPACIOS = " \t\r\n"
+_CERCO_MARKDOWN = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$")
+
+
+@dataclass
+class ResultadoParseo:
+    """Transacciones recuperadas de una respuesta y su estado."""
+
+    transacciones: List[Transaccion] = field(default_factory=list)
+    filas_invalidas: int = 0
+    truncada: bool = False
+    # La respuesta no contenía ninguna lista (vacía, bloqueada o en prosa).
+    sin_lista: bool = False
+
+
+def _saltar_espacios(texto: str, pos: int) -> int:
+    while pos < len(texto) and texto[pos] in _ESPACIOS:
+        pos += 1
+    return pos
+
+
+def _inicio_lista(texto: str, clave: str) -> Optional[int]:
+    """Posición justo después del '[' de la lista de transacciones."""
+    coincidencia = re.search(r'"' + re.escape(clave) + r'"\s*:\s*\[', texto)
+    if coincidencia:
+        return coincidencia.end()
+    pos = _saltar_espacios(texto, 0)
+    if pos < len(texto) and texto[pos] == "[":
+        # La IA devolvió directamente la lista, sin el objeto envolvente.
+        return pos + 1
+    return None
+
+
+def recuperar_filas(texto: str, clave: str) -> Tuple[List[Any], int, Optional[bool]]:
+    """
+    Recorre la lista `clave` de una respuesta JSON posiblemente incompleta.
+
+    Args:
+        texto: La respuesta de la IA.
+        clave: El nombre de la lista de transacciones.
+
+    Returns:
+        Una tupla (filas, saltos, completa): los elementos JSON completos de
+        la lista, cuántos fragmentos ilegibles se saltaron y si la lista
+        llegó a cerrarse con ']' (None si la respuesta no abre ninguna lista).
+    """
+    texto = _CERCO_MARKDOWN.sub("", texto)
+    pos = _inicio_lista(texto, clave)
+    if pos is None:
+        return [], 0, None
+
+    filas: List[Any] = []
+    saltos = 0
+    while True:
+        pos = _saltar_espacios(texto, pos)
+        if pos >= len(texto):
+            return filas, saltos, False
+        if texto[pos] == "]":
+            return filas, saltos, True
+        if texto[pos] == ",":
+            pos += 1
+            continue
+        try:
+            fila, pos = _DECODER.raw_decode(texto, pos)
+            filas.append(fila)
+        except json.JSONDecodeError:
+            # Fragmento ilegible: buscar el comienzo de la siguiente fila.
+            siguiente = min(
+                (p for p in (texto.find("{", pos + 1), texto.find("[", pos + 1)) if p != -1),
+                default=-1,
+            )
+            if siguiente == -1:
+                return filas, saltos, False
+            saltos += 1
+            pos = siguiente
+
+
+def parsear_respuesta_tolerante(texto: str, formato: str) -> ResultadoParseo:
+    """
+    Parsea una respuesta de la IA recuperando todo lo posible.
+
+    Primero se intenta el parseo estricto, que es el caso normal y el más
+    rápido. Si falla, se recuperan las filas completas una a una y se valida
+    cada una por separado, de modo que una fila incorrecta no invalida la
+    página.
+
+    Args:
+        texto: La respuesta de la IA.
+        formato: El formato de respuesta de la plantilla usada.
+
+    Returns:
+        Un ResultadoParseo. `truncada` indica que la lista se abrió pero no
+        se cerró y que probablemente faltan transacciones al final;
+        `sin_lista`, que la respuesta no contenía ninguna lista.
+    """
+    try:
+        return ResultadoParseo(transacciones=parsear_respuesta(texto, formato))
+    except Exception as e:
+        logger.debug(f"Parseo estricto fallido, se intenta recuperar filas: {e}")
+
+    filas, saltos, completa = recuperar_filas(texto, CLAVE_LISTA[formato])
+    resultado = ResultadoParseo(filas_invalidas=saltos, truncada=completa is False, sin_lista=completa is None)
+    for fila in filas:
+        try:
+            resultado.transacciones.append(fila_a_transaccion(fila, formato))
+        except Exception as e:
+            resultado.filas_invalidas += 1
+            logger.debug(f"Fila descartada por no ser válida: {fila!r} ({e})")
+    return resultado
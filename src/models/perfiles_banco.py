@@ -0,0 +1,434 @@
+# -*- coding: utf-8 -*-
+"""
+Fichero: perfiles_banco.py
+Proyecto: Extractor de Movimientos Bancarios con IA
+
+Desarrollado por: IA Punto Soluciones Tecnológicas
+Para: Industrias Pico
+Responsable: MEng Sergio Rondón
+Fecha de Creación: 19/10/2026
+
+Descripción:
+Perfiles de diseño por banco aprendidos de extracciones anteriores. Cada
+página se identifica por una huella de su diseño (tamaño de página, fuentes y
+fila de cabecera de la tabla). Cuando la IA extrae bien una página, se
+aprende una plantilla: la posición horizontal de cada columna en la capa de
+texto, la forma de las fechas y el separador decimal. Las páginas siguientes
+con la misma huella se leen localmente con esa plantilla, sin llamar a la
+API; si la lectura local no cubre las filas de la página, se usa la IA.
+
+Las posiciones se obtienen de PyPDF2; en PDF escaneados o cuyo texto no
+separa las columnas no se aprende ninguna plantilla.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import statistics
+import threading
+import unicodedata
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from PyPDF2 import PdfReader
+
+from .clasificador_paginas import (
+    PALABRAS_TABLA,
+    PATRON_IMPORTE,
+    contar_filas_con_movimiento,
+)
+from .data_models import Transaccion
+from .normalizador_fechas import parsear_fecha
+from .verificador_pagina import MIN_COBERTURA_FILAS
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Filas que tiene que haber reconocido una extracción para aprender de ella.
+MIN_FILAS_APRENDIZAJE = 3
+
+# Proporción de transacciones que deben localizarse en la capa de texto.
+MIN_COINCIDENCIA_APRENDIZAJE = 0.8
+
+# Margen (en puntos) alrededor de las posiciones vistas de cada columna.
+MARGEN_COLUMNA = 12.0
+
+# Diferencia vertical máxima (en puntos) entre fragmentos de una misma línea.
+TOLERANCIA_LINEA = 2.0
+
+# Lecturas locales fallidas seguidas tras las que se descarta un perfil.
+MAX_FALLOS_SEGUIDOS = 3
+
+COLUMNAS_IMPORTE = ("debito", "credito", "importe")
+
+
+@dataclass
+class Fragmento:
+    """Un trozo de texto de la página con su posición."""
+
+    x: float
+    y: float
+    texto: str
+    fuente: str = ""
+
+
+@dataclass
+class LecturaPagina:
+    """Capa de texto posicional de una página y su huella de diseño."""
+
+    lineas: List[List[Fragmento]]
+    huella: str
+
+
+@dataclass
+class PlantillaDiseno:
+    """Cómo leer localmente las páginas de un diseño concreto."""
+
+    columnas: Dict[str, Tuple[float, float]]
+    formas_fecha: List[str]
+    separador_decimal: str = ","
+    filas_aprendidas: int = 0
+    usos: int = 0
+    fallos_seguidos: int = 0
+    patrones: List["re.Pattern"] = field(default_factory=list, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        # Del JSON las zonas llegan como listas.
+        self.columnas = {nombre: (rango[0], rango[1]) for nombre, rango in self.columnas.items()}
+        self.patrones = [re.compile(forma) for forma in self.formas_fecha]
+
+    def a_dict(self) -> Dict:
+        datos = asdict(self)
+        datos.pop("patrones")
+        return datos
+
+    def columna_de(self, x: float) -> Optional[str]:
+        """La columna cuya zona contiene `x`; la más cercana al centro si hay varias."""
+        candidatas = [
+            (abs(x - (inicio + fin) / 2), nombre)
+            for nombre, (inicio, fin) in self.columnas.items()
+            if inicio <= x <= fin
+        ]
+        return min(candidatas)[1] if candidatas else None
+
+
+def _normalizar(texto: str) -> str:
+    sin_tildes = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode()
+    return " ".join(sin_tildes.lower().split())
+
+
+def forma_fecha(texto: str) -> str:
+    """Expresión regular con la forma de una fecha: '15/09/2025' -> '^\\d{1,2}/\\d{1,2}/\\d{4}$'."""
+    partes = []
+    for trozo in re.findall(r"\d+|[^\W\d_]+|.", texto.strip()):
+        if trozo.isdigit():
+            # Día y mes pueden venir con o sin cero a la izquierda.
+            partes.append(r"\d{1,2}" if len(trozo) <= 2 else rf"\d{{{len(trozo)}}}")
+        elif trozo.isalpha():
+            partes.append(rf"[^\W\d_]{{{len(trozo)}}}")
+        else:
+            partes.append(re.escape(trozo))
+    return f"^{''.join(partes)}$"
+
+
+def _importe(texto: str, separador_decimal: str) -> Optional[float]:
+    """Importe de un fragmento que es solo un número con decimales."""
+    limpio = texto.replace("$", "").replace(" ", "")
+    if not PATRON_IMPORTE.fullmatch(limpio):
+        return None
+    negativo = limpio.startswith("-") or limpio.endswith("-")
+    limpio = limpio.strip("-")
+    if separador_decimal == ",":
+        limpio = limpio.replace(".", "").replace(",", ".")
+    else:
+        limpio = limpio.replace(",", "")
+    try:
+        valor = float(limpio)
+    except ValueError:
+        return None
+    return -valor if negativo else valor
+
+
+def _separador_decimal(texto: str) -> str:
+    return texto.strip().rstrip("-")[-3]
+
+
+def leer_pagina(ruta_pagina: str) -> LecturaPagina:
+    """Lee los fragmentos de texto de un PDF de una página, agrupados en líneas."""
+    pagina = PdfReader(ruta_pagina).pages[0]
+    fragmentos: List[Fragmento] = []
+
+    def visitante(
+        texto: str, cm: List[float], tm: List[float], fuente: Optional[Dict[str, Any]], _tamano: float
+    ) -> None:
+        for parte in texto.split("\n"):
+            parte = parte.strip()
+            if not parte:
+                continue
+            x = tm[4] * cm[0] + tm[5] * cm[2] + cm[4]
+            y = tm[4] * cm[1] + tm[5] * cm[3] + cm[5]
+            nombre = str(fuente.get("/BaseFont", "")).lstrip("/") if fuente else ""
+            fragmentos.append(Fragmento(round(x, 1), round(y, 1), parte, nombre))
+
+    pagina.extract_text(visitor_text=visitante)
+    lineas = agrupar_lineas(fragmentos)
+    caja = pagina.mediabox
+    return LecturaPagina(lineas, huella_diseno(lineas, float(caja.width), float(caja.height)))
+
+
+def agrupar_lineas(fragmentos: Sequence[Fragmento]) -> List[List[Fragmento]]:
+    """Agrupa los fragmentos en líneas de arriba abajo, cada una ordenada de izquierda a derecha."""
+    lineas: List[List[Fragmento]] = []
+    for fragmento in sorted(fragmentos, key=lambda f: (-f.y, f.x)):
+        if lineas and abs(lineas[-1][0].y - fragmento.y) <= TOLERANCIA_LINEA:
+            lineas[-1].append(fragmento)
+        else:
+            lineas.append([fragmento])
+    return [sorted(linea, key=lambda f: f.x) for linea in lineas]
+
+
+def huella_diseno(lineas: Sequence[Sequence[Fragmento]], ancho: float, alto: float) -> str:
+    """
+    Huella del diseño de una página: tamaño, fuentes usadas y texto de la
+    fila de cabecera de la tabla (la primera línea con dos o más palabras
+    típicas de columna).
+    """
+    fuentes = sorted({f.fuente for linea in lineas for f in linea if f.fuente})
+    cabecera = ""
+    for linea in lineas:
+        texto = _normalizar(" ".join(f.texto for f in linea))
+        if sum(1 for palabra in PALABRAS_TABLA if palabra in texto.split()) >= 2:
+            cabecera = texto
+            break
+    base = f"{round(ancho)}x{round(alto)}|{','.join(fuentes)}|{cabecera}"
+    return hashlib.sha1(base.encode("utf-8")).hexdigest()[:16]
+
+
+def aprender_plantilla(
+    lectura: LecturaPagina, transacciones: Sequence[Transaccion]
+) -> Optional[PlantillaDiseno]:
+    """
+    Deduce la plantilla de una página a partir de una extracción correcta:
+    cada transacción se busca en la línea que contiene su fecha y su importe,
+    y se anotan las posiciones de los fragmentos de cada columna.
+
+    Returns:
+        La plantilla, o None si no se localizan suficientes transacciones en
+        la capa de texto.
+    """
+    posiciones: Dict[str, List[float]] = {"fecha": [], "descripcion": []}
+    importes: Dict[str, List[float]] = {"debito": [], "credito": []}
+    formas, separadores = set(), []
+    usadas = set()
+
+    for transaccion in transacciones:
+        fecha = parsear_fecha(transaccion.fecha)
+        importe = transaccion.debito if transaccion.debito is not None else transaccion.credito
+        if fecha is None or importe is None:
+            continue
+        columna_importe = "debito" if transaccion.debito is not None else "credito"
+        for indice, linea in enumerate(lectura.lineas):
+            localizada = None if indice in usadas else _localizar_fila(linea, fecha[:2], importe)
+            if localizada is None:
+                continue
+            f_fecha, f_importe = localizada
+            usadas.add(indice)
+            posiciones["fecha"].append(f_fecha.x)
+            importes[columna_importe].append(f_importe.x)
+            posiciones["descripcion"].extend(
+                f.x for f in linea if f_fecha.x < f.x < f_importe.x and _importe(f.texto, ",") is None
+            )
+            formas.add(forma_fecha(f_fecha.texto))
+            separadores.append(_separador_decimal(f_importe.texto))
+            break
+
+    encontradas = len(usadas)
+    if encontradas < MIN_FILAS_APRENDIZAJE or encontradas < MIN_COINCIDENCIA_APRENDIZAJE * len(transacciones):
+        return None
+    if not posiciones["descripcion"]:
+        return None
+
+    columnas = {nombre: _zona(valores) for nombre, valores in posiciones.items()}
+    columnas.update(_zonas_importe(importes))
+    return PlantillaDiseno(
+        columnas=columnas,
+        formas_fecha=sorted(formas),
+        separador_decimal=statistics.mode(separadores),
+        filas_aprendidas=encontradas,
+    )
+
+
+def _localizar_fila(
+    linea: Sequence[Fragmento], dia_mes: Tuple[int, int], importe: float
+) -> Optional[Tuple[Fragmento, Fragmento]]:
+    """Fragmentos de la fecha y del importe de una transacción en la línea, si están."""
+    f_fecha = next((f for f in linea if (parsear_fecha(f.texto) or (0, 0))[:2] == dia_mes), None)
+    if f_fecha is None:
+        return None
+    f_importe = next(
+        (f for f in linea if f.x > f_fecha.x and PATRON_IMPORTE.fullmatch(f.texto.replace(" ", ""))
+         and abs(abs(_importe(f.texto, _separador_decimal(f.texto)) or 0) - abs(importe)) < 0.005),
+        None,
+    )
+    return (f_fecha, f_importe) if f_importe is not None else None
+
+
+def _zona(valores: List[float]) -> Tuple[float, float]:
+    return (min(valores) - MARGEN_COLUMNA, max(valores) + MARGEN_COLUMNA)
+
+
+def _zonas_importe(importes: Dict[str, List[float]]) -> Dict[str, Tuple[float, float]]:
+    """Zonas de débito y crédito, o una sola de importe con signo si se solapan."""
+    zonas = {nombre: _zona(valores) for nombre, valores in importes.items() if valores}
+    if len(zonas) == 2:
+        (i1, f1), (i2, f2) = zonas["debito"], zonas["credito"]
+        if i1 <= f2 and i2 <= f1:
+            # Débitos y créditos en la misma columna: importe con signo.
+            return {"importe": (min(i1, i2), max(f1, f2))}
+    return zonas
+
+
+def parsear_con_plantilla(lectura: LecturaPagina, plantilla: PlantillaDiseno) -> List[Transaccion]:
+    """
+    Lee las filas de movimientos de la página con la plantilla: cada línea
+    cuya columna de fecha tiene la forma aprendida y que tiene un importe en
+    una columna de importes es una transacción. La fecha se devuelve como
+    dd-mm-aaaa, o dd-mm si el extracto no trae el año (lo resuelve la
+    normalización de fechas del documento).
+    """
+    transacciones = []
+    for linea in lectura.lineas:
+        celdas: Dict[str, List[str]] = {}
+        for fragmento in linea:
+            columna = plantilla.columna_de(fragmento.x)
+            if columna:
+                celdas.setdefault(columna, []).append(fragmento.texto)
+
+        texto_fecha = " ".join(celdas.get("fecha", []))
+        if not any(patron.match(texto_fecha) for patron in plantilla.patrones):
+            continue
+        partes = parsear_fecha(texto_fecha)
+        if partes is None:
+            continue
+        valores = {
+            columna: _importe(" ".join(celdas[columna]), plantilla.separador_decimal)
+            for columna in COLUMNAS_IMPORTE if columna in celdas
+        }
+        if "importe" in valores and valores["importe"] is not None:
+            debito = -valores["importe"] if valores["importe"] < 0 else None
+            credito = valores["importe"] if valores["importe"] >= 0 else None
+        else:
+            debito, credito = valores.get("debito"), valores.get("credito")
+            debito = abs(debito) if debito is not None else None
+            credito = abs(credito) if credito is not None else None
+        if (debito is None) == (credito is None):
+            continue
+
+        dia, mes, anio = partes
+        transacciones.append(Transaccion(
+            fecha=f"{dia:02d}-{mes:02d}-{anio}" if anio else f"{dia:02d}-{mes:02d}",
+            descripcion=" ".join(celdas.get("descripcion", [])),
+            debito=debito,
+            credito=credito,
+        ))
+    return transacciones
+
+
+class AlmacenPerfiles:
+    """
+    Plantillas aprendidas, por huella de diseño, guardadas en un archivo JSON.
+    Es compartido por todos los hilos del extractor.
+
+    El archivo se reescribe al aprender o descartar un perfil; los contadores
+    de uso se guardan en bloque con `guardar()` al terminar la ejecución.
+    """
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self._plantillas: Dict[str, PlantillaDiseno] = {}
+        self._pendiente = False
+        if os.path.exists(ruta):
+            try:
+                with open(ruta, encoding="utf-8") as f:
+                    for huella, datos in json.load(f).items():
+                        self._plantillas[huella] = PlantillaDiseno(**datos)
+                logger.info(f"{len(self._plantillas)} perfiles de banco cargados de {ruta}")
+            except (OSError, ValueError, TypeError) as e:
+                logger.warning(f"No se pudieron leer los perfiles de banco de {ruta}: {e}")
+
+    def __len__(self) -> int:
+        return len(self._plantillas)
+
+    def guardar(self) -> None:
+        """Guarda los contadores de uso pendientes, si los hay."""
+        with self._lock:
+            if self._pendiente:
+                self._guardar()
+
+    def _guardar(self) -> None:
+        self._pendiente = False
+        temporal = f"{self.ruta}.tmp"
+        try:
+            with open(temporal, "w", encoding="utf-8") as f:
+                json.dump({h: p.a_dict() for h, p in self._plantillas.items()}, f, ensure_ascii=False, indent=1)
+            os.replace(temporal, self.ruta)
+        except OSError as e:
+            logger.warning(f"No se pudieron guardar los perfiles de banco en {self.ruta}: {e}")
+
+    def extraer(self, lectura: LecturaPagina, texto: str) -> Optional[List[Transaccion]]:
+        """
+        Lee la página con la plantilla de su huella, si la hay. La lectura se
+        acepta si cubre las filas con fecha e importe de la capa de texto.
+
+        Returns:
+            Las transacciones, o None si no hay plantilla o la lectura no es fiable.
+        """
+        with self._lock:
+            plantilla = self._plantillas.get(lectura.huella)
+        if plantilla is None:
+            return None
+
+        transacciones = parsear_con_plantilla(lectura, plantilla)
+        filas_texto = contar_filas_con_movimiento(texto)
+        fiable = bool(transacciones) and len(transacciones) >= MIN_COBERTURA_FILAS * filas_texto
+        with self._lock:
+            # Otra página de la misma huella puede haber descartado o
+            # reaprendido la plantilla mientras se leía esta.
+            if self._plantillas.get(lectura.huella) is plantilla:
+                self._contar_lectura(lectura.huella, plantilla, fiable)
+        if not fiable:
+            logger.info(f"Perfil {lectura.huella}: {len(transacciones)} filas leídas de {filas_texto} "
+                        f"detectadas en el texto; se usa la IA.")
+            return None
+        return transacciones
+
+    def _contar_lectura(self, huella: str, plantilla: PlantillaDiseno, fiable: bool) -> None:
+        """Actualiza los contadores de la plantilla; se llama con el cerrojo tomado."""
+        if fiable:
+            plantilla.usos += 1
+            plantilla.fallos_seguidos = 0
+        else:
+            plantilla.fallos_seguidos += 1
+        if plantilla.fallos_seguidos >= MAX_FALLOS_SEGUIDOS:
+            logger.info(f"Perfil {huella} descartado tras {MAX_FALLOS_SEGUIDOS} lecturas fallidas.")
+            self._plantillas.pop(huella, None)
+            self._guardar()
+        else:
+            self._pendiente = True
+
+    def aprender(self, lectura: LecturaPagina, transacciones: Sequence[Transaccion]) -> bool:
+        """Aprende (o reaprende) la plantilla de la huella a partir de una extracción correcta."""
+        with self._lock:
+            if lectura.huella in self._plantillas and self._plantillas[lectura.huella].fallos_seguidos == 0:
+                return False
+        plantilla = aprender_plantilla(lectura, transacciones)
+        if plantilla is None:
+            return False
+        with self._lock:
+            self._plantillas[lectura.huella] = plantilla
+            self._guardar()
+        logger.info(f"Perfil de diseño {lectura.huella} aprendido de {plantilla.filas_aprendidas} filas.")
+        return True
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+Fichero: plantillas_prompt.py
+Proyecto: Extractor de Movimientos Bancarios con IA
+
+Desarrollado por: IA Punto Soluciones Tecnológicas
+Para: Industrias Pico
+Responsable: MEng Sergio Rondón
+Fecha de Creación: 19/10/2026
+
+Descripción:
+Plantillas versionadas de las instrucciones que se envían a Gemini y los
+formatos de respuesta asociados. Cada plantilla se precompila una sola vez
+(el texto fijo se parte alrededor del número de página), de modo que por
+página solo se concatena el número.
+
+Formatos de respuesta:
+- "completo": {"transacciones": [{"fecha", "descripcion", "debito", "credito"}]}
+- "compacto": {"t": [{"f", "d", "db", "cr"}]}
+- "filas":    {"t": [["fecha", "descripcion", debito, credito]]}
+"""
+
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Type
+
+from pydantic import BaseModel
+
+from .data_models import (
+    ExtractoBancario,
+    ExtractoCompacto,
+    Transaccion,
+    TransaccionCompacta,
+)
+
+FORMATO_COMPLETO = "completo"
+FORMATO_COMPACTO = "compacto"
+FORMATO_FILAS = "filas"
+
+# Clave de la lista de transacciones en la respuesta de cada formato.
+CLAVE_LISTA = {
+    FORMATO_COMPLETO: "transacciones",
+    FORMATO_COMPACTO: "t",
+    FORMATO_FILAS: "t",
+}
+
+# Modelo Pydantic que se puede pasar como `response_schema`. El formato
+# "filas" no tiene equivalente: Gemini no admite listas de tipos mixtos.
+ESQUEMA_RESPUESTA: Dict[str, Optional[Type[BaseModel]]] = {
+    FORMATO_COMPLETO: ExtractoBancario,
+    FORMATO_COMPACTO: ExtractoCompacto,
+    FORMATO_FILAS: None,
+}
+
+MARCADOR_PAGINA = "{pagina}"
+
+
+@dataclass(frozen=True)
+class PlantillaPrompt:
+    """Una versión de las instrucciones y el formato de respuesta que pide."""
+
+    version: str
+    formato: str
+    texto: str
+    _partes: List[str] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "_partes", self.texto.split(MARCADOR_PAGINA))
+
+    def renderizar(self, numero_pagina: int) -> str:
+        """Devuelve la instrucción para la página indicada."""
+        return str(numero_pagina).join(self._partes)
+
+    @property
+    def esquema(self) -> Optional[Type[BaseModel]]:
+        return ESQUEMA_RESPUESTA[self.formato]
+
+
+_PROMPT_V1 = """
+                Analiza el siguiente documento PDF, que es la página {pagina} de un extracto bancario.
+                Tu tarea es extraer única y exclusivamente las líneas de transacción de la tabla de movimientos
+                presentes en ESTA PÁGINA.
+
+                Ignora por completo cualquier otra información como:
+                - Cabeceras de página (nombre del banco, número de página, etc.).
+                - Pies de página.
+                - Saldos resumidos, saldos iniciales o finales.
+                - Publicidad o información de contacto.
+
+                Para cada transacción, extrae la fecha, la descripción y los importes de débito o crédito.
+                Es muy importante que estandarices todas las fechas al formato final 'dd-mm-aaaa'.
+                Si una fecha solo tiene día y mes, infiere el año del contexto del documento.
+
+                Devuelve el resultado como un único objeto JSON que contenga una clave "transacciones",
+                cuyo valor sea una lista de objetos JSON, donde cada objeto represente una transacción.
+                Asegúrate de que el JSON esté bien formado.
+                """
+
+_INSTRUCCIONES_V2 = (
+    "Página {pagina} de un extracto bancario. Extrae solo las filas de la tabla de "
+    "movimientos de esta página; ignora cabeceras, pies, saldos y publicidad. "
+    "Fechas en formato dd-mm-aaaa (si falta el año, infiérelo del documento). "
+)
+
+_PROMPT_V2_COMPACTO = _INSTRUCCIONES_V2 + (
+    'Responde solo con JSON: {"t":[{"f":fecha,"d":descripcion,"db":debito|null,"cr":credito|null}]}'
+)
+
+_PROMPT_V2_FILAS = _INSTRUCCIONES_V2 + (
+    'Responde solo con JSON: {"t":[[fecha,descripcion,debito|null,credito|null]]}'
+)
+
+PLANTILLAS: Dict[str, PlantillaPrompt] = {
+    p.version: p
+    for p in (
+        PlantillaPrompt("v1", FORMATO_COMPLETO, _PROMPT_V1),
+        PlantillaPrompt("v2-compacto", FORMATO_COMPACTO, _PROMPT_V2_COMPACTO),
+        PlantillaPrompt("v2-filas", FORMATO_FILAS, _PROMPT_V2_FILAS),
+    )
+}
+
+PLANTILLA_POR_DEFECTO = "v1"
+
+
+def obtener_plantilla(version: str) -> PlantillaPrompt:
+    """
+    Devuelve la plantilla registrada con esa versión.
+
+    Raises:
+        ValueError: Si la versión no existe.
+    """
+    try:
+        return PLANTILLAS[version]
+    except KeyError:
+        raise ValueError(
+            f"Plantilla de prompt desconocida: '{version}'. "
+            f"Disponibles: {', '.join(PLANTILLAS)}"
+        )
+
+
+_CONTINUACION = (
+    "\nTu respuesta anterior para esta página se cortó. Ya tengo las primeras "
+    "{recibidas} transacciones; la última fue: fecha {fecha}, descripción "
+    '"{descripcion}", débito {debito}, crédito {credito}. Devuelve SOLO las '
+    "transacciones que aparecen después de esa en la página, en el mismo formato JSON."
+)
+
+
+def construir_prompt_continuacion(
+    plantilla: PlantillaPrompt, numero_pagina: int, recibidas: int, ultima: Transaccion
+) -> str:
+    """
+    Instrucción para pedir únicamente la parte final de una respuesta que
+    llegó truncada, a continuación de la última transacción recibida.
+    """
+    return plantilla.renderizar(numero_pagina) + _CONTINUACION.format(
+        recibidas=recibidas,
+        fecha=ultima.fecha,
+        descripcion=ultima.descripcion,
+        debito=ultima.debito,
+        credito=ultima.credito,
+    )
+
+
+def fila_a_transaccion(fila: Any, formato: str) -> Transaccion:
+    """
+    Convierte una fila de la respuesta, en el formato indicado, a Transaccion.
+
+    Raises:
+        ValueError: Si la fila no tiene la forma esperada (incluye los errores
+                    de validación de Pydantic).
+    """
+    if formato == FORMATO_COMPLETO:
+        return Transaccion.model_validate(fila)
+    if formato == FORMATO_COMPACTO:
+        return TransaccionCompacta.model_validate(fila).a_transaccion()
+    if formato == FORMATO_FILAS:
+        if not isinstance(fila, (list, tuple)) or not 2 <= len(fila) <= 4:
+            raise ValueError(f"Fila con forma inesperada: {fila!r}")
+        fecha, descripcion, debito, credito = (list(fila) + [None, None])[:4]
+        return Transaccion(fecha=fecha, descripcion=descripcion, debito=debito, credito=credito)
+    raise ValueError(f"Formato de respuesta desconocido: '{formato}'")
+
+
+def parsear_respuesta(texto: str, formato: str) -> List[Transaccion]:
+    """
+    Parsea la respuesta completa de la IA y devuelve sus transacciones.
+
+    Raises:
+        ValueError: Si el JSON no es válido o no tiene la estructura esperada.
+    """
+    if formato == FORMATO_COMPLETO:
+        return ExtractoBancario.model_validate_json(texto).transacciones
+    if formato == FORMATO_COMPACTO:
+        return [t.a_transaccion() for t in ExtractoCompacto.model_validate_json(texto).t]
+
+    datos = json.loads(texto)
+    if not isinstance(datos, dict) or not isinstance(datos.get(CLAVE_LISTA[formato]), list):
+        raise ValueError(f"La respuesta no contiene la lista '{CLAVE_LISTA[formato]}'")
+    return [fila_a_transaccion(fila, formato) for fila in datos[CLAVE_LISTA[formato]]]
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+Fichero: pool_claves.py
+Proyecto: Extractor de Movimientos Bancarios con IA
+
+Desarrollado por: IA Punto Soluciones Tecnológicas
+Para: Industrias Pico
+Responsable: MEng Sergio Rondón
+Fecha de Creación: 19/10/2026
+
+Descripción:
+Pool de claves de API de Gemini. Cada clave tiene sus propios clientes (en
+lugar de la configuración global de `genai.configure`) y su propio estado de
+carga y de cuota, de modo que las páginas se reparten entre varias cuotas por
+minuto. Cada página se asigna a la clave menos cargada; una clave que recibe
+un error de cuota se deja en enfriamiento durante un tiempo creciente.
+
+La primera clave usa la configuración global de la librería, como hasta
+ahora; las demás usan un gestor de clientes propio. google-generativeai no
+ofrece una forma pública de tener clientes por clave, así que se usan sus
+internos de la versión 0.8 (ver `ClientesClave`); requirements.txt fija esa
+versión y hay que revisar esa clase antes de actualizarla.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Callable, Iterator, List, Optional, Sequence
+
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+from google.generativeai import client as genai_client
+from google.generativeai.types import file_types
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Enfriamiento máximo de una clave tras errores de cuota consecutivos.
+ENFRIAMIENTO_MAXIMO_S = 15 * 60
+
+# Errores de la API que indican cuota agotada o límite de peticiones.
+ERRORES_CUOTA = (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests)
+
+
+def es_error_de_cuota(error: Exception) -> bool:
+    return isinstance(error, ERRORES_CUOTA)
+
+
+def enmascarar_clave(clave: str) -> str:
+    """Versión de la clave apta para el log."""
+    return f"…{clave[-4:]}" if len(clave) > 4 else "…"
+
+
+class ClientesClave:
+    """
+    Clientes de Gemini propios de una clave. Es el único lugar que usa la API
+    privada de google-generativeai 0.8: `client._ClientManager` y los
+    atributos `_client` y `_async_client` de GenerativeModel.
+    """
+
+    def __init__(self, clave: str):
+        self._gestor = genai_client._ClientManager()
+        self._gestor.configure(api_key=clave)
+
+    def modelo(self, nombre: str) -> genai.GenerativeModel:
+        """Un modelo que usa el cliente síncrono de esta clave."""
+        modelo = genai.GenerativeModel(model_name=nombre)
+        modelo._client = self._gestor.get_default_client("generative")
+        return modelo
+
+    def subir(self, ruta: str, mime: str) -> file_types.File:
+        return file_types.File(self._gestor.get_default_client("file").create_file(path=ruta, mime_type=mime))
+
+    def preparar_async(self, modelo: genai.GenerativeModel) -> None:
+        """Asigna al modelo el cliente asíncrono de esta clave, si aún no tiene uno."""
+        if modelo._async_client is None:
+            modelo._async_client = self._gestor.get_default_client("generative_async")
+
+
+class ClaveAPI:
+    """Una clave de API con sus modelos, su forma de subir archivos y su estado."""
+
+    def __init__(
+        self,
+        indice: int,
+        clave: str,
+        modelos: List[genai.GenerativeModel],
+        subir: Callable[[str, str], file_types.File],
+        clientes: Optional[ClientesClave] = None,
+    ):
+        self.indice = indice
+        self.clave = clave
+        self.modelos = modelos
+        self.subir = subir
+        # Clientes propios (None = configuración global de la librería).
+        self.clientes = clientes
+        self.en_vuelo = 0
+        self.llamadas = 0
+        self.errores_cuota = 0
+        self.errores_consecutivos = 0
+        self.enfriada_hasta = 0.0
+
+    @property
+    def nombre(self) -> str:
+        return f"clave {self.indice + 1} ({enmascarar_clave(self.clave)})"
+
+    @classmethod
+    def global_(cls, clave: str, nombres_modelos: Sequence[str]) -> "ClaveAPI":
+        """Clave configurada con `genai.configure`, que usan los clientes por defecto."""
+        genai.configure(api_key=clave)
+        modelos = [genai.GenerativeModel(model_name=nombre) for nombre in nombres_modelos]
+        return cls(0, clave, modelos, lambda ruta, mime: genai.upload_file(path=ruta, mime_type=mime))
+
+    @classmethod
+    def independiente(cls, indice: int, clave: str, nombres_modelos: Sequence[str]) -> "ClaveAPI":
+        """Clave con su propio gestor de clientes, sin tocar la configuración global."""
+        clientes = ClientesClave(clave)
+        modelos = [clientes.modelo(nombre) for nombre in nombres_modelos]
+        return cls(indice, clave, modelos, clientes.subir, clientes)
+
+    def preparar_async(self) -> None:
+        """
+        Asigna a los modelos el cliente asíncrono de esta clave. Se llama
+        desde el bucle de eventos, porque el cliente gRPC asíncrono queda
+        ligado al bucle en el que se crea; con la clave global la librería lo
+        crea por sí misma en la primera llamada.
+        """
+        if self.clientes is None:
+            return
+        for modelo in self.modelos:
+            self.clientes.preparar_async(modelo)
+
+
+class PoolClavesAPI:
+    """Reparte las peticiones entre varias claves de API."""
+
+    def __init__(self, claves: Sequence[ClaveAPI], enfriamiento_s: float = 60.0):
+        if not claves:
+            raise ValueError("El pool de claves de API está vacío.")
+        self.claves = list(claves)
+        self.enfriamiento_s = enfriamiento_s
+        self._condicion = threading.Condition()
+
+    def __len__(self) -> int:
+        return len(self.claves)
+
+    @classmethod
+    def desde_claves(
+        cls, claves: Sequence[str], nombres_modelos: Sequence[str], enfriamiento_s: float = 60.0
+    ) -> "PoolClavesAPI":
+        """Crea el pool: la primera clave usa la configuración global y el resto clientes propios."""
+        instancias = [ClaveAPI.global_(claves[0], nombres_modelos)]
+        instancias += [
+            ClaveAPI.independiente(i, clave, nombres_modelos) for i, clave in enumerate(claves[1:], start=1)
+        ]
+        return cls(instancias, enfriamiento_s)
+
+    def _elegir(self) -> Optional[ClaveAPI]:
+        ahora = time.monotonic()
+        disponibles = [c for c in self.claves if c.enfriada_hasta <= ahora]
+        if not disponibles:
+            return None
+        return min(disponibles, key=lambda c: (c.en_vuelo, c.llamadas))
+
+    def _espera(self) -> float:
+        espera = min(c.enfriada_hasta for c in self.claves) - time.monotonic()
+        logger.warning(f"Todas las claves de API están en enfriamiento; esperando {espera:.0f} s.")
+        return max(espera, 0.01)
+
+    def _liberar(self, clave: ClaveAPI) -> None:
+        with self._condicion:
+            clave.en_vuelo -= 1
+            self._condicion.notify_all()
+
+    @contextmanager
+    def adquirir(self) -> Iterator[ClaveAPI]:
+        """
+        Reserva la clave menos cargada que no esté en enfriamiento. Si todas
+        lo están, espera a que termine el primer enfriamiento.
+        """
+        with self._condicion:
+            clave = self._elegir()
+            while clave is None:
+                self._condicion.wait(timeout=self._espera())
+                clave = self._elegir()
+            clave.en_vuelo += 1
+            clave.llamadas += 1
+        try:
+            yield clave
+        finally:
+            self._liberar(clave)
+
+    @asynccontextmanager
+    async def adquirir_async(self) -> AsyncIterator[ClaveAPI]:
+        """Igual que `adquirir`, pero la espera no bloquea el bucle de eventos."""
+        while True:
+            with self._condicion:
+                clave = self._elegir()
+                if clave is not None:
+                    clave.en_vuelo += 1
+                    clave.llamadas += 1
+                    break
+                espera = self._espera()
+            await asyncio.sleep(espera)
+        try:
+            yield clave
+        finally:
+            self._liberar(clave)
+
+    def registrar_exito(self, clave: ClaveAPI) -> None:
+        with self._condicion:
+            clave.errores_consecutivos = 0
+
+    def registrar_error_cuota(self, clave: ClaveAPI) -> None:
+        """Deja la clave en enfriamiento, el doble de tiempo con cada error seguido."""
+        with self._condicion:
+            clave.errores_cuota += 1
+            clave.errores_consecutivos += 1
+            duracion = min(self.enfriamiento_s * 2 ** (clave.errores_consecutivos - 1), ENFRIAMIENTO_MAXIMO_S)
+            clave.enfriada_hasta = time.monotonic() + duracion
+            logger.warning(f"Cuota agotada en la {clave.nombre}; en enfriamiento {duracion:.0f} s.")
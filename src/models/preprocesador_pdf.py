@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+Fichero: preprocesador_pdf.py
+Proyecto: Extractor de Movimientos Bancarios con IA
+
+Desarrollado por: IA Punto Soluciones Tecnológicas
+Para: Industrias Pico
+Responsable: MEng Sergio Rondón
+Fecha de Creación: 19/10/2026
+
+Descripción:
+Este módulo contiene la etapa de preprocesamiento de los PDF: división en
+páginas individuales, cálculo del hash de cada página y lectura de su capa de
+texto, que se usa para clasificarla, y su optimización opcional para la
+subida. Es trabajo de CPU en Python puro (PyPDF2), por lo que en lotes grandes
+se reparte entre varios procesos y se entregan descriptores ligeros de página
+a la etapa de llamadas a la API.
+
+El PDF original se abre proyectado en memoria (mmap) y sus páginas se leen y
+escriben de una en una, bajo demanda: con documentos muy grandes la primera
+página puede subirse antes de que se haya dividido el resto.
+"""
+
+import hashlib
+import io
+import logging
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import IO, Iterable, Iterator, List, Optional, Sequence, Tuple, cast
+
+from PyPDF2 import PageObject, PdfReader, PdfWriter
+
+from src.models.clasificador_paginas import TipoPagina, clasificar_pagina
+from src.models.optimizador_paginas import MIME_PDF, MODO_NINGUNO, optimizar_pagina
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class OpcionesPreprocesado:
+    """Parámetros de la etapa de preprocesamiento, leídos de settings.ini."""
+
+    min_filas: int = 2
+    modo_optimizacion: str = MODO_NINGUNO
+    dpi: int = 150
+    calidad_jpeg: int = 75
+
+
+@dataclass
+class DescriptorPagina:
+    """
+    Descripción ligera de una página ya preparada para ser enviada a la IA.
+    Solo contiene rutas y metadatos, de modo que puede pasar entre procesos
+    sin copiar el contenido del PDF.
+    """
+
+    pdf_path: str
+    numero_pagina: int
+    total_paginas: int
+    ruta_pagina: str
+    sha256: str
+    tamano_bytes: int
+    texto: str = ""
+    tipo: TipoPagina = TipoPagina.DESCONOCIDA
+    motivo_clasificacion: str = ""
+    ruta_subida: str = ""
+    mime_type: str = MIME_PDF
+    bytes_subida: int = 0
+    # (franja, total) si el descriptor es una franja de una página densa.
+    franja: Optional[Tuple[int, int]] = None
+    # La última extracción de la página llegó truncada.
+    truncada: bool = False
+
+
+def _extraer_texto(page: PageObject) -> str:
+    """Lee la capa de texto de una página; devuelve '' si no tiene o falla."""
+    try:
+        return page.extract_text() or ""
+    except Exception as e:
+        logger.debug(f"No se pudo leer la capa de texto de la página: {e}")
+        return ""
+
+
+def iterar_paginas(
+    pdf_path: str, output_dir: str, opciones: Optional[OpcionesPreprocesado] = None
+) -> Iterator[DescriptorPagina]:
+    """
+    Divide un PDF en páginas individuales de forma perezosa: cada página se
+    lee del archivo proyectado en memoria, se escribe en `output_dir` y se
+    entrega su descriptor antes de pasar a la siguiente. Solo hay en memoria
+    el contenido de una página a la vez.
+
+    Args:
+        pdf_path: Ruta del PDF original.
+        output_dir: Directorio donde se escriben las páginas individuales.
+        opciones: Parámetros de clasificación y optimización.
+
+    Yields:
+        Los descriptores, en el orden de las páginas del documento.
+    """
+    opciones = opciones or OpcionesPreprocesado()
+    os.makedirs(output_dir, exist_ok=True)
+    with open(pdf_path, "rb") as archivo, \
+            mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ) as proyectado:
+        # mmap se comporta como un archivo binario de solo lectura.
+        reader = PdfReader(cast(IO[bytes], proyectado))
+        total = len(reader.pages)
+
+        for i in range(total):
+            page = reader.pages[i]
+            writer = PdfWriter()
+            writer.add_page(page)
+            buffer = io.BytesIO()
+            writer.write(buffer)
+            contenido = buffer.getvalue()
+            ruta_pagina = os.path.join(output_dir, f"page_{i + 1}.pdf")
+            with open(ruta_pagina, "wb") as output_pdf:
+                output_pdf.write(contenido)
+
+            texto = _extraer_texto(page)
+            tipo, motivo = clasificar_pagina(texto, min_filas=opciones.min_filas)
+            subida = optimizar_pagina(
+                ruta_pagina, opciones.modo_optimizacion, opciones.dpi, opciones.calidad_jpeg
+            )
+            yield DescriptorPagina(
+                pdf_path=pdf_path,
+                numero_pagina=i + 1,
+                total_paginas=total,
+                ruta_pagina=ruta_pagina,
+                sha256=hashlib.sha256(contenido).hexdigest(),
+                tamano_bytes=len(contenido),
+                texto=texto,
+                tipo=tipo,
+                motivo_clasificacion=motivo,
+                ruta_subida=subida.ruta,
+                mime_type=subida.mime_type,
+                bytes_subida=subida.bytes_finales,
+            )
+
+    logger.info(f"PDF '{os.path.basename(pdf_path)}' dividido en {total} páginas.")
+
+
+def preprocesar_pdf(
+    pdf_path: str, output_dir: str, opciones: Optional[OpcionesPreprocesado] = None
+) -> List[DescriptorPagina]:
+    """
+    Divide un PDF en páginas individuales, las guarda en `output_dir` y
+    devuelve un descriptor por página, ya clasificado a partir de su texto y
+    con la versión optimizada que se subirá a la IA.
+
+    Args:
+        pdf_path: Ruta del PDF original.
+        output_dir: Directorio donde se escriben las páginas individuales.
+        opciones: Parámetros de clasificación y optimización.
+
+    Returns:
+        La lista de descriptores, en el orden de las páginas del documento.
+    """
+    return list(iterar_paginas(pdf_path, output_dir, opciones))
+
+
+def preprocesar_pdfs(
+    pdf_paths: Sequence[str],
+    temp_dir: str,
+    max_workers: Optional[int] = None,
+    opciones: Optional[OpcionesPreprocesado] = None,
+    perezoso: bool = False,
+) -> Iterator[Tuple[str, Optional[Iterable[DescriptorPagina]]]]:
+    """
+    Preprocesa varios PDF en paralelo usando un pool de procesos y va
+    entregando los resultados a medida que cada documento termina.
+
+    Cada PDF se escribe en su propio subdirectorio de `temp_dir`. Con un solo
+    documento o `max_workers` <= 1 se procesa en el proceso actual para no
+    pagar el coste de arrancar procesos hijos; en ese caso, con `perezoso`,
+    se entrega un iterador de descriptores (`iterar_paginas`) en lugar de la
+    lista, y los errores de división aparecen al recorrerlo.
+
+    Args:
+        pdf_paths: Rutas de los PDF a preprocesar.
+        temp_dir: Directorio temporal base.
+        max_workers: Número máximo de procesos (None = número de CPUs).
+        opciones: Parámetros de clasificación y optimización.
+        perezoso: Entregar las páginas bajo demanda cuando se procesa en el
+                  proceso actual.
+
+    Yields:
+        Tuplas (pdf_path, descriptores). Los descriptores son None si el
+        documento no se pudo dividir.
+    """
+    trabajos = [
+        (pdf_path, os.path.join(temp_dir, f"doc_{i + 1}"))
+        for i, pdf_path in enumerate(pdf_paths)
+    ]
+
+    if len(trabajos) <= 1 or (max_workers is not None and max_workers <= 1):
+        for pdf_path, output_dir in trabajos:
+            if perezoso:
+                yield pdf_path, iterar_paginas(pdf_path, output_dir, opciones)
+                continue
+            try:
+                yield pdf_path, preprocesar_pdf(pdf_path, output_dir, opciones)
+            except Exception as e:
+                logger.error(f"Error al dividir el PDF {pdf_path}: {e}", exc_info=True)
+                yield pdf_path, None
+        return
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futuros = {
+            pool.submit(preprocesar_pdf, pdf_path, output_dir, opciones): pdf_path
+            for pdf_path, output_dir in trabajos
+        }
+        for futuro in as_completed(futuros):
+            pdf_path = futuros[futuro]
+            try:
+                yield pdf_path, futuro.result()
+            except Exception as e:
+                logger.error(f"Error al dividir el PDF {pdf_path}: {e}", exc_info=True)
+                yield pdf_path, None
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+Fichero: ventana_paginas.py
+Proyecto: Extractor de Movimientos Bancarios con IA
+
+Desarrollado por: IA Punto Soluciones Tecnológicas
+Para: Industrias Pico
+Responsable: MEng Sergio Rondón
+Fecha de Creación: 19/10/2026
+
+Descripción:
+Ventana de páginas en curso entre la etapa de preprocesamiento y la de
+llamadas a la API. Limita a la vez el número de páginas encoladas o en
+proceso y los bytes que ocupan (archivo a subir y capa de texto). Cuando la
+ventana está llena, quien encola espera a que termine alguna página: así el
+preprocesamiento no se adelanta a la API y la memoria usada no crece con el
+tamaño del documento.
+"""
+
+import logging
+import threading
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+
+class VentanaPaginas:
+    """Semáforo ponderado por páginas y por bytes, compartido por todos los hilos."""
+
+    def __init__(self, max_paginas: int, max_bytes: int):
+        """
+        Args:
+            max_paginas: Páginas que pueden estar encoladas o en proceso a la vez.
+            max_bytes: Bytes que pueden ocupar esas páginas. Una página más
+                       grande que el límite se admite sola.
+        """
+        self.max_paginas = max(1, max_paginas)
+        self.max_bytes = max(1, max_bytes)
+        self.paginas = 0
+        self.bytes = 0
+        self.pico_paginas = 0
+        self.pico_bytes = 0
+        self.esperas = 0
+        self._condicion = threading.Condition()
+
+    def _peso(self, tamano: int) -> int:
+        return min(max(tamano, 0), self.max_bytes)
+
+    def adquirir(self, tamano: int) -> None:
+        """Reserva sitio para una página de `tamano` bytes, esperando si la ventana está llena."""
+        peso = self._peso(tamano)
+        with self._condicion:
+            if self.paginas >= self.max_paginas or self.bytes + peso > self.max_bytes:
+                self.esperas += 1
+                logger.debug(f"Ventana de páginas llena ({self.paginas} páginas, "
+                             f"{self.bytes / 1024:.0f} KB); esperando.")
+            while self.paginas >= self.max_paginas or self.bytes + peso > self.max_bytes:
+                self._condicion.wait()
+            self.paginas += 1
+            self.bytes += peso
+            self.pico_paginas = max(self.pico_paginas, self.paginas)
+            self.pico_bytes = max(self.pico_bytes, self.bytes)
+
+    def liberar(self, tamano: int) -> None:
+        with self._condicion:
+            self.paginas -= 1
+            self.bytes -= self._peso(tamano)
+            self._condicion.notify_all()
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Fichero: verificador_pagina.py
+Proyecto: Extractor de Movimientos Bancarios con IA
+
+Desarrollado por: IA Punto Soluciones Tecnológicas
+Para: Industrias Pico
+Responsable: MEng Sergio Rondón
+Fecha de Creación: 19/10/2026
+
+Descripción:
+Comprobaciones locales sobre el resultado de una página, usadas por la
+cascada de modelos para decidir si una extracción del modelo rápido es fiable
+o si la página debe repetirse con el modelo más potente. Las comprobaciones
+comparan el resultado con la capa de texto de la página cuando existe.
+"""
+
+import re
+from typing import List, Optional, Set
+
+from .clasificador_paginas import (
+    PATRON_IMPORTE,
+    TipoPagina,
+    contar_filas_con_movimiento,
+)
+from .data_models import Transaccion, clean_number_string
+from .parser_respuesta import ResultadoParseo
+
+PATRON_FECHA_ESTANDAR = re.compile(r"^\d{2}-\d{2}-\d{4}$")
+
+# Proporción mínima de filas extraídas respecto a las detectadas en el texto.
+MIN_COBERTURA_FILAS = 0.8
+
+# Proporción mínima de importes extraídos que deben aparecer en el texto.
+MIN_IMPORTES_ENCONTRADOS = 0.9
+
+
+def _importes_del_texto(texto: str) -> Set[float]:
+    """Importes que aparecen en la capa de texto, ya normalizados."""
+    importes = set()
+    for bruto in PATRON_IMPORTE.findall(texto):
+        try:
+            limpio = clean_number_string(bruto.replace("$", "").replace(" ", "").lstrip("-"))
+            importes.add(round(float(limpio), 2))
+        except ValueError:
+            continue
+    return importes
+
+
+def evaluar_extraccion(
+    transacciones: List[Transaccion],
+    resultado: Optional[ResultadoParseo] = None,
+    texto: str = "",
+    tipo: TipoPagina = TipoPagina.DESCONOCIDA,
+) -> List[str]:
+    """
+    Evalúa la extracción de una página.
+
+    Args:
+        transacciones: Las transacciones extraídas de la página.
+        resultado: El último resultado del parser (filas inválidas, truncado).
+        texto: La capa de texto de la página ('' si es escaneada).
+        tipo: La clasificación local de la página.
+
+    Returns:
+        La lista de motivos por los que la extracción no parece fiable; una
+        lista vacía significa que la página puede darse por buena.
+    """
+    motivos = []
+
+    if resultado is not None:
+        if resultado.filas_invalidas:
+            motivos.append(f"{resultado.filas_invalidas} filas no válidas")
+        if resultado.truncada:
+            motivos.append("respuesta truncada")
+
+    if not transacciones:
+        if tipo == TipoPagina.TRANSACCIONES:
+            motivos.append("sin transacciones en una página de movimientos")
+        return motivos
+
+    fechas_malas = sum(1 for t in transacciones if not PATRON_FECHA_ESTANDAR.match(t.fecha))
+    if fechas_malas:
+        motivos.append(f"{fechas_malas} fechas fuera del formato dd-mm-aaaa")
+
+    importes_malos = sum(1 for t in transacciones if (t.debito is None) == (t.credito is None))
+    if importes_malos:
+        motivos.append(f"{importes_malos} filas sin importe o con débito y crédito")
+
+    if texto:
+        motivos.extend(_contrastar_con_texto(transacciones, texto))
+
+    return motivos
+
+
+def _contrastar_con_texto(transacciones: List[Transaccion], texto: str) -> List[str]:
+    """Compara las filas y los importes extraídos con la capa de texto de la página."""
+    motivos = []
+    filas_texto = contar_filas_con_movimiento(texto)
+    if filas_texto and len(transacciones) < MIN_COBERTURA_FILAS * filas_texto:
+        motivos.append(f"{len(transacciones)} filas extraídas de {filas_texto} detectadas en el texto")
+
+    importes_texto = _importes_del_texto(texto)
+    if importes_texto:
+        extraidos = [
+            round(abs(importe), 2)
+            for t in transacciones
+            for importe in (t.debito, t.credito)
+            if importe is not None
+        ]
+        encontrados = sum(1 for importe in extraidos if importe in importes_texto)
+        if extraidos and encontrados < MIN_IMPORTES_ENCONTRADOS * len(extraidos):
+            motivos.append(f"solo {encontrados}/{len(extraidos)} importes aparecen en el texto")
+    return motivos
@@ -0,0 +1,410 @@
+# -*- coding: utf-8 -*-
+"""
+Fichero: vigilante_carpeta.py
+Proyecto: Extractor de Movimientos Bancarios con IA
+
+Desarrollado por: IA Punto Soluciones Tecnológicas
+Para: Industrias Pico
+Responsable: MEng Sergio Rondón
+Fecha de Creación: 19/10/2026
+
+Descripción:
+Modo servicio: vigila una carpeta de entrada y procesa automáticamente cada
+PDF nuevo, sin interfaz gráfica. En Linux se usa inotify para enterarse de
+los archivos nuevos al momento; en el resto de sistemas (o si inotify no está
+disponible) se revisa la carpeta periódicamente.
+
+Un archivo solo se procesa cuando su tamaño y su fecha de modificación dejan
+de cambiar durante ESPERA_ESTABILIDAD_S, para no leer copias a medias. Los
+documentos ya procesados se reconocen por el hash de su contenido (aunque se
+renombren o se vuelvan a copiar) y se omiten. Los resultados se escriben en
+una carpeta de salida que replica la estructura de la de entrada.
+"""
+
+import configparser
+import ctypes
+import ctypes.util
+import json
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, List, Optional, Set, Tuple, Union
+
+from .canonizador_comercios import cargar_canonizador
+from .dialectos_csv import OpcionesCSV, cargar_opciones_csv
+from .exportador import (
+    DestinoCSV,
+    DestinoExcel,
+    DestinoExportacion,
+    DestinoJSONL,
+    DestinoParquet,
+    DestinoSQLite,
+    exportar_transacciones,
+)
+from .importador_odoo import DestinoOdoo, ImportadorOdoo
+from .indice_huellas import hash_archivo
+
+if TYPE_CHECKING:
+    from .extractor_ia import ExtractorIA
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Formatos de salida del modo servicio: clave -> (destino, sufijo del archivo).
+# "odoo" importa los movimientos en Odoo (sección [ODOO]) en lugar de escribir un archivo.
+FORMATOS_SALIDA = {
+    "csv": (DestinoCSV, "_movimientos.csv"),
+    "excel": (DestinoExcel, "_movimientos.xlsx"),
+    "jsonl": (DestinoJSONL, "_movimientos.jsonl"),
+    "parquet": (DestinoParquet, "_movimientos.parquet"),
+    "sqlite": (DestinoSQLite, "_movimientos.sqlite"),
+    "odoo": (DestinoOdoo, ""),
+}
+
+# Registro de los documentos ya procesados, dentro de la carpeta de salida.
+NOMBRE_REGISTRO = ".procesados.jsonl"
+
+# Cada cuánto se revisan los archivos pendientes de estabilizarse.
+TICK_S = 0.5
+
+# Eventos de inotify (ver inotify(7)).
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_ISDIR = 0x40000000
+_MASCARA = _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+_CABECERA_EVENTO = struct.Struct("iIII")
+
+
+def _cargar_libc() -> Optional[ctypes.CDLL]:
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        return libc if hasattr(libc, "inotify_init1") else None
+    except OSError:
+        return None
+
+
+_LIBC = _cargar_libc()
+INOTIFY_DISPONIBLE = _LIBC is not None
+
+
+class _FuenteInotify:
+    """Avisos de archivos nuevos o terminados de escribir con inotify (Linux)."""
+
+    def __init__(self, carpeta: str, recursivo: bool):
+        if _LIBC is None:
+            raise OSError("inotify solo está disponible en Linux")
+        self._libc = _LIBC
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 falló")
+        self._recursivo = recursivo
+        self._carpetas: Dict[int, str] = {}
+        self._vigilar(carpeta)
+        if recursivo:
+            for raiz, subcarpetas, _ in os.walk(carpeta):
+                for subcarpeta in subcarpetas:
+                    self._vigilar(os.path.join(raiz, subcarpeta))
+
+    def _vigilar(self, carpeta: str) -> None:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(carpeta), _MASCARA)
+        if wd < 0:
+            logger.warning(f"No se pudo vigilar {carpeta} con inotify (errno {ctypes.get_errno()}).")
+            return
+        self._carpetas[wd] = carpeta
+
+    def esperar(self, timeout: float) -> List[str]:
+        """Rutas con actividad en los próximos `timeout` segundos."""
+        listos, _, _ = select.select([self._fd], [], [], timeout)
+        if not listos:
+            return []
+        try:
+            datos = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        rutas = []
+        desplazamiento = 0
+        while desplazamiento + _CABECERA_EVENTO.size <= len(datos):
+            wd, mascara, _cookie, longitud = _CABECERA_EVENTO.unpack_from(datos, desplazamiento)
+            desplazamiento += _CABECERA_EVENTO.size
+            nombre = datos[desplazamiento:desplazamiento + longitud].rstrip(b"\0")
+            desplazamiento += longitud
+            if wd not in self._carpetas or not nombre:
+                continue
+            ruta = os.path.join(self._carpetas[wd], os.fsdecode(nombre))
+            if mascara & _IN_ISDIR:
+                if self._recursivo and mascara & (_IN_CREATE | _IN_MOVED_TO):
+                    self._vigilar(ruta)
+            else:
+                rutas.append(ruta)
+        return rutas
+
+    def cerrar(self) -> None:
+        os.close(self._fd)
+
+
+class _FuenteSondeo:
+    """Sin avisos: la carpeta se revisa completa en cada intervalo de sondeo."""
+
+    def __init__(self, detener: threading.Event):
+        self._detener = detener
+
+    def esperar(self, timeout: float) -> List[str]:
+        self._detener.wait(timeout)
+        return []
+
+    def cerrar(self) -> None:
+        pass
+
+
+class VigilanteCarpeta:
+    """
+    Procesa los PDF que aparecen en la carpeta de entrada configurada en la
+    sección [VIGILANCIA] de settings.ini.
+    """
+
+    def __init__(self, extractor: "ExtractorIA", config_path: str = "config/settings.ini"):
+        """
+        Args:
+            extractor: El ExtractorIA con el que se procesan los documentos.
+            config_path: Ruta de settings.ini.
+
+        Raises:
+            ValueError: Si la carpeta de entrada no existe o la configuración
+                        no es válida.
+        """
+        config = configparser.ConfigParser()
+        config.read(config_path)
+        self.extractor = extractor
+        self.entrada = os.path.abspath(config.get("VIGILANCIA", "carpeta_entrada", fallback="").strip() or ".")
+        self.salida = os.path.abspath(config.get("VIGILANCIA", "carpeta_salida", fallback="").strip()
+                                      or os.path.join(self.entrada, "procesados"))
+        self.recursivo = config.getboolean("VIGILANCIA", "recursivo", fallback=True)
+        self.espera_estabilidad = config.getfloat("VIGILANCIA", "espera_estabilidad_s", fallback=5.0)
+        self.intervalo_sondeo = config.getfloat("VIGILANCIA", "intervalo_sondeo_s", fallback=10.0)
+        self.usar_inotify = config.getboolean("VIGILANCIA", "usar_inotify", fallback=True) and INOTIFY_DISPONIBLE
+        self.max_documentos = max(1, config.getint("VIGILANCIA", "max_documentos_simultaneos", fallback=2))
+        self.formatos = [f.strip().lower() for f in config.get("VIGILANCIA", "formatos", fallback="csv").split(",")
+                         if f.strip()]
+
+        if not os.path.isdir(self.entrada):
+            raise ValueError(f"La carpeta de entrada no existe: {self.entrada}")
+        desconocidos = [f for f in self.formatos if f not in FORMATOS_SALIDA]
+        if desconocidos or not self.formatos:
+            raise ValueError(f"FORMATOS debe contener valores de: {', '.join(FORMATOS_SALIDA)}")
+        self.opciones_csv: Optional[OpcionesCSV] = None
+        try:
+            self.opciones_csv = cargar_opciones_csv(config_path)
+        except ValueError as e:
+            logger.error(f"{e}. Se usa el CSV por defecto.")
+        try:
+            self.canonizador = cargar_canonizador(config_path)
+        except ValueError as e:
+            logger.error(f"{e}. No se canonizan las descripciones.")
+            self.canonizador = None
+        self.importador_odoo = ImportadorOdoo(config_path) if "odoo" in self.formatos else None
+
+        os.makedirs(self.salida, exist_ok=True)
+        self.ruta_registro = os.path.join(self.salida, NOMBRE_REGISTRO)
+        self.procesados: Set[str] = self._leer_registro()
+        # ruta -> (tamaño, mtime, instante en que se vio así por primera vez)
+        self._pendientes: Dict[str, Tuple[int, float, float]] = {}
+        # ruta -> (tamaño, mtime) de los archivos ya decididos, para no
+        # volver a calcular su hash en cada revisión de la carpeta.
+        self._vistos: Dict[str, Tuple[int, float]] = {}
+        self._en_curso: Dict[str, Future] = {}
+        self._hashes_en_curso: Set[str] = set()
+        self._fallidos: Set[str] = set()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=self.max_documentos, thread_name_prefix="vigilante")
+
+    def _leer_registro(self) -> Set[str]:
+        procesados = set()
+        if os.path.exists(self.ruta_registro):
+            with open(self.ruta_registro, encoding="utf-8") as f:
+                for linea in f:
+                    try:
+                        procesados.add(json.loads(linea)["sha256"])
+                    except (ValueError, KeyError):
+                        continue
+        return procesados
+
+    def _anotar_procesado(self, sha256: str, ruta: str, transacciones: int) -> None:
+        with self._lock:
+            self.procesados.add(sha256)
+            with open(self.ruta_registro, "a", encoding="utf-8") as f:
+                f.write(json.dumps({
+                    "sha256": sha256,
+                    "ruta": os.path.relpath(ruta, self.entrada),
+                    "transacciones": transacciones,
+                    "fecha": datetime.now().isoformat(timespec="seconds"),
+                }, ensure_ascii=False) + "\n")
+
+    def _es_pdf(self, ruta: str) -> bool:
+        return ruta.lower().endswith(".pdf") and not ruta.startswith(self.salida + os.sep)
+
+    def escanear(self) -> List[str]:
+        """Todos los PDF de la carpeta de entrada (sin la de salida)."""
+        rutas: List[str] = []
+        for raiz, subcarpetas, archivos in os.walk(self.entrada):
+            subcarpetas[:] = [s for s in subcarpetas if os.path.join(raiz, s) != self.salida and not s.startswith(".")]
+            rutas.extend(os.path.join(raiz, a) for a in archivos)
+            if not self.recursivo:
+                break
+        return [r for r in rutas if self._es_pdf(r)]
+
+    def anotar(self, rutas: List[str]) -> None:
+        """Añade rutas a la lista de candidatos a procesar."""
+        for ruta in rutas:
+            if self._es_pdf(ruta) and ruta not in self._pendientes and ruta not in self._en_curso:
+                try:
+                    estado = os.stat(ruta)
+                except OSError:
+                    continue
+                if self._vistos.get(ruta) != (estado.st_size, estado.st_mtime):
+                    self._pendientes[ruta] = (estado.st_size, estado.st_mtime, time.monotonic())
+
+    def _estables(self) -> List[str]:
+        """Candidatos cuyo tamaño y fecha no han cambiado durante la espera de estabilidad."""
+        ahora = time.monotonic()
+        listos = []
+        for ruta, (tamano, mtime, desde) in list(self._pendientes.items()):
+            try:
+                estado = os.stat(ruta)
+            except OSError:
+                del self._pendientes[ruta]
+                continue
+            if (estado.st_size, estado.st_mtime) != (tamano, mtime):
+                self._pendientes[ruta] = (estado.st_size, estado.st_mtime, ahora)
+            elif ahora - desde >= self.espera_estabilidad and estado.st_size > 0:
+                listos.append(ruta)
+                self._vistos[ruta] = (tamano, mtime)
+        return listos
+
+    def despachar(self) -> int:
+        """
+        Envía al pool los candidatos estables que no estén ya procesados,
+        sin superar MAX_DOCUMENTOS_SIMULTANEOS: los demás esperan a la
+        siguiente vuelta. Devuelve el número de documentos enviados.
+        """
+        for ruta, futuro in list(self._en_curso.items()):
+            if futuro.done():
+                del self._en_curso[ruta]
+
+        enviados = 0
+        for ruta in self._estables():
+            if len(self._en_curso) >= self.max_documentos:
+                break
+            del self._pendientes[ruta]
+            try:
+                sha256 = hash_archivo(ruta)
+            except OSError as e:
+                logger.warning(f"No se pudo leer {ruta}: {e}")
+                continue
+            with self._lock:
+                repetido = sha256 in self.procesados or sha256 in self._hashes_en_curso or sha256 in self._fallidos
+                if not repetido:
+                    self._hashes_en_curso.add(sha256)
+            if repetido:
+                logger.debug(f"{ruta} ya se procesó (mismo contenido); se omite.")
+                continue
+            self._en_curso[ruta] = self._pool.submit(self._procesar, ruta, sha256)
+            enviados += 1
+        return enviados
+
+    def _rutas_salida(self, ruta: str) -> List[Tuple[str, str]]:
+        relativa = os.path.relpath(ruta, self.entrada)
+        base = os.path.join(self.salida, os.path.splitext(relativa)[0])
+        return [(formato, base + FORMATOS_SALIDA[formato][1]) for formato in self.formatos]
+
+    def _crear_destinos(self, ruta: str) -> List[DestinoExportacion]:
+        """Destinos de un documento: un archivo por formato y, con "odoo", la importación en Odoo."""
+        destinos: List[DestinoExportacion] = []
+        for formato, salida in self._rutas_salida(ruta):
+            destino = FORMATOS_SALIDA[formato][0]
+            if destino is DestinoOdoo and self.importador_odoo is not None:
+                destinos.append(DestinoOdoo(self.importador_odoo, f"odoo:{salida}"))
+                continue
+            os.makedirs(os.path.dirname(salida), exist_ok=True)
+            destinos.append(DestinoCSV(salida, self.opciones_csv) if destino is DestinoCSV else destino(salida))
+        return destinos
+
+    def _procesar(self, ruta: str, sha256: str) -> bool:
+        """Extrae un documento y escribe sus salidas; solo los correctos quedan en el registro."""
+        logger.info(f"Procesando {ruta}")
+        try:
+            transacciones = self.extractor.extraer_transacciones_de_pdf(ruta)
+            exito = False
+            total = 0
+            if transacciones is not None:
+                total = len(transacciones)
+                resultados = (
+                    exportar_transacciones(transacciones, self._crear_destinos(ruta), self.canonizador)
+                    if transacciones else {}
+                )
+                exito = not transacciones or all(resultados.values())
+            if exito:
+                self.extractor.confirmar_huellas(ruta)
+                self._anotar_procesado(sha256, ruta, total)
+                logger.info(f"{ruta}: {total} transacciones exportadas.")
+            else:
+                with self._lock:
+                    self._fallidos.add(sha256)
+                logger.error(f"No se pudo procesar {ruta}; se reintentará si el archivo cambia o al reiniciar.")
+            return exito
+        except Exception as e:
+            with self._lock:
+                self._fallidos.add(sha256)
+            logger.error(f"Error al procesar {ruta}: {e}", exc_info=True)
+            return False
+        finally:
+            with self._lock:
+                self._hashes_en_curso.discard(sha256)
+
+    def esperar_en_curso(self) -> None:
+        """Espera a que terminen los documentos enviados al pool."""
+        for futuro in list(self._en_curso.values()):
+            futuro.exception()
+
+    def ejecutar(self, detener: Optional[threading.Event] = None) -> None:
+        """
+        Bucle del servicio hasta que se active `detener` (o Ctrl+C). La
+        carpeta completa se revisa al arrancar y cada INTERVALO_SONDEO_S;
+        con inotify, además, los archivos nuevos se detectan al momento.
+        """
+        detener = detener or threading.Event()
+        fuente: Union[_FuenteInotify, _FuenteSondeo, None] = None
+        if self.usar_inotify:
+            try:
+                fuente = _FuenteInotify(self.entrada, self.recursivo)
+                logger.info(f"Vigilando {self.entrada} con inotify.")
+            except OSError as e:
+                logger.warning(f"inotify no disponible ({e}); se usará sondeo.")
+        if fuente is None:
+            fuente = _FuenteSondeo(detener)
+            logger.info(f"Vigilando {self.entrada} por sondeo cada {self.intervalo_sondeo:.0f} s.")
+        logger.info(f"Resultados en {self.salida} ({', '.join(self.formatos)}).")
+
+        proxima_revision = 0.0
+        try:
+            while not detener.is_set():
+                if time.monotonic() >= proxima_revision:
+                    self.anotar(self.escanear())
+                    proxima_revision = time.monotonic() + self.intervalo_sondeo
+                self.anotar(fuente.esperar(TICK_S))
+                self.despachar()
+        except KeyboardInterrupt:
+            logger.info("Vigilancia interrumpida por el usuario.")
+        finally:
+            fuente.cerrar()
+            self.esperar_en_curso()
+            self._pool.shutdown(wait=True)
+            logger.info("Vigilancia detenida.")
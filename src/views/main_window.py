@@ -22,12 +22,23 @@ import logging
 import webbrowser
 import toml
 import importlib.metadata  # Importamos importlib.metadata
+from typing import Sequence, Tuple
 from PIL import Image, ImageTk
 from ..utils.helpers import get_icon_path
 
 # Configurar logging
 logger = logging.getLogger(__name__)
 
+# Opciones de "Guardar todo en carpeta" -> formatos que se escriben a la vez.
+FORMATOS_GUARDAR_TODO = {
+    "CSV": ("csv",),
+    "Excel": ("excel",),
+    "CSV + Excel": ("csv", "excel"),
+    "JSON Lines": ("jsonl",),
+    "Parquet": ("parquet",),
+    "SQLite": ("sqlite",),
+}
+
 
 class MainWindow(ctk.CTk):
     """
@@ -47,7 +58,7 @@ class MainWindow(ctk.CTk):
 
         # --- Configuración de la Ventana Principal ---
         self.title("Extractor de Movimientos Bancarios")
-        self.geometry("800x400")  # Aumentamos el tamaño de la ventana
+        self.geometry("900x620")  # Espacio para el panel de la cola de archivos
         self.resizable(False, False)
 
         # --- Configuración del Icono ---
@@ -128,7 +139,7 @@ class MainWindow(ctk.CTk):
 
         self.select_pdf_button = ctk.CTkButton(
             extractor_frame,
-            text="Seleccionar Archivo PDF",
+            text="Seleccionar Archivos PDF",
             command=self._on_select_pdf_click
         )
         self.select_pdf_button.pack(pady=10, padx=10)
@@ -156,6 +167,36 @@ class MainWindow(ctk.CTk):
         )
         self.generate_excel_button.pack(pady=10, padx=10)
 
+        self.import_odoo_button = ctk.CTkButton(
+            extractor_frame,
+            text="Importar en Odoo",
+            command=self._on_import_odoo_click,
+            state="disabled"
+        )
+        self.import_odoo_button.pack(pady=10, padx=10)
+
+        # --- Cola de archivos ---
+        self.cola_frame = ctk.CTkScrollableFrame(extractor_frame, label_text="Cola de archivos", height=140)
+        self.cola_frame.pack(pady=(10, 5), padx=10, fill="both", expand=True)
+        self.cola_frame.grid_columnconfigure(0, weight=1)
+        self.filas_cola = []
+
+        guardar_todo_frame = ctk.CTkFrame(extractor_frame, fg_color="transparent")
+        guardar_todo_frame.pack(pady=5, padx=10)
+
+        self.formato_guardar_todo = ctk.CTkOptionMenu(
+            guardar_todo_frame, values=list(FORMATOS_GUARDAR_TODO), width=130
+        )
+        self.formato_guardar_todo.pack(side="left", padx=(0, 10))
+
+        self.save_all_button = ctk.CTkButton(
+            guardar_todo_frame,
+            text="Guardar todo en carpeta",
+            command=self._on_save_all_click,
+            state="disabled"
+        )
+        self.save_all_button.pack(side="left")
+
     def _crear_widgets_configuracion(self, tab):
         """Crea los widgets para la pestaña de configuración."""
         config_frame = ctk.CTkFrame(tab)
@@ -230,16 +271,56 @@ class MainWindow(ctk.CTk):
         if self.controller:
             self.controller.generar_excel()
 
-    def actualizar_ruta_archivo(self, ruta: str):
+    def _on_import_odoo_click(self) -> None:
+        if self.controller:
+            self.controller.importar_en_odoo()
+
+    def _on_save_all_click(self) -> None:
+        if self.controller:
+            self.controller.guardar_todo_en_carpeta(FORMATOS_GUARDAR_TODO[self.formato_guardar_todo.get()])
+
+    def actualizar_ruta_archivo(self, ruta: str, adicionales: int = 0):
         if ruta:
             nombre_archivo = os.path.basename(ruta)
-            self.file_path_label.configure(text=f"Archivo: {nombre_archivo}")
+            texto = f"Archivo: {nombre_archivo}"
+            if adicionales:
+                texto += f" (+{adicionales} más en la cola)"
+            self.file_path_label.configure(text=texto)
             self.generate_csv_button.configure(state="normal")
             self.generate_excel_button.configure(state="normal")
+            self.import_odoo_button.configure(state="normal")
         else:
             self.file_path_label.configure(text="Ningún archivo seleccionado")
             self.generate_csv_button.configure(state="disabled")
             self.generate_excel_button.configure(state="disabled")
+            self.import_odoo_button.configure(state="disabled")
+
+    def actualizar_cola(self, filas: Sequence[Tuple[str, str, str, str]]) -> None:
+        """
+        Muestra el estado de la cola. Cada fila es una tupla
+        (nombre, estado, progreso de páginas, número de filas).
+        """
+        while len(self.filas_cola) < len(filas):
+            fila = len(self.filas_cola)
+            etiquetas = [
+                ctk.CTkLabel(self.cola_frame, text="", anchor="w"),
+                ctk.CTkLabel(self.cola_frame, text="", width=90),
+                ctk.CTkLabel(self.cola_frame, text="", width=80),
+                ctk.CTkLabel(self.cola_frame, text="", width=70),
+            ]
+            for columna, etiqueta in enumerate(etiquetas):
+                etiqueta.grid(row=fila, column=columna, padx=5, sticky="ew" if columna == 0 else "")
+            self.filas_cola.append(etiquetas)
+
+        while len(self.filas_cola) > len(filas):
+            for etiqueta in self.filas_cola.pop():
+                etiqueta.destroy()
+
+        for etiquetas, valores in zip(self.filas_cola, filas):
+            for etiqueta, valor in zip(etiquetas, valores):
+                etiqueta.configure(text=valor)
+
+        self.save_all_button.configure(state="normal" if filas else "disabled")
 
     def actualizar_barra_estado(self, mensaje: str, es_error: bool = False):
         self.status_bar.configure(text=mensaje)
@@ -0,0 +1,1550 @@
+# -*- coding: utf-8 -*-
+"""
+Fichero: test_extraccion.py
+Proyecto: Extractor de Movimientos Bancarios con IA
+
+Desarrollado por: IA Punto Soluciones Tecnológicas
+Para: Industrias Pico
+Responsable: MEng Sergio Rondón
+Fecha de Creación: 19/10/2026
+
+Descripción:
+Tests del flujo de extracción que no necesitan conexión con la API de Gemini.
+"""
+
+import unittest
+import os
+import sys
+import tempfile
+import shutil
+import sqlite3
+import json
+import asyncio
+import gzip
+import threading
+import time
+from datetime import date
+from xmlrpc.server import MultiPathXMLRPCServer, SimpleXMLRPCDispatcher, SimpleXMLRPCRequestHandler
+from unittest import mock
+
+from google.api_core import exceptions as google_exceptions
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import openpyxl
+from PyPDF2 import PageObject, PdfReader, PdfWriter
+from PyPDF2.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from src.models.canonizador_comercios import CanonizadorComercios, cargar_canonizador
+from src.models.clasificador_paginas import TipoPagina, clasificar_pagina
+from src.models.conciliador import Conciliador, escribir_conciliacion_a_csv, leer_libro_csv
+from src.models.csv_writer import escribir_transacciones_a_csv
+from src.models.costes import ESTADO_BLANDO, ESTADO_DURO, ESTADO_NORMAL, ConsumoPagina, ControlCostes
+from src.models.data_models import Transaccion
+from src.models.dialectos_csv import cargar_opciones_csv
+from src.models.divisor_paginas import dividir_en_franjas, unir_franjas
+from src.models.exportador import (
+    PYARROW_DISPONIBLE,
+    DestinoCSV,
+    DestinoExcel,
+    DestinoJSONL,
+    DestinoParquet,
+    DestinoSQLite,
+    exportar_transacciones,
+)
+from src.models.hedging import PoliticaHedging
+from src.models.importador_odoo import DestinoOdoo, ImportadorOdoo
+from src.models.indice_huellas import IndiceHuellas, huellas_transacciones
+from src.models.extractor_async import AsyncExtractorIA
+from src.models.extractor_ia import ExtractorIA
+from src.models.libro_movimientos import LibroMovimientos, detectar_banco, detectar_cuenta
+from src.models.normalizador_fechas import aplicar_normalizacion, detectar_periodo, parsear_fecha, texto_a_fecha
+from src.models.optimizador_paginas import MIME_JPEG, MIME_PDF, PYMUPDF_DISPONIBLE, optimizar_pagina
+from src.models.parser_respuesta import parsear_respuesta_tolerante
+from src.models.pool_claves import ClaveAPI, PoolClavesAPI
+from src.models.perfiles_banco import (
+    MAX_FALLOS_SEGUIDOS,
+    AlmacenPerfiles,
+    aprender_plantilla,
+    leer_pagina,
+    parsear_con_plantilla,
+)
+from src.models.plantillas_prompt import (
+    FORMATO_COMPACTO,
+    FORMATO_COMPLETO,
+    FORMATO_FILAS,
+    obtener_plantilla,
+    parsear_respuesta,
+)
+from src.models.preprocesador_pdf import iterar_paginas, preprocesar_pdf, preprocesar_pdfs
+from src.models.ventana_paginas import VentanaPaginas
+from src.models.verificador_pagina import evaluar_extraccion
+from src.models.vigilante_carpeta import INOTIFY_DISPONIBLE, VigilanteCarpeta
+
+
+def crear_pdf(ruta: str, paginas: int) -> str:
+    """Crea un PDF con páginas en blanco para las pruebas."""
+    writer = PdfWriter()
+    for _ in range(paginas):
+        writer.add_blank_page(width=612, height=792)
+    with open(ruta, "wb") as f:
+        writer.write(f)
+    return ruta
+
+
+def crear_pdf_con_texto(ruta: str, filas) -> str:
+    """
+    Crea un PDF de una página con una tabla de movimientos en su capa de
+    texto: cabecera y una línea por fila (fecha, descripción, débito, crédito).
+    """
+    writer = PdfWriter()
+    pagina = PageObject.create_blank_page(width=612, height=792)
+    fuente = DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    })
+    pagina[NameObject("/Resources")] = DictionaryObject({
+        NameObject("/Font"): DictionaryObject({NameObject("/F1"): writer._add_object(fuente)})
+    })
+    lineas = [(700, ("FECHA", "DESCRIPCION", "DEBITO", "CREDITO"))]
+    lineas += [(680 - 15 * i, fila) for i, fila in enumerate(filas)]
+    partes = [
+        f"BT /F1 9 Tf {x} {y} Td ({texto}) Tj ET"
+        for y, fila in lineas
+        for x, texto in zip((50, 120, 400, 480), fila)
+        if texto
+    ]
+    contenido = DecodedStreamObject()
+    contenido.set_data("\n".join(partes).encode("latin-1"))
+    pagina[NameObject("/Contents")] = writer._add_object(contenido)
+    writer.add_page(pagina)
+    with open(ruta, "wb") as f:
+        writer.write(f)
+    return ruta
+
+
+def franjas_falsas(ruta_pagina: str, franjas: int, *_args):
+    """Sustituto de dividir_en_franjas que no necesita PyMuPDF."""
+    base = os.path.splitext(ruta_pagina)[0]
+    rutas = []
+    for k in range(1, franjas + 1):
+        ruta = f"{base}_franja{k}.jpg"
+        with open(ruta, "wb") as f:
+            f.write(b"\xff\xd8\xff\xd9")
+        rutas.append((ruta, MIME_JPEG))
+    return rutas
+
+
+def crear_config(directorio: str, extra: str = "") -> str:
+    """Crea un settings.ini mínimo con una clave ficticia."""
+    ruta = os.path.join(directorio, "settings.ini")
+    with open(ruta, "w", encoding="utf-8") as f:
+        f.write("[API]\nGEMINI_API_KEY = clave_de_prueba\n")
+        f.write("GEMINI_MODEL = gemini-1.5-flash-latest\n")
+        f.write(extra)
+    return ruta
+
+
+class TestPreprocesadorPDF(unittest.TestCase):
+    """Tests para la división y el análisis local de los PDF."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_preprocesar_pdf(self):
+        """Cada página genera un descriptor con su fichero y su hash."""
+        pdf = crear_pdf(os.path.join(self.test_dir, "a.pdf"), 3)
+        descriptores = preprocesar_pdf(pdf, os.path.join(self.test_dir, "out"))
+
+        self.assertEqual([d.numero_pagina for d in descriptores], [1, 2, 3])
+        for d in descriptores:
+            self.assertEqual(d.total_paginas, 3)
+            self.assertTrue(os.path.exists(d.ruta_pagina))
+            self.assertEqual(len(d.sha256), 64)
+            self.assertGreater(d.tamano_bytes, 0)
+
+    def test_preprocesar_pdfs_en_paralelo(self):
+        """El pool de procesos devuelve todos los documentos, incluso los inválidos."""
+        pdf_a = crear_pdf(os.path.join(self.test_dir, "a.pdf"), 2)
+        pdf_b = crear_pdf(os.path.join(self.test_dir, "b.pdf"), 1)
+        roto = os.path.join(self.test_dir, "roto.pdf")
+        with open(roto, "wb") as f:
+            f.write(b"no es un pdf")
+
+        resultados = dict(preprocesar_pdfs([pdf_a, pdf_b, roto], self.test_dir, max_workers=2))
+
+        self.assertEqual(len(resultados[pdf_a]), 2)
+        self.assertEqual(len(resultados[pdf_b]), 1)
+        self.assertIsNone(resultados[roto])
+
+    def test_iterar_paginas_es_perezoso(self):
+        """Cada página se escribe al pedir su descriptor, no antes."""
+        pdf = crear_pdf(os.path.join(self.test_dir, "a.pdf"), 3)
+        salida = os.path.join(self.test_dir, "out")
+        paginas = iterar_paginas(pdf, salida)
+
+        primera = next(paginas)
+        self.assertEqual((primera.numero_pagina, primera.total_paginas), (1, 3))
+        self.assertEqual(sorted(os.listdir(salida)), ["page_1.pdf"])
+        self.assertEqual([d.numero_pagina for d in paginas], [2, 3])
+
+
+class TestOptimizadorPaginas(unittest.TestCase):
+    """Tests para la reducción de tamaño de las páginas."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_comprimir_reduce_imagenes_escaneadas(self):
+        """Una página escaneada a alta resolución se reduce en modo comprimir."""
+        from PIL import Image
+        ruta = os.path.join(self.test_dir, "escaneo.pdf")
+        Image.effect_noise((1200, 1600), 40).convert("RGB").save(ruta, resolution=300, quality=95)
+
+        resultado = optimizar_pagina(ruta, "comprimir", dpi=72, calidad=50)
+
+        self.assertEqual(resultado.mime_type, MIME_PDF)
+        self.assertNotEqual(resultado.ruta, ruta)
+        self.assertLess(resultado.bytes_finales, resultado.bytes_originales)
+        imagen = next(iter(PdfReader(resultado.ruta).pages[0]["/Resources"]["/XObject"].values())).get_object()
+        self.assertEqual((imagen["/Width"], imagen["/Height"]), (288, 384))
+
+    def test_sin_mejora_se_conserva_original(self):
+        """Si la optimización no reduce el tamaño se sube la página original."""
+        ruta = crear_pdf(os.path.join(self.test_dir, "a.pdf"), 1)
+        resultado = optimizar_pagina(ruta, "comprimir")
+        self.assertEqual(resultado.ruta, ruta)
+
+
+class TestClasificadorPaginas(unittest.TestCase):
+    """Tests para el clasificador local de páginas."""
+
+    def test_pagina_de_movimientos(self):
+        """Varias líneas con fecha e importe indican una tabla de movimientos."""
+        texto = "FECHA DESCRIPCIÓN DÉBITO CRÉDITO SALDO\n" + "\n".join(
+            f"{d:02d}/09 COMPRA POS SUPERMERCADO {d} 1.234,56 10.000,00" for d in range(1, 15)
+        )
+        tipo, _ = clasificar_pagina(texto)
+        self.assertEqual(tipo, TipoPagina.TRANSACCIONES)
+
+    def test_pagina_legal(self):
+        """Un texto largo sin fechas ni importes se marca como sin movimientos."""
+        texto = "Términos y condiciones del contrato de cuenta de ahorros. " * 10
+        tipo, _ = clasificar_pagina(texto)
+        self.assertEqual(tipo, TipoPagina.SIN_TRANSACCIONES)
+
+    def test_pagina_escaneada(self):
+        """Sin capa de texto no se puede decidir y la página se envía."""
+        tipo, _ = clasificar_pagina("")
+        self.assertEqual(tipo, TipoPagina.DESCONOCIDA)
+
+
+class TestPlantillasPrompt(unittest.TestCase):
+    """Tests para las plantillas de prompt y los formatos de respuesta."""
+
+    def test_renderizar_plantilla(self):
+        """El número de página se inserta en la plantilla precompilada."""
+        prompt = obtener_plantilla("v1").renderizar(7)
+        self.assertIn("la página 7 de un extracto bancario", prompt)
+
+    def test_plantilla_desconocida(self):
+        with self.assertRaises(ValueError):
+            obtener_plantilla("v99")
+
+    def test_formatos_compactos_equivalen_al_completo(self):
+        """Los formatos compactos se convierten a las mismas transacciones."""
+        compacto = '{"t":[{"f":"01-09-2025","d":"Compra","db":"1.234,56","cr":null}]}'
+        filas = '{"t":[["01-09-2025","Compra","1.234,56",null]]}'
+        esperado = Transaccion(fecha="01-09-2025", descripcion="Compra", debito=1234.56, credito=None)
+
+        self.assertEqual(parsear_respuesta(compacto, FORMATO_COMPACTO), [esperado])
+        self.assertEqual(parsear_respuesta(filas, FORMATO_FILAS), [esperado])
+
+
+class TestParserRespuesta(unittest.TestCase):
+    """Tests para la recuperación de respuestas truncadas o con errores."""
+
+    def test_respuesta_truncada(self):
+        """Se conservan las filas completas de una lista cortada."""
+        texto = ('{"transacciones": [{"fecha": "01-09-2025", "descripcion": "A", "debito": 1, "credito": null}, '
+                 '{"fecha": "02-09-2025", "descripcion": "B", "debito": null, "credito": 2}, '
+                 '{"fecha": "03-09-2025", "descrip')
+        resultado = parsear_respuesta_tolerante(texto, FORMATO_COMPLETO)
+
+        self.assertTrue(resultado.truncada)
+        self.assertEqual([t.descripcion for t in resultado.transacciones], ["A", "B"])
+
+    def test_fila_invalida_no_descarta_la_pagina(self):
+        """Una fila que no valida se descarta sola."""
+        texto = '{"t": [["01-09-2025", "A", "10,00", null], ["02-09-2025"], ["03-09-2025", "C", null, "5"]]}'
+        resultado = parsear_respuesta_tolerante(texto, FORMATO_FILAS)
+
+        self.assertFalse(resultado.truncada)
+        self.assertEqual(resultado.filas_invalidas, 1)
+        self.assertEqual([t.descripcion for t in resultado.transacciones], ["A", "C"])
+
+    def test_respuesta_sin_lista_no_es_truncada(self):
+        """Una respuesta vacía, bloqueada o en prosa no se trata como truncada."""
+        for texto in ("", "No puedo procesar este documento.", '{"error": "bloqueada"}'):
+            resultado = parsear_respuesta_tolerante(texto, FORMATO_COMPLETO)
+            self.assertFalse(resultado.truncada)
+            self.assertTrue(resultado.sin_lista)
+            self.assertEqual(resultado.transacciones, [])
+        self.assertFalse(evaluar_extraccion([], parsear_respuesta_tolerante("", FORMATO_COMPLETO)))
+
+
+class TestVerificadorPagina(unittest.TestCase):
+    """Tests para las comprobaciones que deciden la escalada de modelo."""
+
+    TEXTO = "\n".join(f"{d:02d}/09 COMPRA {d} 1.{d:03d},50" for d in range(1, 6))
+
+    def test_extraccion_coherente(self):
+        transacciones = [
+            Transaccion(fecha=f"{d:02d}-09-2025", descripcion=f"COMPRA {d}", debito=1000 + d + 0.5, credito=None)
+            for d in range(1, 6)
+        ]
+        self.assertEqual(evaluar_extraccion(transacciones, texto=self.TEXTO), [])
+
+    def test_faltan_filas_e_importes(self):
+        """Pocas filas o importes inventados provocan la escalada."""
+        transacciones = [Transaccion(fecha="1/9", descripcion="COMPRA", debito=99.0, credito=None)]
+        motivos = evaluar_extraccion(transacciones, texto=self.TEXTO)
+        self.assertEqual(len(motivos), 3)
+
+
+class TestNormalizadorFechas(unittest.TestCase):
+    """Tests de la normalización de fechas por documento."""
+
+    @staticmethod
+    def transacciones(*fechas):
+        return [Transaccion(fecha=f, descripcion="x", debito=1.0, credito=None) for f in fechas]
+
+    def test_parsear_fecha(self):
+        self.assertEqual(parsear_fecha("05/09/2025"), (5, 9, 2025))
+        self.assertEqual(parsear_fecha("5 SEP"), (5, 9, None))
+        self.assertEqual(parsear_fecha("05 de septiembre de 2025"), (5, 9, 2025))
+        self.assertEqual(parsear_fecha("2025-09-05"), (5, 9, 2025))
+        self.assertIsNone(parsear_fecha("saldo anterior"))
+
+    def test_periodo_corrige_cambio_de_anio(self):
+        """En un extracto de diciembre a enero cada fecha recibe su año."""
+        periodo = detectar_periodo("BANCO\nPeriodo del 16/12/2024 al 15/01/2025\n")
+        transacciones = self.transacciones("20-12-2024", "02-01-2024", "10 ENE", "28/12")
+        corregidas, sin_resolver = aplicar_normalizacion(transacciones, periodo)
+
+        self.assertEqual([t.fecha for t in transacciones],
+                         ["20-12-2024", "02-01-2025", "10-01-2025", "28-12-2024"])
+        self.assertEqual((corregidas, sin_resolver), (3, 0))
+
+    def test_sin_periodo_detecta_el_salto_de_mes(self):
+        """Sin periodo, el paso de diciembre a enero avanza el año."""
+        transacciones = self.transacciones("28-12-2024", "30/12", "02/01", "???")
+        _, sin_resolver = aplicar_normalizacion(transacciones)
+
+        self.assertEqual([t.fecha for t in transacciones[:3]], ["28-12-2024", "30-12-2024", "02-01-2025"])
+        self.assertEqual(sin_resolver, 1)
+
+
+class TestIndiceHuellas(unittest.TestCase):
+    """Tests del índice de huellas de movimientos entre extractos."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.indice = IndiceHuellas(os.path.join(self.test_dir, "huellas.db"))
+
+    def tearDown(self):
+        self.indice.cerrar()
+        shutil.rmtree(self.test_dir)
+
+    @staticmethod
+    def _t(fecha, descripcion, debito):
+        return Transaccion(fecha=fecha, descripcion=descripcion, debito=debito, credito=None)
+
+    def test_huella_normaliza_fecha_y_descripcion(self):
+        """La misma fila escrita de otra forma tiene la misma huella."""
+        a = huellas_transacciones([self._t("05-09-2025", "Pago  Energía", 10.0)])
+        b = huellas_transacciones([self._t("5/9/2025", "PAGO ENERGIA", 10.00)])
+        self.assertEqual(a, b)
+
+    def test_extractos_solapados(self):
+        """Las filas del solape se marcan; las idénticas legítimas se cuentan por ordinal."""
+        septiembre = [self._t("15-09-2025", "CAFE", 3.0), self._t("15-09-2025", "CAFE", 3.0),
+                      self._t("20-09-2025", "LUZ", 50.0)]
+        solapado = [self._t("15-09-2025", "CAFE", 3.0), self._t("15-09-2025", "CAFE", 3.0),
+                    self._t("15-09-2025", "CAFE", 3.0), self._t("02-10-2025", "AGUA", 20.0)]
+
+        self.assertEqual(self.indice.consultar("123", septiembre, "sep"), [False, False, False])
+        self.assertEqual(self.indice.registrar("123", septiembre, "sep"), 3)
+        self.assertEqual(self.indice.consultar("123", solapado, "oct"), [True, True, False, False])
+        self.assertEqual(self.indice.consultar("999", septiembre, "otro"), [False, False, False])
+        self.assertEqual(self.indice.registrar("123", solapado, "oct"), 2)
+        self.assertEqual(self.indice.consultar("123", septiembre, "copia"), [True, True, True])
+
+    def test_mismo_documento_no_se_repite(self):
+        """Las huellas registradas por el mismo documento no cuentan como repetidas."""
+        septiembre = [self._t("15-09-2025", "CAFE", 3.0), self._t("20-09-2025", "LUZ", 50.0)]
+        self.indice.registrar("123", septiembre, "sep")
+        self.assertEqual(self.indice.consultar("123", septiembre, "sep"), [False, False])
+        self.assertEqual(self.indice.registrar("123", septiembre, "sep"), 0)
+
+
+class TestLibroMovimientos(unittest.TestCase):
+    """Tests del libro local de movimientos en SQLite."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.libro = LibroMovimientos(os.path.join(self.test_dir, "libro.db"))
+        self.libro.iniciar_ejecucion("e1")
+        self.libro.registrar_pagina("e1", "a.pdf", 1, [
+            Transaccion(fecha="02-09-2025", descripcion="Pago proveedor ACME", debito=150.0, credito=None),
+            Transaccion(fecha="05-09-2025", descripcion="Abono nómina", debito=None, credito=2000.0),
+        ], cuenta="123-456")
+        self.libro.registrar_pagina("e1", "b.pdf", 2, [
+            Transaccion(fecha="15-10-2025", descripcion="Transferencia ACME Ltda", debito=None, credito=150.0),
+        ])
+
+    def tearDown(self):
+        self.libro.cerrar()
+        shutil.rmtree(self.test_dir)
+
+    def test_buscar_por_texto_fecha_e_importe(self):
+        """Los filtros se combinan y el importe se compara en valor absoluto."""
+        self.assertEqual([m["archivo"] for m in self.libro.buscar(texto="acme")], ["a.pdf", "b.pdf"])
+        self.assertEqual(len(self.libro.buscar(importe=150)), 2)
+        octubre = self.libro.buscar(desde="01-10-2025", hasta="2025-10-31")
+        self.assertEqual([m["pagina"] for m in octubre], [2])
+        self.assertEqual(self.libro.buscar(texto="acme", importe=150, cuenta="123-456")[0]["importe"], -150.0)
+
+    def test_exportar_csv(self):
+        """Los movimientos del libro se reexportan sin volver a la IA."""
+        salida = os.path.join(self.test_dir, "salida.csv")
+        self.assertTrue(self.libro.exportar_csv(salida, archivo="a.pdf"))
+        self.assertEqual(len(self.libro.obtener_transacciones(archivo="a.pdf")), 2)
+        with open(salida, encoding="utf-8") as f:
+            self.assertIn("Abono nómina", f.read())
+
+    def test_detectar_cuenta(self):
+        self.assertEqual(detectar_cuenta("Cuenta de ahorros No. 123-456789 01"), "123-45678901")
+        self.assertIsNone(detectar_cuenta("Sin datos"))
+
+    def test_detectar_banco(self):
+        self.assertEqual(detectar_banco("BANCO DE BOGOTÁ\nExtracto de cuenta"), "BANCO DE BOGOTÁ")
+        self.assertEqual(detectar_banco("Bancolombia S.A. - Cuenta de ahorros"), "BANCOLOMBIA")
+        self.assertIsNone(detectar_banco("Extracto 09/2025"))
+
+
+class TestConciliador(unittest.TestCase):
+    """Tests de la conciliación con un libro contable exportado de Odoo."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.ruta_libro = os.path.join(self.test_dir, "libro.csv")
+        with open(self.ruta_libro, "w", encoding="utf-8") as f:
+            f.write("Fecha;Referencia;Etiqueta;Débito;Crédito\n")
+            f.write("2025-09-03;BNK1/001;Pago ACME SAS;0;150,00\n")
+            f.write("2025-09-05;BNK1/002;Nómina septiembre;2.000,00;0\n")
+            f.write("2025-09-10;BNK1/003;Comisión;0;10,00\n")
+            f.write("2025-09-10;BNK1/004;Comisión;0;10,00\n")
+            f.write("2025-09-20;BNK1/005;Cheque sin cobrar;0;99,00\n")
+        self.transacciones = [
+            Transaccion(fecha="02-09-2025", descripcion="PAGO PROVEEDOR ACME", debito=150.0, credito=None),
+            Transaccion(fecha="05-09-2025", descripcion="ABONO NOMINA", debito=None, credito=2000.0),
+            Transaccion(fecha="10-09-2025", descripcion="COMISION", debito=10.0, credito=None),
+            Transaccion(fecha="30-09-2025", descripcion="INTERESES", debito=None, credito=1.5),
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_leer_libro_csv(self):
+        apuntes = leer_libro_csv(self.ruta_libro)
+        self.assertEqual(len(apuntes), 5)
+        self.assertEqual(apuntes[1].importe, 2000.0)
+        self.assertEqual(apuntes[0].importe, -150.0)
+
+    def test_conciliar(self):
+        """Se separan emparejados, ambiguos y sin emparejar en cada lado."""
+        resultado = Conciliador(config_path="no_existe.ini").conciliar_con_csv(self.transacciones, self.ruta_libro)
+
+        self.assertEqual(
+            sorted((e.transaccion.descripcion, e.apunte.referencia) for e in resultado.emparejados),
+            [("ABONO NOMINA", "BNK1/002"), ("PAGO PROVEEDOR ACME", "BNK1/001")],
+        )
+        self.assertEqual([len(a.candidatos) for a in resultado.ambiguos], [2])
+        self.assertEqual([t.descripcion for t in resultado.sin_emparejar_extracto], ["INTERESES"])
+        self.assertEqual([a.referencia for a in resultado.sin_emparejar_libro], ["BNK1/005"])
+
+        salida = os.path.join(self.test_dir, "conciliacion.csv")
+        self.assertTrue(escribir_conciliacion_a_csv(resultado, salida))
+
+    def test_fuera_de_la_ventana_de_dias(self):
+        config_path = crear_config(self.test_dir, "[CONCILIACION]\nTOLERANCIA_DIAS = 0\n")
+        resultado = Conciliador(config_path=config_path).conciliar_con_csv(self.transacciones[:1], self.ruta_libro)
+        self.assertEqual(resultado.emparejados, [])
+
+
+class _ManejadorOdoo(SimpleXMLRPCRequestHandler):
+    rpc_paths = ("/xmlrpc/2/common", "/xmlrpc/2/object")
+
+
+class OdooFalso:
+    """Servidor XML-RPC local que imita la API externa de Odoo."""
+
+    def __init__(self):
+        self.lineas = {}
+        self.llamadas = []
+        self.servidor = MultiPathXMLRPCServer(
+            ("127.0.0.1", 0), requestHandler=_ManejadorOdoo, logRequests=False, allow_none=True
+        )
+        common = SimpleXMLRPCDispatcher(allow_none=True)
+        common.register_function(self.authenticate, "authenticate")
+        objeto = SimpleXMLRPCDispatcher(allow_none=True)
+        objeto.register_function(self.execute_kw, "execute_kw")
+        self.servidor.add_dispatcher("/xmlrpc/2/common", common)
+        self.servidor.add_dispatcher("/xmlrpc/2/object", objeto)
+        self.url = f"http://127.0.0.1:{self.servidor.server_address[1]}"
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+
+    def authenticate(self, db, usuario, clave, _contexto):
+        self.llamadas.append("authenticate")
+        return 2 if clave == "secreta" else False
+
+    def execute_kw(self, db, uid, clave, modelo, metodo, args, kwargs):
+        self.llamadas.append(metodo)
+        if metodo == "search_read":
+            claves = args[0][0][2]
+            return [{"unique_import_id": c} for c in claves if c in self.lineas]
+        if metodo == "create":
+            ids = []
+            for vals in args[0]:
+                self.lineas[vals["unique_import_id"]] = vals
+                ids.append(len(self.lineas))
+            return ids
+        raise ValueError(metodo)
+
+    def cerrar(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+
+class TestImportadorOdoo(unittest.TestCase):
+    """Tests de la importación por lotes contra un Odoo local simulado."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.odoo = OdooFalso()
+        self.config_path = crear_config(
+            self.test_dir,
+            f"[ODOO]\nURL = {self.odoo.url}\nBASE_DATOS = prueba\nUSUARIO = admin\n"
+            "CLAVE_API = secreta\nDIARIO_ID = 7\nTAMANO_LOTE = 10\n",
+        )
+        self.transacciones = [
+            Transaccion(fecha=f"{dia:02d}-09-2025", descripcion="Comisión", debito=1.0, credito=None)
+            for dia in range(1, 26)
+        ]
+
+    def tearDown(self):
+        self.odoo.cerrar()
+        shutil.rmtree(self.test_dir)
+
+    def test_importa_por_lotes(self):
+        """25 líneas en lotes de 10: una autenticación y dos llamadas por lote."""
+        resultado = ImportadorOdoo(self.config_path).importar(self.transacciones)
+
+        self.assertEqual(len(resultado.creadas), 25)
+        self.assertEqual(resultado.llamadas, 7)
+        self.assertEqual(self.odoo.llamadas.count("create"), 3)
+        linea = next(iter(self.odoo.lineas.values()))
+        self.assertEqual((linea["journal_id"], linea["date"], linea["amount"]), (7, "2025-09-01", -1.0))
+
+    def test_reimportar_no_duplica(self):
+        """Las claves de idempotencia evitan duplicar una importación repetida."""
+        ImportadorOdoo(self.config_path).importar(self.transacciones[:12])
+        resultado = ImportadorOdoo(self.config_path).importar(self.transacciones)
+
+        self.assertEqual((len(resultado.creadas), resultado.existentes), (13, 12))
+        self.assertEqual(len(self.odoo.lineas), 25)
+
+    def test_credenciales_incorrectas(self):
+        config_path = crear_config(self.test_dir, f"[ODOO]\nURL = {self.odoo.url}\nBASE_DATOS = prueba\n"
+                                                  "USUARIO = admin\nCLAVE_API = mala\nDIARIO_ID = 7\n")
+        with self.assertRaises(ConnectionError):
+            ImportadorOdoo(config_path).importar(self.transacciones)
+
+    def test_destino_de_exportacion(self):
+        """Odoo se puede usar como un destino más de exportar_transacciones."""
+        destino = DestinoOdoo(ImportadorOdoo(self.config_path))
+        csv_path = os.path.join(self.test_dir, "salida.csv")
+        resultados = exportar_transacciones(self.transacciones, [destino, DestinoCSV(csv_path)])
+
+        self.assertTrue(all(resultados.values()))
+        self.assertEqual(len(destino.resultado.creadas), 25)
+        self.assertEqual(len(self.odoo.lineas), 25)
+
+
+class TestCanonizadorComercios(unittest.TestCase):
+    """Tests de la normalización de descripciones a comercios canónicos."""
+
+    def test_quita_ruido_y_agrupa_variantes(self):
+        """Tarjetas, referencias, fechas y prefijos se quitan; las reglas agrupan variantes."""
+        canonizador = CanonizadorComercios([("Supermercado XYZ", [r"^SUPER(MERCADO)? XYZ\b"])])
+        self.assertEqual(canonizador.limpiar("PAGO PSE REF: 99812AB Empresa de Energía"), "EMPRESA DE ENERGIA")
+        for descripcion in ("COMPRA POS 1234 SUPERMERCADO XYZ 03/09",
+                            "Compra POS ****4521 SUPER XYZ 12/09/2025 14:33"):
+            self.assertEqual(canonizador.canonizar(descripcion), "Supermercado XYZ")
+
+    def test_conserva_nombres_con_un_digito(self):
+        """Los códigos con varios dígitos se quitan, pero no los nombres como 7ELEVEN o 3M."""
+        canonizador = CanonizadorComercios()
+        self.assertEqual(canonizador.limpiar("COMPRA POS 7ELEVEN AB12CD34 03/09"), "7ELEVEN")
+        self.assertEqual(canonizador.limpiar("PAGO 3M COLOMBIA 4521XK99"), "3M COLOMBIA")
+
+    def test_cache_por_descripcion(self):
+        """Las descripciones repetidas se resuelven desde la caché."""
+        canonizador = CanonizadorComercios()
+        for _ in range(3):
+            canonizador.canonizar("COMPRA POS 1234 FARMACIA 03/09")
+        info = canonizador.canonizar.cache_info()
+        self.assertEqual((info.hits, info.misses), (2, 1))
+
+    def test_cargar_desde_config(self):
+        """Las reglas se leen de [COMERCIOS] conservando el nombre canónico."""
+        test_dir = tempfile.mkdtemp()
+        try:
+            config_path = crear_config(test_dir, "[CANONIZACION]\nHABILITADO = true\n"
+                                                 "[COMERCIOS]\nNetflix Inc = NETFLIX|NFLX\n"
+                                                 "Cuota 100% = CUOTA 100%\n")
+            canonizador = cargar_canonizador(config_path)
+            self.assertEqual(canonizador.canonizar("COMPRA INTERNACIONAL NFLX 800123"), "Netflix Inc")
+            self.assertEqual(canonizador.reglas[-1][0], "Cuota 100%")
+            self.assertIsNone(cargar_canonizador(crear_config(test_dir)))
+            with self.assertRaises(ValueError):
+                cargar_canonizador(crear_config(test_dir, "[CANONIZACION]\nHABILITADO = true\n"
+                                                          "[COMERCIOS]\nMal = (\n"))
+        finally:
+            shutil.rmtree(test_dir)
+
+
+class TestExportador(unittest.TestCase):
+    """Tests de la exportación a varios formatos en una sola pasada."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.transacciones = [
+            Transaccion(fecha="15-12-2025", descripcion="Compra", debito=25.5, credito=None),
+            Transaccion(fecha="16-12-2025", descripcion="Depósito", debito=None, credito=100.0),
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def ruta(self, nombre):
+        return os.path.join(self.test_dir, nombre)
+
+    def test_todos_los_destinos_a_la_vez(self):
+        destinos = [DestinoCSV(self.ruta("a.csv")), DestinoExcel(self.ruta("a.xlsx")),
+                    DestinoJSONL(self.ruta("a.jsonl")), DestinoSQLite(self.ruta("a.db"))]
+        with mock.patch("src.models.exportador.texto_a_fecha", wraps=texto_a_fecha) as parsear:
+            resultados = exportar_transacciones(self.transacciones, destinos)
+
+        self.assertTrue(all(resultados.values()))
+        self.assertEqual(parsear.call_count, 2)
+        with open(self.ruta("a.jsonl"), encoding="utf-8") as f:
+            self.assertEqual(json.loads(f.readline())["fecha"], "2025-12-15")
+        with sqlite3.connect(self.ruta("a.db")) as conexion:
+            self.assertEqual(conexion.execute("SELECT SUM(credito) FROM movimientos").fetchone()[0], 100.0)
+        hoja = openpyxl.load_workbook(self.ruta("a.xlsx")).active
+        self.assertEqual(hoja["A2"].value.date(), date(2025, 12, 15))
+
+    def test_comercio_canonico_en_formatos_de_analisis(self):
+        """Con canonizador, JSON Lines y SQLite llevan el comercio; el CSV no cambia."""
+        destinos = [DestinoCSV(self.ruta("a.csv")), DestinoJSONL(self.ruta("a.jsonl")),
+                    DestinoSQLite(self.ruta("a.db"))]
+        canonizador = CanonizadorComercios([("Tienda", ["^COMPRA$"])], prefijos=[])
+        self.assertTrue(all(exportar_transacciones(self.transacciones, destinos, canonizador).values()))
+
+        with open(self.ruta("a.jsonl"), encoding="utf-8") as f:
+            self.assertEqual([json.loads(linea)["comercio"] for linea in f], ["Tienda", "DEPOSITO"])
+        with sqlite3.connect(self.ruta("a.db")) as conexion:
+            self.assertEqual(conexion.execute("SELECT comercio FROM movimientos").fetchone()[0], "Tienda")
+        with open(self.ruta("a.csv"), encoding="utf-8") as f:
+            self.assertNotIn("Tienda", f.read())
+
+    def test_un_destino_fallido_no_afecta_a_los_demas(self):
+        destinos = [DestinoCSV(self.ruta("no_existe/a.csv")), DestinoJSONL(self.ruta("a.jsonl"))]
+        resultados = exportar_transacciones(self.transacciones, destinos)
+        self.assertEqual(list(resultados.values()), [False, True])
+
+    @unittest.skipUnless(PYARROW_DISPONIBLE, "pyarrow no está instalado")
+    def test_parquet(self):
+        resultados = exportar_transacciones(self.transacciones, [DestinoParquet(self.ruta("a.parquet"))])
+        self.assertTrue(resultados[self.ruta("a.parquet")])
+
+    def test_csv_perfil_excel_es(self):
+        """El perfil y las claves de [CSV] definen el dialecto del archivo."""
+        config_path = crear_config(self.test_dir, "[CSV]\nPERFIL = excel-es\nDATE_FORMAT = aaaa/mm/dd\n")
+        opciones = cargar_opciones_csv(config_path)
+        self.assertTrue(escribir_transacciones_a_csv(self.transacciones, self.ruta("a.csv"), opciones))
+
+        with open(self.ruta("a.csv"), encoding="utf-8-sig") as f:
+            lineas = f.read().splitlines()
+        self.assertEqual(lineas[0], "Dia;Etiqueta;Debit;Credit")
+        self.assertEqual(lineas[1], "2025/12/15;Compra;25,50;")
+
+    def test_csv_gzip_y_anexar(self):
+        """En modo anexar la cabecera solo se escribe una vez."""
+        config_path = crear_config(self.test_dir, "[CSV]\nCOMPRIMIR_GZIP = true\nMODO_ANEXAR = true\n")
+        opciones = cargar_opciones_csv(config_path)
+        escribir_transacciones_a_csv(self.transacciones, self.ruta("a.csv"), opciones)
+        escribir_transacciones_a_csv(self.transacciones, self.ruta("a.csv"), opciones)
+
+        with gzip.open(self.ruta("a.csv.gz"), "rt", encoding="utf-8") as f:
+            lineas = f.read().splitlines()
+        self.assertEqual(len(lineas), 5)
+        self.assertEqual(lineas.count("Dia,Etiqueta,Debit,Credit"), 1)
+
+    def test_perfil_desconocido(self):
+        config_path = crear_config(self.test_dir, "[CSV]\nPERFIL = otro\n")
+        with self.assertRaises(ValueError):
+            cargar_opciones_csv(config_path)
+
+    def test_lista_invalida(self):
+        resultados = exportar_transacciones([{"fecha": "x"}], [DestinoCSV(self.ruta("a.csv"))])
+        self.assertFalse(resultados[self.ruta("a.csv")])
+
+
+class TestDivisorPaginas(unittest.TestCase):
+    """Tests de la división de páginas densas en franjas."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    @staticmethod
+    def fila(n, descripcion=None):
+        return Transaccion(fecha=f"{n:02d}-09-2025", descripcion=descripcion or f"Pago {n}", debito=float(n), credito=None)
+
+    @unittest.skipUnless(PYMUPDF_DISPONIBLE, "las franjas se rasterizan con PyMuPDF")
+    def test_franjas_solapadas(self):
+        pdf = crear_pdf(os.path.join(self.test_dir, "p.pdf"), 1)
+        franjas = dividir_en_franjas(pdf, 3, solape=0.1)
+
+        self.assertEqual([mime for _, mime in franjas], [MIME_JPEG] * 3)
+        self.assertTrue(all(os.path.getsize(ruta) > 0 for ruta, _ in franjas))
+
+    @unittest.skipIf(PYMUPDF_DISPONIBLE, "PyMuPDF está instalado")
+    def test_sin_pymupdf_no_hay_franjas(self):
+        """Sin PyMuPDF no se divide: recortar la caja del PDF no quita el contenido."""
+        pdf = crear_pdf(os.path.join(self.test_dir, "p.pdf"), 1)
+        with self.assertRaises(RuntimeError):
+            dividir_en_franjas(pdf, 3)
+        extractor = ExtractorIA(config_path=crear_config(self.test_dir))
+        self.assertEqual(extractor.franjas_pagina_densa, 1)
+
+    def test_unir_franjas_elimina_la_costura(self):
+        """Las filas del solape aparecen una vez, con la descripción completa."""
+        arriba = [self.fila(1), self.fila(2), self.fila(3, "Pago")]
+        abajo = [self.fila(3, "Pago 3 proveedor"), self.fila(4)]
+        unidas = unir_franjas([arriba, abajo])
+
+        self.assertEqual([t.fecha[:2] for t in unidas], ["01", "02", "03", "04"])
+        self.assertEqual(unidas[2].descripcion, "Pago 3 proveedor")
+
+    def test_unir_franjas_sin_solape(self):
+        self.assertEqual(len(unir_franjas([[self.fila(1)], [self.fila(2)], []])), 2)
+
+
+class TestPoolClavesAPI(unittest.TestCase):
+    """Tests del reparto de páginas entre claves de API."""
+
+    def setUp(self):
+        self.claves = [ClaveAPI(i, f"clave{i}", [mock.Mock()], mock.Mock()) for i in range(2)]
+        self.pool = PoolClavesAPI(self.claves, enfriamiento_s=60)
+
+    def test_elige_la_menos_cargada(self):
+        with self.pool.adquirir() as primera, self.pool.adquirir() as segunda:
+            self.assertIsNot(primera, segunda)
+            self.assertEqual((primera.en_vuelo, segunda.en_vuelo), (1, 1))
+        self.assertEqual([c.en_vuelo for c in self.claves], [0, 0])
+
+    def test_enfriamiento_tras_error_de_cuota(self):
+        """Una clave sin cuota no se asigna y su enfriamiento crece con cada error."""
+        self.pool.registrar_error_cuota(self.claves[0])
+        for _ in range(3):
+            with self.pool.adquirir() as clave:
+                self.assertIs(clave, self.claves[1])
+
+        primero = self.claves[0].enfriada_hasta
+        self.pool.registrar_error_cuota(self.claves[0])
+        self.assertGreater(self.claves[0].enfriada_hasta - primero, 50)
+        self.pool.registrar_exito(self.claves[0])
+        self.assertEqual(self.claves[0].errores_consecutivos, 0)
+
+    def test_espera_si_todas_estan_en_enfriamiento(self):
+        pool = PoolClavesAPI(self.claves[:1], enfriamiento_s=0.05)
+        pool.registrar_error_cuota(self.claves[0])
+        with pool.adquirir() as clave:
+            self.assertIs(clave, self.claves[0])
+
+
+class TestPoliticaHedging(unittest.TestCase):
+    """Tests de las peticiones duplicadas contra la latencia de cola."""
+
+    def setUp(self):
+        self.politica = PoliticaHedging(percentil=50, presupuesto=1.0, min_muestras=1, plazo_minimo_s=0.01)
+        self.politica.registrar_latencia("m", 0.01)
+        self.liberar = threading.Event()
+
+    def tearDown(self):
+        self.liberar.set()
+        self.politica.cerrar()
+
+    def llamada_lenta_la_primera_vez(self, respuestas):
+        """La primera invocación se queda bloqueada; las siguientes responden al momento."""
+        invocaciones = []
+
+        def llamada():
+            invocaciones.append(1)
+            orden = len(invocaciones)
+            if orden == 1:
+                self.liberar.wait(5)
+            return respuestas[orden - 1]
+
+        return llamada
+
+    def test_la_copia_gana_a_la_llamada_lenta(self):
+        respuesta, duplicada, gano_copia = self.politica.ejecutar(
+            "m", self.llamada_lenta_la_primera_vez(["lenta", "copia"])
+        )
+        self.assertEqual((respuesta, duplicada, gano_copia), ("copia", True, True))
+        self.assertEqual(self.politica.ganadas_por_copia, 1)
+
+    def test_la_respuesta_perdedora_se_contabiliza(self):
+        """La llamada que pierde se entrega a `al_perder` cuando termina."""
+        perdedoras = []
+        terminada = threading.Event()
+
+        def al_perder(respuesta):
+            perdedoras.append(respuesta)
+            terminada.set()
+
+        respuesta, _, _ = self.politica.ejecutar(
+            "m", self.llamada_lenta_la_primera_vez(["lenta", "copia"]), al_perder
+        )
+        self.assertEqual((respuesta, perdedoras), ("copia", []))
+        self.liberar.set()
+        self.assertTrue(terminada.wait(5))
+        self.assertEqual(perdedoras, ["lenta"])
+
+    def test_sin_presupuesto_no_duplica(self):
+        self.politica.presupuesto = 0
+        llamada = self.llamada_lenta_la_primera_vez(["lenta"])
+        threading.Timer(0.1, self.liberar.set).start()
+        self.assertEqual(self.politica.ejecutar("m", llamada), ("lenta", False, False))
+        self.assertEqual(self.politica.duplicadas, 0)
+
+    def test_sin_muestras_no_duplica(self):
+        self.assertEqual(self.politica.plazo("otro"), None)
+        self.assertEqual(self.politica.ejecutar("otro", lambda: "ok"), ("ok", False, False))
+
+
+class TestControlCostes(unittest.TestCase):
+    """Tests de la contabilidad de tokens y de los presupuestos."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.archivo = os.path.join(self.test_dir, "costes.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def control(self, presupuestos=""):
+        return ControlCostes(crear_config(
+            self.test_dir,
+            f"[COSTES]\nARCHIVO = {self.archivo}\n{presupuestos}"
+            "[PRECIOS]\ngemini-1.5-flash-latest = 0.10, 0.40\n",
+        ))
+
+    def test_coste_segun_tabla_de_precios(self):
+        control = self.control()
+        self.assertAlmostEqual(control.coste("gemini-1.5-flash-latest", 1_000_000, 500_000), 0.30)
+        self.assertEqual(control.coste("modelo-sin-precio", 1000, 1000), 0.0)
+
+    def test_presupuestos_por_ejecucion(self):
+        control = self.control("PRESUPUESTO_EJECUCION_BLANDO = 0.5\nPRESUPUESTO_EJECUCION_DURO = 1\n")
+        self.assertEqual(control.estado(), ESTADO_NORMAL)
+        control.registrar_pagina(ConsumoPagina("a.pdf", 1, coste=0.6), "e1")
+        self.assertEqual(control.estado(), ESTADO_BLANDO)
+        control.registrar_pagina(ConsumoPagina("a.pdf", 2, coste=0.6), "e1")
+        self.assertEqual(control.estado(), ESTADO_DURO)
+        control.iniciar_ejecucion()
+        self.assertEqual(control.estado(), ESTADO_NORMAL)
+
+    def test_gasto_diario_persiste_entre_instancias(self):
+        self.control().registrar_pagina(ConsumoPagina("a.pdf", 1, coste=2.0), "e1")
+        control = self.control("PRESUPUESTO_DIARIO_DURO = 1.5\n")
+        self.assertAlmostEqual(control.gasto_diario, 2.0)
+        self.assertEqual(control.estado(), ESTADO_DURO)
+
+
+class TestVigilanteCarpeta(unittest.TestCase):
+    """Tests del modo servicio que vigila una carpeta."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.entrada = os.path.join(self.test_dir, "entrada")
+        self.salida = os.path.join(self.test_dir, "salida")
+        os.makedirs(os.path.join(self.entrada, "banco"))
+        self.extractor = mock.Mock()
+        self.extractor.extraer_transacciones_de_pdf.return_value = [
+            Transaccion(fecha="01-09-2025", descripcion="Pago", debito=1.0, credito=None)
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def vigilante(self, extra="ESPERA_ESTABILIDAD_S = 0\n"):
+        config_path = crear_config(
+            self.test_dir,
+            f"[VIGILANCIA]\nCARPETA_ENTRADA = {self.entrada}\nCARPETA_SALIDA = {self.salida}\n"
+            f"FORMATOS = csv, jsonl\n{extra}",
+        )
+        return VigilanteCarpeta(self.extractor, config_path)
+
+    def revisar(self, vigilante):
+        vigilante.anotar(vigilante.escanear())
+        vigilante.despachar()
+        vigilante.esperar_en_curso()
+
+    def test_procesa_en_carpeta_espejo_y_omite_repetidos(self):
+        pdf = crear_pdf(os.path.join(self.entrada, "banco", "sept.pdf"), 1)
+        vigilante = self.vigilante()
+        self.revisar(vigilante)
+
+        self.assertTrue(os.path.exists(os.path.join(self.salida, "banco", "sept_movimientos.csv")))
+        self.assertTrue(os.path.exists(os.path.join(self.salida, "banco", "sept_movimientos.jsonl")))
+        self.assertEqual(self.extractor.extraer_transacciones_de_pdf.call_count, 1)
+
+        # Una copia con otro nombre tiene el mismo contenido, y al reiniciar
+        # el registro recuerda lo ya procesado.
+        shutil.copy(pdf, os.path.join(self.entrada, "copia.pdf"))
+        self.revisar(vigilante)
+        self.revisar(self.vigilante())
+        self.assertEqual(self.extractor.extraer_transacciones_de_pdf.call_count, 1)
+
+    def test_espera_a_que_el_archivo_sea_estable(self):
+        crear_pdf(os.path.join(self.entrada, "a.pdf"), 1)
+        vigilante = self.vigilante("ESPERA_ESTABILIDAD_S = 60\n")
+        self.revisar(vigilante)
+        self.extractor.extraer_transacciones_de_pdf.assert_not_called()
+
+    def test_fallo_no_queda_registrado(self):
+        crear_pdf(os.path.join(self.entrada, "a.pdf"), 1)
+        self.extractor.extraer_transacciones_de_pdf.return_value = None
+        vigilante = self.vigilante()
+        self.revisar(vigilante)
+        self.assertEqual(vigilante.procesados, set())
+        self.assertEqual(self.vigilante().procesados, set())
+
+    def test_carpeta_inexistente(self):
+        shutil.rmtree(self.entrada)
+        with self.assertRaises(ValueError):
+            self.vigilante()
+
+    @unittest.skipUnless(INOTIFY_DISPONIBLE, "inotify solo está disponible en Linux")
+    def test_inotify_detecta_archivos_nuevos(self):
+        vigilante = self.vigilante("ESPERA_ESTABILIDAD_S = 0\nINTERVALO_SONDEO_S = 3600\n")
+        detener = threading.Event()
+        hilo = threading.Thread(target=vigilante.ejecutar, args=(detener,))
+        hilo.start()
+        try:
+            time.sleep(0.2)
+            crear_pdf(os.path.join(self.entrada, "banco", "nuevo.pdf"), 1)
+            esperada = os.path.join(self.salida, "banco", "nuevo_movimientos.csv")
+            limite = time.monotonic() + 10
+            while not os.path.exists(esperada) and time.monotonic() < limite:
+                time.sleep(0.1)
+        finally:
+            detener.set()
+            hilo.join()
+        self.assertTrue(os.path.exists(esperada))
+
+
+class TestPerfilesBanco(unittest.TestCase):
+    """Tests de los perfiles de diseño aprendidos de extracciones anteriores."""
+
+    FILAS_SEPT = [("01/09/2025", "PAGO LUZ", "1.234,56", ""), ("02/09/2025", "NOMINA", "", "2.000,00"),
+                  ("03/09/2025", "SUPERMERCADO", "85,20", "")]
+    FILAS_OCT = [("01/10/2025", "ALQUILER", "900,00", ""), ("05/10/2025", "TRANSFERENCIA", "", "150,00"),
+                 ("07/10/2025", "FARMACIA", "12,35", ""), ("09/10/2025", "GASOLINA", "60,00", "")]
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    @staticmethod
+    def transacciones(filas):
+        def importe(texto):
+            return float(texto.replace(".", "").replace(",", ".")) if texto else None
+        return [Transaccion(fecha=f.replace("/", "-"), descripcion=d, debito=importe(db), credito=importe(cr))
+                for f, d, db, cr in filas]
+
+    def test_plantilla_lee_otro_extracto_del_mismo_banco(self):
+        sept = leer_pagina(crear_pdf_con_texto(os.path.join(self.test_dir, "sept.pdf"), self.FILAS_SEPT))
+        octubre = leer_pagina(crear_pdf_con_texto(os.path.join(self.test_dir, "oct.pdf"), self.FILAS_OCT))
+        self.assertEqual(sept.huella, octubre.huella)
+
+        plantilla = aprender_plantilla(sept, self.transacciones(self.FILAS_SEPT))
+        self.assertIsNotNone(plantilla)
+        self.assertEqual(plantilla.separador_decimal, ",")
+        self.assertEqual(parsear_con_plantilla(octubre, plantilla), self.transacciones(self.FILAS_OCT))
+
+    def test_no_aprende_si_no_encuentra_las_filas(self):
+        sept = leer_pagina(crear_pdf_con_texto(os.path.join(self.test_dir, "sept.pdf"), self.FILAS_SEPT))
+        self.assertIsNone(aprender_plantilla(sept, self.transacciones(self.FILAS_OCT)))
+
+    def test_almacen_persiste_las_plantillas(self):
+        ruta = os.path.join(self.test_dir, "perfiles.json")
+        sept = leer_pagina(crear_pdf_con_texto(os.path.join(self.test_dir, "sept.pdf"), self.FILAS_SEPT))
+        self.assertTrue(AlmacenPerfiles(ruta).aprender(sept, self.transacciones(self.FILAS_SEPT)))
+
+        almacen = AlmacenPerfiles(ruta)
+        self.assertEqual(len(almacen), 1)
+        texto = "\n".join(" ".join(c for c in fila if c) for fila in self.FILAS_SEPT)
+        self.assertEqual(almacen.extraer(sept, texto), self.transacciones(self.FILAS_SEPT))
+
+    def test_lecturas_locales_se_guardan_en_bloque(self):
+        """Leer una página no reescribe el archivo; los usos se guardan con guardar()."""
+        ruta = os.path.join(self.test_dir, "perfiles.json")
+        sept = leer_pagina(crear_pdf_con_texto(os.path.join(self.test_dir, "sept.pdf"), self.FILAS_SEPT))
+        almacen = AlmacenPerfiles(ruta)
+        almacen.aprender(sept, self.transacciones(self.FILAS_SEPT))
+        texto = "\n".join(" ".join(c for c in fila if c) for fila in self.FILAS_SEPT)
+
+        with mock.patch.object(almacen, "_guardar", wraps=almacen._guardar) as guardar:
+            for _ in range(3):
+                almacen.extraer(sept, texto)
+            self.assertEqual(guardar.call_count, 0)
+            almacen.guardar()
+            almacen.guardar()
+        self.assertEqual(guardar.call_count, 1)
+        with open(ruta, encoding="utf-8") as f:
+            self.assertEqual(json.load(f)[sept.huella]["usos"], 3)
+
+    def test_lecturas_fallidas_concurrentes_de_una_huella(self):
+        """Dos páginas que fallan a la vez con la plantilla la descartan una sola vez."""
+        sept = leer_pagina(crear_pdf_con_texto(os.path.join(self.test_dir, "sept.pdf"), self.FILAS_SEPT))
+        almacen = AlmacenPerfiles(os.path.join(self.test_dir, "perfiles.json"))
+        almacen.aprender(sept, self.transacciones(self.FILAS_SEPT))
+        almacen._plantillas[sept.huella].fallos_seguidos = MAX_FALLOS_SEGUIDOS - 1
+        barrera = threading.Barrier(2)
+
+        def lectura_fallida(lectura, plantilla):
+            barrera.wait(timeout=5)
+            return []
+
+        resultados, errores = [], []
+
+        def leer():
+            try:
+                resultados.append(almacen.extraer(sept, "01/09/2025 PAGO LUZ 1.234,56"))
+            except Exception as e:
+                errores.append(e)
+
+        with mock.patch("src.models.perfiles_banco.parsear_con_plantilla", side_effect=lectura_fallida):
+            hilos = [threading.Thread(target=leer) for _ in range(2)]
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+
+        self.assertEqual(errores, [])
+        self.assertEqual(resultados, [None, None])
+        self.assertEqual(len(almacen), 0)
+
+    def test_extractor_lee_localmente_el_segundo_extracto(self):
+        """Tras extraer un extracto con la IA, el siguiente del mismo banco no llama a la API."""
+        config_path = crear_config(
+            self.test_dir, f"[PERFILES]\nHABILITADO = true\nRUTA = {os.path.join(self.test_dir, 'p.json')}\n"
+        )
+        sept = crear_pdf_con_texto(os.path.join(self.test_dir, "sept.pdf"), self.FILAS_SEPT)
+        octubre = crear_pdf_con_texto(os.path.join(self.test_dir, "oct.pdf"), self.FILAS_OCT)
+        extractor = ExtractorIA(config_path=config_path)
+        filas = ", ".join(
+            json.dumps({"fecha": t.fecha, "descripcion": t.descripcion, "debito": t.debito, "credito": t.credito})
+            for t in self.transacciones(self.FILAS_SEPT)
+        )
+        respuesta = mock.Mock(text='{"transacciones": [' + filas + "]}")
+
+        with mock.patch("google.generativeai.upload_file", return_value=mock.Mock(name="f")), \
+                mock.patch.object(extractor.model, "generate_content", return_value=respuesta) as generar:
+            extractor.extraer_transacciones_de_pdf(sept)
+            resultado = extractor.extraer_transacciones_de_pdf(octubre)
+
+        self.assertEqual(generar.call_count, 1)
+        self.assertEqual(resultado, self.transacciones(self.FILAS_OCT))
+        self.assertEqual(extractor.ultimo_informe.contadores["paginas_perfil_local"], 1)
+
+
+class TestVentanaPaginas(unittest.TestCase):
+    """Tests de la ventana de páginas en curso (contrapresión)."""
+
+    def test_bloquea_al_llenarse_y_libera(self):
+        """Con la ventana llena, adquirir espera hasta que se libera sitio."""
+        ventana = VentanaPaginas(max_paginas=2, max_bytes=1000)
+        ventana.adquirir(100)
+        ventana.adquirir(100)
+        adquirida = threading.Event()
+        hilo = threading.Thread(target=lambda: (ventana.adquirir(100), adquirida.set()))
+        hilo.start()
+        self.assertFalse(adquirida.wait(0.2))
+        ventana.liberar(100)
+        self.assertTrue(adquirida.wait(2))
+        hilo.join()
+        self.assertEqual((ventana.paginas, ventana.pico_paginas, ventana.esperas), (2, 2, 1))
+
+    def test_limite_de_bytes(self):
+        """Los bytes también limitan; una página mayor que el límite pasa sola."""
+        ventana = VentanaPaginas(max_paginas=10, max_bytes=1000)
+        ventana.adquirir(5000)
+        self.assertEqual(ventana.bytes, 1000)
+        adquirida = threading.Event()
+        hilo = threading.Thread(target=lambda: (ventana.adquirir(10), adquirida.set()))
+        hilo.start()
+        self.assertFalse(adquirida.wait(0.2))
+        ventana.liberar(5000)
+        self.assertTrue(adquirida.wait(2))
+        hilo.join()
+        self.assertEqual(ventana.bytes, 10)
+
+
+class TestExtractorIA(unittest.TestCase):
+    """Tests del orquestador con la llamada a la API simulada."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.config_path = crear_config(self.test_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_lote_mantiene_orden_de_paginas(self):
+        """Las transacciones se devuelven en el orden de las páginas."""
+        pdf_a = crear_pdf(os.path.join(self.test_dir, "a.pdf"), 3)
+        pdf_b = crear_pdf(os.path.join(self.test_dir, "b.pdf"), 2)
+        extractor = ExtractorIA(config_path=self.config_path)
+
+        def falso_procesar(descriptor, informe):
+            return [Transaccion(fecha="01-01-2025", descripcion=f"p{descriptor.numero_pagina}",
+                                debito=1.0, credito=None)]
+
+        with mock.patch.object(extractor, "_procesar_pagina", side_effect=falso_procesar):
+            resultados = extractor.extraer_transacciones_de_pdfs([pdf_a, pdf_b])
+
+        self.assertEqual([t.descripcion for t in resultados[pdf_a]], ["p1", "p2", "p3"])
+        self.assertEqual([t.descripcion for t in resultados[pdf_b]], ["p1", "p2"])
+
+    def test_contrapresion_limita_paginas_en_curso(self):
+        """Nunca hay más páginas encoladas o en la API que MAX_PAGINAS_EN_COLA."""
+        config_path = crear_config(self.test_dir, "[PROCESAMIENTO]\nMAX_WORKERS_API = 2\nMAX_PAGINAS_EN_COLA = 3\n")
+        pdf = crear_pdf(os.path.join(self.test_dir, "a.pdf"), 12)
+        extractor = ExtractorIA(config_path=config_path)
+
+        def lento(descriptor, informe):
+            time.sleep(0.01)
+            return [Transaccion(fecha="01-01-2025", descripcion=f"p{descriptor.numero_pagina}",
+                                debito=1.0, credito=None)]
+
+        with mock.patch.object(extractor, "_procesar_pagina", side_effect=lento):
+            resultado = extractor.extraer_transacciones_de_pdf(pdf)
+
+        self.assertEqual([t.descripcion for t in resultado], [f"p{i}" for i in range(1, 13)])
+        self.assertEqual(extractor.ventana.pico_paginas, 3)
+        self.assertGreater(extractor.ventana.esperas, 0)
+        self.assertEqual((extractor.ventana.paginas, extractor.ventana.bytes), (0, 0))
+
+    def test_pdf_roto_sin_pool_de_procesos(self):
+        """Un documento que no se puede dividir bajo demanda se da por fallido."""
+        roto = os.path.join(self.test_dir, "roto.pdf")
+        with open(roto, "wb") as f:
+            f.write(b"no es un pdf")
+        extractor = ExtractorIA(config_path=self.config_path)
+
+        with mock.patch.object(extractor, "_procesar_pagina", return_value=[]) as procesar:
+            self.assertIsNone(extractor.extraer_transacciones_de_pdf(roto))
+        procesar.assert_not_called()
+
+    def test_progreso_por_pagina(self):
+        """La función de progreso recibe el avance de cada página."""
+        pdf = crear_pdf(os.path.join(self.test_dir, "a.pdf"), 3)
+        extractor = ExtractorIA(config_path=self.config_path)
+        avances = []
+
+        with mock.patch.object(extractor, "_procesar_pagina", return_value=[]):
+            extractor.extraer_transacciones_de_pdf(pdf, lambda ruta, hechas, total: avances.append((hechas, total)))
+
+        self.assertEqual(avances[0], (0, 3))
+        self.assertEqual(max(avances), (3, 3))
+
+    def test_paginas_sin_movimientos_se_omiten(self):
+        """Las páginas clasificadas sin movimientos no llegan a la API."""
+        pdf = crear_pdf(os.path.join(self.test_dir, "a.pdf"), 2)
+        extractor = ExtractorIA(config_path=self.config_path)
+        legal = "Términos y condiciones del contrato de cuenta de ahorros. " * 10
+
+        with mock.patch("src.models.preprocesador_pdf._extraer_texto", return_value=legal), \
+                mock.patch.object(extractor, "_procesar_pagina", return_value=[]) as procesar:
+            resultado = extractor.extraer_transacciones_de_pdf(pdf)
+
+        self.assertEqual(resultado, [])
+        procesar.assert_not_called()
+        self.assertEqual(len(extractor.ultimo_informe.paginas_omitidas), 2)
+
+    def test_respuesta_truncada_pide_solo_la_continuacion(self):
+        """Una página truncada se completa con una petición de continuación."""
+        pdf = crear_pdf(os.path.join(self.test_dir, "a.pdf"), 1)
+        extractor = ExtractorIA(config_path=self.config_path)
+        fila = '{"fecha": "0%d-09-2025", "descripcion": "%s", "debito": 1, "credito": null}'
+        truncada = mock.Mock(text='{"transacciones": [' + fila % (1, "A") + ", " + fila % (2, "B") + ', {"fe')
+        resto = mock.Mock(text='{"transacciones": [' + fila % (2, "B") + ", " + fila % (3, "C") + "]}")
+
+        with mock.patch("google.generativeai.upload_file", return_value=mock.Mock(name="f")), \
+                mock.patch.object(extractor.model, "generate_content", side_effect=[truncada, resto]) as generar:
+            resultado = extractor.extraer_transacciones_de_pdf(pdf)
+
+        self.assertEqual([t.descripcion for t in resultado], ["A", "B", "C"])
+        self.assertEqual(generar.call_count, 2)
+        self.assertIn("se cortó", generar.call_args_list[1].args[0][0])
+
+    def test_cascada_escala_paginas_dudosas(self):
+        """Si el modelo rápido no supera las comprobaciones se usa el de respaldo."""
+        config_path = crear_config(self.test_dir, "GEMINI_MODEL_RESPALDO = gemini-1.5-pro-latest\n")
+        pdf = crear_pdf(os.path.join(self.test_dir, "a.pdf"), 1)
+        extractor = ExtractorIA(config_path=config_path)
+        mala = mock.Mock(text='{"transacciones": [{"fecha": "ayer", "descripcion": "A", "debito": 1, "credito": null}]}')
+        buena = mock.Mock(text='{"transacciones": [{"fecha": "01-09-2025", "descripcion": "A", "debito": 1, "credito": null}]}')
+
+        with mock.patch("google.generativeai.upload_file", return_value=mock.Mock(name="f")), \
+                mock.patch.object(extractor.modelos[0], "generate_content", return_value=mala), \
+                mock.patch.object(extractor.modelos[1], "generate_content", return_value=buena):
+            resultado = extractor.extraer_transacciones_de_pdf(pdf)
+
+        self.assertEqual(resultado[0].fecha, "01-09-2025")
+        estadisticas = extractor.ultimo_informe.modelos
+        self.assertEqual(estadisticas["gemini-1.5-flash-latest"].escaladas, 1)
+        self.assertEqual(estadisticas["gemini-1.5-pro-latest"].paginas, 1)
+
+    def test_libro_guarda_documentos_completos(self):
+        """Con [LIBRO] habilitado cada página extraída queda en el libro."""
+        ruta_db = os.path.join(self.test_dir, "libro.db")
+        config_path = crear_config(self.test_dir, f"[LIBRO]\nHABILITADO = true\nRUTA = {ruta_db}\n")
+        pdf = crear_pdf(os.path.join(self.test_dir, "a.pdf"), 2)
+        extractor = ExtractorIA(config_path=config_path)
+
+        def falso_procesar(descriptor, informe):
+            return [Transaccion(fecha="01-01-2025", descripcion=f"p{descriptor.numero_pagina}",
+                                debito=1.0, credito=None)]
+
+        with mock.patch("src.models.preprocesador_pdf._extraer_texto", return_value="Banco Caja Social"), \
+                mock.patch.object(extractor, "_procesar_pagina", side_effect=falso_procesar):
+            extractor.extraer_transacciones_de_pdf(pdf)
+
+        movimientos = extractor.libro.buscar(archivo=pdf)
+        self.assertEqual([(m["pagina"], m["descripcion"]) for m in movimientos], [(1, "p1"), (2, "p2")])
+        self.assertEqual(movimientos[0]["id_ejecucion"], extractor.ultimo_informe.id_ejecucion)
+        self.assertEqual({m["banco"] for m in movimientos}, {"BANCO CAJA SOCIAL"})
+        extractor.libro.cerrar()
+
+    def test_duplicados_entre_extractos(self):
+        """Con [DUPLICADOS] habilitado, otro extracto ya exportado no repite sus movimientos."""
+        ruta_db = os.path.join(self.test_dir, "huellas.db")
+        agosto = crear_pdf(os.path.join(self.test_dir, "agosto.pdf"), 2)
+        septiembre = crear_pdf(os.path.join(self.test_dir, "septiembre.pdf"), 3)
+
+        def falso_procesar(descriptor, informe):
+            return [Transaccion(fecha="01-01-2025", descripcion=f"p{descriptor.numero_pagina}",
+                                debito=1.0, credito=None)]
+
+        for accion, esperado in (("descartar", ["p3"]), ("marcar", ["p1", "p2", "p3"])):
+            if os.path.exists(ruta_db):
+                os.remove(ruta_db)
+            config_path = crear_config(
+                self.test_dir, f"[DUPLICADOS]\nHABILITADO = true\nRUTA = {ruta_db}\nACCION = {accion}\n"
+            )
+            extractor = ExtractorIA(config_path=config_path)
+            with mock.patch.object(extractor, "_procesar_pagina", side_effect=falso_procesar):
+                primera = extractor.extraer_transacciones_de_pdf(agosto)
+                # Sin exportación confirmada, las huellas no se registran.
+                self.assertEqual(len(extractor.extraer_transacciones_de_pdf(septiembre)), 3)
+                extractor.confirmar_huellas(agosto)
+                # Volver a extraer el mismo documento devuelve todos sus movimientos.
+                repetida = extractor.extraer_transacciones_de_pdf(agosto)
+                segunda = extractor.extraer_transacciones_de_pdf(septiembre)
+            extractor.cerrar()
+
+            self.assertEqual([t.descripcion for t in primera], ["p1", "p2"])
+            self.assertEqual([t.descripcion for t in repetida], ["p1", "p2"])
+            self.assertEqual([t.descripcion for t in segunda], esperado)
+            self.assertEqual(extractor.ultimo_informe.contadores["movimientos_repetidos"], 2)
+        self.assertEqual(extractor.ultimo_informe.movimientos_repetidos[septiembre], [0, 1])
+
+    def test_pagina_densa_se_extrae_por_franjas(self):
+        """Una página con muchas filas se divide y las franjas se unen en orden."""
+        config_path = crear_config(self.test_dir, "[PROCESAMIENTO]\nFILAS_PAGINA_DENSA = 5\n")
+        pdf = crear_pdf(os.path.join(self.test_dir, "a.pdf"), 1)
+        with mock.patch("src.models.extractor_ia.PYMUPDF_DISPONIBLE", True):
+            extractor = ExtractorIA(config_path=config_path)
+        texto = "\n".join(f"0{n}/09/2025 Pago {n} 1.000,00" for n in range(1, 8))
+
+        def fila(n):
+            return Transaccion(fecha=f"0{n}-09-2025", descripcion=f"Pago {n}", debito=1000.0, credito=None)
+
+        def falso_procesar(descriptor, informe):
+            return [fila(1), fila(2)] if descriptor.franja == (1, 2) else [fila(2), fila(3)]
+
+        with mock.patch("src.models.preprocesador_pdf._extraer_texto", return_value=texto), \
+                mock.patch("src.models.extractor_ia.dividir_en_franjas", side_effect=franjas_falsas), \
+                mock.patch.object(extractor, "_procesar_pagina", side_effect=falso_procesar) as procesar:
+            resultado = extractor.extraer_transacciones_de_pdf(pdf)
+
+        self.assertEqual([t.descripcion for t in resultado], ["Pago 1", "Pago 2", "Pago 3"])
+        self.assertEqual(procesar.call_count, 2)
+        self.assertEqual(extractor.ultimo_informe.contadores["paginas_densas"], 1)
+
+    def test_pagina_truncada_se_repite_por_franjas(self):
+        """Si la respuesta sigue truncada sin continuaciones, se repite por franjas."""
+        config_path = crear_config(self.test_dir, "MAX_CONTINUACIONES = 0\n")
+        pdf = crear_pdf(os.path.join(self.test_dir, "a.pdf"), 1)
+        with mock.patch("src.models.extractor_ia.PYMUPDF_DISPONIBLE", True):
+            extractor = ExtractorIA(config_path=config_path)
+        fila = '{"fecha": "0%d-09-2025", "descripcion": "%s", "debito": 1, "credito": null}'
+        truncada = mock.Mock(text='{"transacciones": [' + fila % (1, "A") + ', {"fe')
+        arriba = mock.Mock(text='{"transacciones": [' + fila % (1, "A") + ", " + fila % (2, "B") + "]}")
+        abajo = mock.Mock(text='{"transacciones": [' + fila % (2, "B") + ", " + fila % (3, "C") + "]}")
+
+        def responder(contenido, **_kwargs):
+            # Las franjas se extraen en paralelo: se responde según la instrucción.
+            if "franja 1 de 2" in contenido[0]:
+                return arriba
+            return abajo if "franja 2 de 2" in contenido[0] else truncada
+
+        with mock.patch("google.generativeai.upload_file", return_value=mock.Mock(name="f")), \
+                mock.patch("src.models.extractor_ia.dividir_en_franjas", side_effect=franjas_falsas), \
+                mock.patch.object(extractor.model, "generate_content", side_effect=responder):
+            resultado = extractor.extraer_transacciones_de_pdf(pdf)
+
+        self.assertEqual([t.descripcion for t in resultado], ["A", "B", "C"])
+        self.assertEqual(extractor.ultimo_informe.contadores["paginas_divididas_por_truncado"], 1)
+
+    def test_cuota_agotada_repite_con_otra_clave(self):
+        """Con varias claves, un error de cuota enfría la clave y la página se repite con otra."""
+        config_path = crear_config(self.test_dir, "GEMINI_API_KEYS = clave_de_prueba, otra_clave\n")
+        pdf = crear_pdf(os.path.join(self.test_dir, "a.pdf"), 1)
+        extractor = ExtractorIA(config_path=config_path)
+        primera, segunda = extractor.pool_claves.claves
+        buena = mock.Mock(text='{"transacciones": [{"fecha": "01-09-2025", "descripcion": "A", "debito": 1, "credito": null}]}')
+        segunda.subir = mock.Mock(return_value=mock.Mock(name="f"))
+
+        with mock.patch("google.generativeai.upload_file", return_value=mock.Mock(name="f")), \
+                mock.patch.object(primera.modelos[0], "generate_content",
+                                  side_effect=google_exceptions.ResourceExhausted("cuota")), \
+                mock.patch.object(segunda.modelos[0], "generate_content", return_value=buena):
+            resultado = extractor.extraer_transacciones_de_pdf(pdf)
+
+        self.assertEqual([t.descripcion for t in resultado], ["A"])
+        self.assertEqual(len(extractor.pool_claves), 2)
+        self.assertGreater(primera.enfriada_hasta, 0)
+        segunda.subir.assert_called_once()
+        self.assertEqual(extractor.ultimo_informe.contadores["errores_cuota"], 1)
+
+    def test_contabiliza_tokens_y_coste(self):
+        """Los tokens de cada respuesta se suman por página y se guardan en el archivo de consumos."""
+        archivo = os.path.join(self.test_dir, "costes.jsonl")
+        config_path = crear_config(
+            self.test_dir,
+            f"[COSTES]\nARCHIVO = {archivo}\n[PRECIOS]\ngemini-1.5-flash-latest = 1, 2\n",
+        )
+        pdf = crear_pdf(os.path.join(self.test_dir, "a.pdf"), 2)
+        extractor = ExtractorIA(config_path=config_path)
+        respuesta = mock.Mock(
+            text='{"transacciones": []}',
+            usage_metadata=mock.Mock(prompt_token_count=1000, candidates_token_count=500),
+        )
+
+        with mock.patch("google.generativeai.upload_file", return_value=mock.Mock(name="f")), \
+                mock.patch.object(extractor.model, "generate_content", return_value=respuesta):
+            extractor.extraer_transacciones_de_pdf(pdf)
+
+        informe = extractor.ultimo_informe
+        self.assertEqual((informe.tokens_entrada, informe.tokens_salida), (2000, 1000))
+        self.assertAlmostEqual(informe.coste, 0.004)
+        with open(archivo, encoding="utf-8") as f:
+            registros = [json.loads(linea) for linea in f]
+        self.assertEqual([r["tipo"] for r in registros], ["pagina", "pagina", "ejecucion"])
+        self.assertEqual(registros[-1]["tokens_entrada"], 2000)
+
+    def test_presupuesto_duro_detiene_el_envio(self):
+        """Con el presupuesto duro superado no se llama a la API y el documento falla."""
+        config_path = crear_config(self.test_dir, "[COSTES]\nPRESUPUESTO_DIARIO_DURO = 1\n")
+        pdf = crear_pdf(os.path.join(self.test_dir, "a.pdf"), 1)
+        extractor = ExtractorIA(config_path=config_path)
+        extractor.costes.gasto_diario = 5.0
+
+        with mock.patch("google.generativeai.upload_file") as subir:
+            self.assertIsNone(extractor.extraer_transacciones_de_pdf(pdf))
+        subir.assert_not_called()
+
+    def test_error_de_api_invalida_el_documento(self):
+        """Un fallo de la API en una página hace que el documento devuelva None."""
+        pdf = crear_pdf(os.path.join(self.test_dir, "a.pdf"), 2)
+        extractor = ExtractorIA(config_path=self.config_path)
+
+        with mock.patch.object(extractor, "_procesar_pagina", side_effect=RuntimeError("API caída")):
+            self.assertIsNone(extractor.extraer_transacciones_de_pdf(pdf))
+
+
+class TestAsyncExtractorIA(unittest.TestCase):
+    """Tests del motor asíncrono con la llamada a la API simulada."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    @staticmethod
+    def _respuesta(descripcion):
+        return mock.Mock(text='{"transacciones": [{"fecha": "01-09-2025", "descripcion": "%s", '
+                              '"debito": 1, "credito": null}]}' % descripcion)
+
+    def test_lote_en_un_solo_bucle(self):
+        """Las páginas de varios documentos se extraen en paralelo, limitadas por el semáforo."""
+        config_path = crear_config(self.test_dir, "[PROCESAMIENTO]\nMAX_PAGINAS_ASYNC = 2\n")
+        pdf_a = crear_pdf(os.path.join(self.test_dir, "a.pdf"), 3)
+        pdf_b = crear_pdf(os.path.join(self.test_dir, "b.pdf"), 2)
+        extractor = AsyncExtractorIA(config_path=config_path)
+        en_vuelo, pico = [0], [0]
+
+        async def generar(contenido, **_):
+            en_vuelo[0] += 1
+            pico[0] = max(pico[0], en_vuelo[0])
+            await asyncio.sleep(0.01)
+            en_vuelo[0] -= 1
+            return self._respuesta("x")
+
+        with mock.patch("google.generativeai.upload_file", return_value=mock.Mock(name="f")), \
+                mock.patch.object(extractor.model, "generate_content_async", side_effect=generar) as llamada:
+            resultados = asyncio.run(extractor.extraer_async([pdf_a, pdf_b]))
+
+        self.assertEqual(llamada.await_count, 5)
+        self.assertEqual(len(resultados[pdf_a]), 3)
+        self.assertEqual(len(resultados[pdf_b]), 2)
+        self.assertEqual(pico[0], 2)
+        self.assertEqual(extractor.ultimo_informe.paginas_procesadas, 5)
+
+    def test_iterador_de_paginas_y_errores(self):
+        """El iterador entrega cada página al terminar; un fallo se entrega como error."""
+        pdf = crear_pdf(os.path.join(self.test_dir, "a.pdf"), 2)
+        roto = os.path.join(self.test_dir, "roto.pdf")
+        with open(roto, "wb") as f:
+            f.write(b"no es un pdf")
+        extractor = AsyncExtractorIA(config_path=crear_config(self.test_dir))
+
+        async def recoger():
+            return [r async for r in extractor.iterar_paginas([pdf, roto])]
+
+        with mock.patch("google.generativeai.upload_file", return_value=mock.Mock(name="f")), \
+                mock.patch.object(extractor.model, "generate_content_async",
+                                  new=mock.AsyncMock(return_value=self._respuesta("A"))):
+            resultados = asyncio.run(recoger())
+
+        por_pdf = {(r.pdf_path, r.numero_pagina): r for r in resultados}
+        self.assertEqual(sorted(n for ruta, n in por_pdf if ruta == pdf), [1, 2])
+        self.assertEqual(por_pdf[(pdf, 1)].transacciones[0].descripcion, "A")
+        self.assertIsNotNone(por_pdf[(roto, 0)].error)
+
+    def test_pagina_densa_se_extrae_por_franjas(self):
+        """Como en el extractor síncrono, una página densa se divide y las franjas se unen."""
+        config_path = crear_config(self.test_dir, "[PROCESAMIENTO]\nFILAS_PAGINA_DENSA = 5\n")
+        pdf = crear_pdf(os.path.join(self.test_dir, "a.pdf"), 1)
+        with mock.patch("src.models.extractor_ia.PYMUPDF_DISPONIBLE", True):
+            extractor = AsyncExtractorIA(config_path=config_path)
+        texto = "\n".join(f"0{n}/09/2025 Pago {n} 1.000,00" for n in range(1, 8))
+
+        def fila(n):
+            return Transaccion(fecha=f"0{n}-09-2025", descripcion=f"Pago {n}", debito=1000.0, credito=None)
+
+        async def falso_procesar(descriptor, informe):
+            return [fila(1), fila(2)] if descriptor.franja == (1, 2) else [fila(2), fila(3)]
+
+        with mock.patch("src.models.preprocesador_pdf._extraer_texto", return_value=texto), \
+                mock.patch("src.models.extractor_ia.dividir_en_franjas", side_effect=franjas_falsas), \
+                mock.patch.object(extractor, "procesar_pagina_async", side_effect=falso_procesar) as procesar:
+            resultado = asyncio.run(extractor.extraer_async([pdf]))[pdf]
+
+        self.assertEqual([t.descripcion for t in resultado], ["Pago 1", "Pago 2", "Pago 3"])
+        self.assertEqual(procesar.await_count, 2)
+        self.assertEqual(extractor.ultimo_informe.contadores["paginas_densas"], 1)
+
+    def test_lee_localmente_con_el_perfil_del_banco(self):
+        """Como en el extractor síncrono, el segundo extracto del mismo banco no llama a la API."""
+        config_path = crear_config(
+            self.test_dir, f"[PERFILES]\nHABILITADO = true\nRUTA = {os.path.join(self.test_dir, 'p.json')}\n"
+        )
+        filas_sept, filas_oct = TestPerfilesBanco.FILAS_SEPT, TestPerfilesBanco.FILAS_OCT
+        sept = crear_pdf_con_texto(os.path.join(self.test_dir, "sept.pdf"), filas_sept)
+        octubre = crear_pdf_con_texto(os.path.join(self.test_dir, "oct.pdf"), filas_oct)
+        extractor = AsyncExtractorIA(config_path=config_path)
+        filas = ", ".join(
+            json.dumps({"fecha": t.fecha, "descripcion": t.descripcion, "debito": t.debito, "credito": t.credito})
+            for t in TestPerfilesBanco.transacciones(filas_sept)
+        )
+        respuesta = mock.Mock(text='{"transacciones": [' + filas + "]}")
+
+        with mock.patch("google.generativeai.upload_file", return_value=mock.Mock(name="f")), \
+                mock.patch.object(extractor.model, "generate_content_async",
+                                  new=mock.AsyncMock(return_value=respuesta)) as generar:
+            asyncio.run(extractor.extraer_async([sept]))
+            resultado = asyncio.run(extractor.extraer_async([octubre]))[octubre]
+
+        self.assertEqual(generar.await_count, 1)
+        self.assertEqual(resultado, TestPerfilesBanco.transacciones(filas_oct))
+        self.assertEqual(extractor.ultimo_informe.contadores["paginas_perfil_local"], 1)
+        self.assertEqual(extractor.ultimo_informe.contadores.get("perfiles_aprendidos", 0), 0)
+
+    def test_fallo_de_pagina_cancela_el_documento(self):
+        """Cuando una página falla, las demás páginas del documento se cancelan."""
+        pdf = crear_pdf(os.path.join(self.test_dir, "a.pdf"), 3)
+        extractor = AsyncExtractorIA(config_path=crear_config(self.test_dir))
+        llamadas = []
+
+        async def generar(contenido, **_):
+            llamadas.append(1)
+            if len(llamadas) == 1:
+                raise RuntimeError("fallo de la API")
+            await asyncio.sleep(10)
+            return self._respuesta("x")
+
+        inicio = time.perf_counter()
+        with mock.patch("google.generativeai.upload_file", return_value=mock.Mock(name="f")), \
+                mock.patch.object(extractor.model, "generate_content_async", side_effect=generar):
+            resultados = asyncio.run(extractor.extraer_async([pdf]))
+
+        self.assertIsNone(resultados[pdf])
+        self.assertLess(time.perf_counter() - inicio, 5)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)